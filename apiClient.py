@@ -0,0 +1,73 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from tracing import span, submit
+
+# service.py 클라이언트: app.py가 SMARTCHEF_API_URL이 설정되어 있을 때 파이프라인 대신 사용한다
+
+API_URL = os.environ.get('SMARTCHEF_API_URL', '').rstrip('/')
+API_TIMEOUT = float(os.environ.get('SMARTCHEF_API_TIMEOUT', '120'))
+# /recommend/stream 응답 헤더: 프롬프트에 들어간 건강정보 문서 id (JSON 리스트)
+HEALTH_IDS_HEADER = 'X-SmartChef-Health-Ids'
+
+client_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='api')
+_local = threading.local()
+
+
+def _session():
+    # 스레드마다 keep-alive 세션 하나
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
+def recognize(image_bytes):
+    with span('api.recognize', image_bytes=len(image_bytes)):
+        response = _session().post(f'{API_URL}/recognize', data=image_bytes, timeout=API_TIMEOUT,
+                                   headers={'Content-Type': 'application/octet-stream'})
+        response.raise_for_status()
+        return response.json()['ingredients']
+
+
+def recommend_stream(user_need, ingredients, disease, health=None):
+    """Yields recommendation text chunks as the service streams them; fills health like stages.recommendation_stream."""
+    body = {'ingredients': list(ingredients), 'disease': disease, 'craving': user_need}
+    with span('api.recommend') as s:
+        with _session().post(f'{API_URL}/recommend/stream', json=body, stream=True, timeout=API_TIMEOUT) as response:
+            response.raise_for_status()
+            if health is not None:
+                # 서비스가 프롬프트에 쓴 건강정보 문서 id (health.csv id라서 healthScore가 바로 찾는다)
+                health.extend({'id': doc_id} for doc_id in json.loads(response.headers.get(HEALTH_IDS_HEADER, '[]')))
+            response.encoding = 'utf-8'
+            chars = 0
+            for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                chars += len(chunk)
+                yield chunk
+            s.set(response_chars=chars)
+
+
+def synthesize_speech(voice, text):
+    with span('api.speech', input_chars=len(text)):
+        response = _session().post(f'{API_URL}/speech', json={'voice': voice, 'text': text}, timeout=API_TIMEOUT)
+        response.raise_for_status()
+        return response.content
+
+
+def recipe_image(english_name):
+    with span('api.image'):
+        response = _session().get(f'{API_URL}/image', params={'name': english_name}, timeout=API_TIMEOUT)
+        response.raise_for_status()
+        return response.content
+
+
+def submit_speech(voice, text):
+    return submit(client_executor, synthesize_speech, voice, text)
+
+
+def submit_recipe_image(english_name):
+    return submit(client_executor, recipe_image, english_name)
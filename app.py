@@ -2,84 +2,90 @@ import streamlit as st
 from PIL import Image
 import os
 # from dotenv import load_dotenv
-from openai import OpenAI
 import base64
-import requests
 from io import BytesIO
 import ast
 import time
 import json
+from concurrent.futures import as_completed
 from llmStructure import *
-import replicate
-import numpy as np
+from imageGen import submit_recipe_image
+from jsonStream import RecommendationStreamParser
+from speech import submit_speech
+from vision import recognize_ingredients
+from tracing import span, start_metrics_server
+import stages
+import apiClient
+import prefetch
+import startup
+
+def _secret(name):
+    # secrets.toml이 없거나 키가 없으면 환경 변수를 쓴다. 둘 다 없어도 앱은 뜨고 그 기능만 실패한다
+    try:
+        value = st.secrets[name]
+    except Exception:
+        return os.environ.get(name)
+    os.environ.setdefault(name, value)
+    return value
 
 # Image FLUX AI 
-REPLICATE_API_TOKEN = st.secrets['REPLICATE_API_TOKEN']
+REPLICATE_API_TOKEN = _secret('REPLICATE_API_TOKEN')
 
 # .env 파일의 환경 변수들을 불러옵니다.
 # load_dotenv()
 
 # OpenAI API Key 설정 (환경 변수 사용)
-OPENAI_API_KEY = st.secrets["OPENAI_API_KEY"]
-
-def encode_image(image):
-    """Encodes the image file to base64 format."""
-    if isinstance(image, BytesIO):
-        image_data = image.read()  # Read the image data if it's a BytesIO object
-    else:
-        # If it's a PIL image, convert it to BytesIO
-        buffered = BytesIO()
-        image.save(buffered, format="JPEG")
-        image_data = buffered.getvalue()
-    
-    return base64.b64encode(image_data).decode('utf-8')
+OPENAI_API_KEY = _secret("OPENAI_API_KEY")
+
+# 클라이언트, 인덱스, 캐시는 처음 쓸 때 만들어지므로 프로세스당 한 번 백그라운드에서 미리 만들어 둔다
+if startup.WARMUP_ENABLED and not apiClient.API_URL:
+    startup.warm_up_in_background()
+
+# SMARTCHEF_METRICS_PORT가 설정되어 있으면 /metrics, /summary, /traces 엔드포인트를 연다 (프로세스당 한 번)
+start_metrics_server()
 
+# SMARTCHEF_API_URL이 설정되어 있으면 파이프라인을 직접 돌리지 않고 service.py에 요청한다
+if apiClient.API_URL:
+    recommendation_stream = apiClient.recommend_stream
+    submit_speech = apiClient.submit_speech
+    submit_recipe_image = apiClient.submit_recipe_image
+else:
+    recommendation_stream = stages.recommendation_stream
 
-def recognize_ingredients_from_image(image):
+def recognize_ingredients_from_image(image, image_bytes):
     with st.spinner("🥕AI 쉐프가 재료를 확인하고 있어요!🥕"):
-        time.sleep(2)  # 인코딩 작업 (모의)
-        base64_image = encode_image(image)
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {OPENAI_API_KEY}"
-        }
-        payload = {
-            "model": "gpt-4o-mini",
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": "입력받은 냉장고 속 이미지에서 확실하게 보이는 식재료들만 리스트로 뽑아줘. 이때 식재료와 관련한 이모지를 같이 붙여줘. 불필요한 설명은 제외. format example : ['🥚계란','🎃호박','🍎사과']. 인식된 재료가 없을 경우 빈 리스트를 반환해줘."},
-                        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                    ]
-                }
-            ],
-            "max_tokens": 300
-        }
-        
-        response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload)
-        ingredients_list = response.json()['choices'][0]['message']['content']
-        ingredients_list = ast.literal_eval(ingredients_list)
-        
+        if apiClient.API_URL:
+            ingredients_list = apiClient.recognize(image_bytes)
+        else:
+            # 전처리(축소/메타데이터 제거/인코딩)와 지각 해시 캐시 조회는 vision 모듈에서 처리한다
+            ingredients_list = recognize_ingredients(image, OPENAI_API_KEY)
+
     st.success("냉장고 재료 인식이 끝났습니다!")
     return ingredients_list
 
 
-# 음성생성
-def generate_and_play_speech(voice, text):
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    response = client.audio.speech.create(
-        model="tts-1-hd",
-        voice=voice,  # options: alloy, echo, fable, onyx, nova, shimmer
-        input=text
-    )
-
-    output_file_path = "output.wav"
-    response.stream_to_file(output_file_path)
-
-    # Streamlit playback
-    st.audio(output_file_path)
+# 레시피 카드 한 장을 그리고, 이미지가 들어갈 자리를 돌려준다
+def render_recipe_card(recipe):
+    # 건강점수는 LLM이 아니라 healthScore.py가 health.csv 권장/주의 식품으로 계산한다 (질병을 못 찾으면 비어 있음)
+    score = f"<br>건강점수: {recipe['health_score']}" if recipe.get('health_score') else ''
+    st.markdown(f"<h3 style='color: #FF4500;'>{recipe['name']}{score}</h3>", unsafe_allow_html=True)
+    st.markdown(f"조리시간: {recipe['cooking_time']}")
+    st.markdown(f"필요재료: {recipe['all_ingredients']}")
+    st.markdown(f"추가구비재료: {recipe['additional_ingredients']}")
+    if recipe.get('caution_foods'):
+        st.markdown(f"⚠️ 주의 식품: {', '.join(recipe['caution_foods'])}")
+
+    # Expander 사용하여 준비 단계 표시
+    with st.expander("조리방법보기"):
+        st.markdown("#### 조리 방법")
+        # 조리 단계에서 줄바꿈 적용하여 표시
+        steps = recipe['steps'].split('\n')
+        for step in steps:
+            st.markdown(f"{step.strip()}")
+
+    image_slot = st.empty()
+    image_slot.info("🍳 요리 이미지를 만들고 있어요...")
+    return image_slot
 
 # Streamlit 앱 설정
 st.set_page_config(page_title="Smart Fridge Recipe Recommender", page_icon="🍽️", layout="wide")
@@ -88,6 +94,9 @@ st.set_page_config(page_title="Smart Fridge Recipe Recommender", page_icon="🍽
 st.markdown("<h1 style='text-align: center; color: #FF6347;'>🧑‍🍳스마트쉐프</h1>", unsafe_allow_html=True)
 st.markdown("<p style='text-align: center; color: #FF4500;'>냉장고에 있는 재료로 최고의 음식을 만들어드립니다</p>", unsafe_allow_html=True)
 
+if not OPENAI_API_KEY and not apiClient.API_URL:
+    st.warning("OPENAI_API_KEY가 설정되지 않아 재료 인식과 음식 추천을 사용할 수 없어요.")
+
 # 이미지 업로드 기능
 st.markdown("### 1. 냉장고 사진을 업로드 혹은 직접 촬영 해주세요")
 
@@ -118,36 +127,33 @@ if img_file is None:
 if img_file is None:
     if 'ingredients' in st.session_state:
         st.session_state.ingredients = []  # 재료 리스트 초기화
+        st.session_state.pop('image_key', None)
+    if 'prefetcher' in st.session_state:
+        st.session_state.prefetcher.cancel()
 
 if img_file is not None:
-    img = Image.open(img_file)
-
-    # RGBA 이미지를 RGB로 변환
-    if img.mode == 'RGBA':
-        img = img.convert('RGB')
+    # 사진 디코딩과 재료 인식은 사진 내용 해시로 메모이즈되어 rerun 때 다시 하지 않는다
+    img_bytes = stages.read_image_bytes(img_file)
+    img_key = stages.image_key(img_bytes)
+    img = stages.decode_image(img_key, img_bytes)
 
     st.image(img, caption="Uploaded Image", use_column_width=True, output_format="JPEG")
 
-    # 이미 인식된 재료가 없는 경우에만 이미지 인식 수행
-    if 'ingredients' not in st.session_state or not st.session_state.ingredients:
-        detected_ingredients = recognize_ingredients_from_image(img)
+    # 새 사진일 때만 인식 결과로 재료 목록을 초기화한다 (사용자가 고친 목록은 유지)
+    if st.session_state.get('image_key') != img_key:
+        detected_ingredients = stages.ingredients(img_key, img, lambda image: recognize_ingredients_from_image(image, img_bytes))
         # detected_ingredients = ["🥔감자", "🥚달걀", "🫑파프리카", "🥒오이", "🌶️고추", "🥕당근"] # 디버깅용 ===========================================================================
         # st.write("Recognized Ingredients:")
         # st.write(detected_ingredients) # 디버깅용 ===========================================================================
+        st.session_state.image_key = img_key
         st.session_state.ingredients = list(set(detected_ingredients))
-    
-        # Detected Ingredients Display (5 items per row)
-        st.markdown("### 2. 인식된 재료들을 확인해보세요.")
-
-    # Ensure the session state is set up correctly
-    if 'ingredients' not in st.session_state:
-        st.session_state.ingredients = ingredients
-
-    if 'remove_indices' not in st.session_state:
         st.session_state.remove_indices = []
-
-    if 'new_ingredients_list' not in st.session_state:
         st.session_state.new_ingredients_list = []
+        st.session_state.pop('recommend_inputs', None)
+        st.session_state.pop('recommend_answer', None)
+
+        # Detected Ingredients Display (5 items per row)
+        st.markdown("### 2. 인식된 재료들을 확인해보세요.")
 
     # 재료 삭제 기능
     with st.expander("각 재료 옆의 체크박스를 선택하고 삭제 확정하기 버튼을 눌러 잘못 인식된 재료들을 삭제 할 수 있습니다.", expanded=True):
@@ -206,61 +212,83 @@ if img_file is not None:
     health_condition = st.text_input("가지고 있는 질병이 있다면 입력해주세요 (ex. 당뇨병, 야맹증, 고혈압 등)", placeholder="필수로 입력해주세요")
     craving_food = st.text_input("지금 땡기는 음식이 있다면 입력해주세요 (ex.한식/태국음식.., 매운음식, 느끼한음식 등)", placeholder="없다면 입력하지 않으셔도 됩니다")
 
+    # 재료를 고치고 질병을 입력하는 동안 레시피/건강정보 검색을 미리 해 둔다 (입력이 바뀌면 이전 것은 취소)
+    # 버튼을 누르면 같은 단계 캐시 키로 재사용되므로 클릭 뒤에는 LLM 응답만 기다린다
+    if prefetch.PREFETCH_ENABLED and not apiClient.API_URL:
+        if 'prefetcher' not in st.session_state:
+            st.session_state.prefetcher = prefetch.Prefetcher()
+        st.session_state.prefetcher.update(craving_food, list(st.session_state.ingredients), health_condition)
+
     # Analyze 버튼
+    # 추천 결과는 마지막으로 요청한 입력으로 rerun마다 다시 그린다
+    # 끝까지 받은 LLM 응답은 입력과 함께 session_state에 두고 rerun 때는 그것으로 그린다
+    # (응답 캐시가 꺼져 있거나 API 모드여도 다시 그리는 데 원격 호출이 없다)
+    # 땡기는 음식만 바꾸면 레시피 검색과 LLM만 다시 실행되고, 건강정보 검색과 재료 인식은 재사용된다
     if st.button("음식을 추천해줘", help="Click to find recipes based on your ingredients and preferences"):
-        with st.spinner('👨‍🍳AI 쉐프가 당신의 건강에 맞는 음식을 찾고 있어요!👨‍🍳'):
-            if st.session_state.ingredients:
-
-                gpt_response = json.loads(gptOutput(craving_food, st.session_state.ingredients, health_condition)[0])
-                health_summary = gpt_response['chefTip']
-                recipes = gpt_response['recipes']
-
-                # print(gpt_response)
-                # print(health_summary)
-                # print(recipes)
-
-                # 건강 요약 부분을 별도로 출력
-                if health_summary:
-                    st.markdown("### AI 영양사 한마디")
-                    st.markdown(f"**{health_summary}**")
-                    st.markdown("---")  # 구분선을 추가하여 건강 요약과 레시피를 구분
-
-                    # Example usage
-                    # Assuming you have a client object already created
-                    voice = "nova"
-                    text = health_summary
-                    generate_and_play_speech(voice, text)
+        st.session_state.recommend_inputs = (craving_food, list(st.session_state.ingredients), health_condition)
 
-                st.markdown("### 추천 레시피")
+    if st.session_state.get('recommend_inputs'):
+        user_need, ingredients, disease = st.session_state.recommend_inputs
+        with st.spinner('👨‍🍳AI 쉐프가 당신의 건강에 맞는 음식을 찾고 있어요!👨‍🍳'), span('app.recommend'):
+            if ingredients:
 
+                # 모델 출력이 도착하는 대로 chefTip과 레시피 카드를 하나씩 그린다
+                tip_container = st.container()
+                recipe_header = st.empty()
                 cols = st.columns(3)  # 3개의 열로 카드 형식의 레이아웃 생성
 
-                for i, recipe in enumerate(recipes.values()):
-                    with cols[i % 3]:
-                        st.markdown(f"<h3 style='color: #FF4500;'>{recipe['name']}<br>건강점수: {recipe['health_score']}</h3>", unsafe_allow_html=True)
-                        # st.image('https://oaidalleapiprodscus.blob.core.windows.net/private/org-tCAIJLieoZ5a5hHAL85SpD2O/user-oAmOYDR8Wvv7i718IYxSkOyy/img-DDzRwXOBZ09QPNBYWC1RXJ7N.png?st=2024-09-01T08%3A08%3A37Z&se=2024-09-01T10%3A08%3A37Z&sp=r&sv=2024-08-04&sr=b&rscd=inline&rsct=image/png&skoid=d505667d-d6c1-4a0a-bac7-5c84a87759f8&sktid=a48cca56-e6da-484e-a814-9c849652bcb3&skt=2024-08-31T23%3A39%3A59Z&ske=2024-09-01T23%3A39%3A59Z&sks=b&skv=2024-08-04&sig=/Jhnj1DHBkkL/OJSpAzkAUpZ87AAoBKRseDT1qrDpEc%3D', caption='Your image caption', use_column_width=True)
-                        st.markdown(f"조리시간: {recipe['cooking_time']}")
-                        st.markdown(f"필요재료: {recipe['all_ingredients']}")
-                        st.markdown(f"추가구비재료: {recipe['additional_ingredients']}")
-
-                        input = {
-                            "prompt": f"Realistically, {recipe['english_name']}, and Korean style food, Only Food, tasty, dynamic shot"
-                        }
-
-                        output = replicate.run(
-                            "black-forest-labs/flux-schnell",
-                            input=input
-                        )
-
-                        # Expander 사용하여 준비 단계 표시
-                        with st.expander("조리방법보기"):
-                            st.markdown("#### 조리 방법")
-                            # 조리 단계에서 줄바꿈 적용하여 표시
-                            steps = recipe['steps'].split('\n')
-                            for step in steps:
-                                st.markdown(f"{step.strip()}")
-
-                        st.image(output[0], output_format="JPEG")
+                parser = RecommendationStreamParser()
+                # 레시피 건강점수는 추천 프롬프트에 들어간 건강정보 문서로 계산한다 (스트림이 시작될 때 채워진다)
+                answer = st.session_state.get('recommend_answer')
+                if answer is not None and answer[0] == st.session_state.recommend_inputs:
+                    health_docs = list(answer[2])
+                    tokens = [answer[1]]
+                else:
+                    health_docs = []
+                    tokens = recommendation_stream(user_need, ingredients, disease, health_docs)
+                parts = []
+                health_summary = None
+                recipe_count = 0
+
+                # 음성과 레시피 이미지는 내용이 나오는 즉시 백그라운드로 요청하고, 완성되는 순서대로 자리를 채운다
+                pending_slots = {}
+
+                for token in tokens:
+                    parts.append(token)
+                    for event in parser.feed(token):
+                        if event[0] == 'chefTip':
+                            health_summary = event[1]
+
+                            # 건강 요약 부분을 별도로 출력
+                            if health_summary:
+                                with tip_container:
+                                    st.markdown("### AI 영양사 한마디")
+                                    st.markdown(f"**{health_summary}**")
+                                    audio_slot = st.empty()
+                                    st.markdown("---")  # 구분선을 추가하여 건강 요약과 레시피를 구분
+
+                                voice = "nova"
+                                pending_slots.setdefault(submit_speech(voice, health_summary), []).append(('audio', audio_slot))
+
+                        elif event[0] == 'recipe':
+                            recipe = health_scorer().annotate([event[2]], health_docs)[0]
+                            recipe_header.markdown("### 추천 레시피")
+                            with cols[recipe_count % 3]:
+                                image_slot = render_recipe_card(recipe)
+                            pending_slots.setdefault(submit_recipe_image(recipe['english_name']), []).append(('image', image_slot))
+                            recipe_count += 1
+
+                st.session_state.recommend_answer = (st.session_state.recommend_inputs, ''.join(parts), health_docs)
+
+                for future in as_completed(pending_slots):
+                    for kind, slot in pending_slots[future]:
+                        try:
+                            if kind == 'audio':
+                                slot.audio(future.result(), format="audio/mp3")
+                            else:
+                                slot.image(future.result(), output_format="JPEG")
+                        except Exception as e:
+                            slot.warning(f"{'음성' if kind == 'audio' else '이미지'}을(를) 불러오지 못했어요: {e}")
 
 else:
     st.warning("먼저 사진을 업로드 해주세요")
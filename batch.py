@@ -0,0 +1,183 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Streamlit 없이 냉장고 사진 디렉토리 × 사용자 프로필 CSV(disease, craving)로 추천을 미리 만든다
+# app.py와 같은 파이프라인 함수(stages, llmStructure, speech, imageGen)를 쓴다
+#
+#   python batch.py image profiles.csv --out cache/batch.jsonl --concurrency 4 --tts --images
+#
+# 결과는 한 줄씩 바로 기록되고, 다시 실행하면 이미 성공한 항목은 건너뛴다
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def item_id(image_name, disease, craving):
+    return hashlib.sha1(f'{image_name}\0{disease}\0{craving}'.encode('utf-8')).hexdigest()[:16]
+
+
+def read_profiles(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return [(row.get('disease') or '', row.get('craving') or '') for row in csv.DictReader(f)]
+
+
+def list_images(directory):
+    return sorted(name for name in os.listdir(directory) if name.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def completed_ids(path):
+    # 오류로 끝난 항목은 다시 실행한다
+    done = set()
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # 중단되며 잘린 마지막 줄
+                if 'error' not in record:
+                    done.add(record['id'])
+    return done
+
+
+class ResultWriter:
+    """Appends one JSON line per finished item, flushing each so interruption loses nothing."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def recognize(directory, image_name):
+    import stages
+    from vision import recognize_ingredients
+
+    with open(os.path.join(directory, image_name), 'rb') as f:
+        data = f.read()
+    key = stages.image_key(data)
+    image = stages.decode_image(key, data)
+    return stages.ingredients(key, image, lambda img: recognize_ingredients(img, os.environ['OPENAI_API_KEY']))
+
+
+def run_item(image_name, ingredients, disease, craving, args):
+    import stages
+    from imageGen import image_cache_key, image_cache_path, recipe_image_prompt, submit_recipe_image
+    from llmStructure import gptOutput, score_recommendation
+    from speech import submit_speech
+
+    started = time.perf_counter()
+    record = {'id': item_id(image_name, disease, craving), 'image': image_name,
+              'disease': disease, 'craving': craving, 'ingredients': ingredients}
+    context = stages.context(craving, ingredients, disease)
+    content, _ = gptOutput(craving, ingredients, disease, context=context)
+    try:
+        recommendation = score_recommendation(json.loads(content), context[1])
+    except json.JSONDecodeError:
+        record['content'] = content
+        recommendation = None
+    record['recommendation'] = recommendation
+
+    if recommendation:
+        futures = {}
+        if args.tts and recommendation.get('chefTip'):
+            futures['audio'] = submit_speech(args.voice, recommendation['chefTip'])
+        if args.images:
+            for key, recipe in recommendation.get('recipes', {}).items():
+                futures[key] = submit_recipe_image(recipe['english_name'])
+        images = {}
+        for key, future in futures.items():
+            data = future.result()
+            if key == 'audio':
+                path = os.path.join(args.assets_dir, f"{record['id']}.mp3")
+                os.makedirs(args.assets_dir, exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(data)
+                record['audio'] = path
+            else:
+                # 이미지는 imageGen 디스크 캐시에 이미 저장되어 있으므로 경로만 남긴다
+                name = recommendation['recipes'][key]['english_name']
+                images[key] = image_cache_path(image_cache_key(name, recipe_image_prompt(name)))
+        if images:
+            record['images'] = images
+
+    record['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return record
+
+
+def run(args):
+    images = list_images(args.images_dir)
+    profiles = read_profiles(args.profiles)
+    done = completed_ids(args.out)
+    todo = [(image_name, disease, craving) for image_name in images for disease, craving in profiles
+            if item_id(image_name, disease, craving) not in done]
+    print(f'{len(images)} images x {len(profiles)} profiles: {len(todo)} to run, {len(done)} already done', file=sys.stderr)
+    if not todo:
+        return {'done': 0, 'errors': 0, 'seconds': 0.0}
+
+    writer = ResultWriter(args.out)
+    started = time.perf_counter()
+    finished = errors = 0
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        # 같은 사진은 한 번만 인식한다
+        needed = sorted({image_name for image_name, _, _ in todo})
+        recognized = {name: executor.submit(recognize, args.images_dir, name) for name in needed}
+
+        def run_recognized(image_name, disease, craving):
+            # 인식 작업이 먼저 큐에 들어가 있으므로 여기서 기다려도 교착되지 않는다
+            return run_item(image_name, recognized[image_name].result(), disease, craving, args)
+
+        futures = {
+            executor.submit(run_recognized, image_name, disease, craving): (image_name, disease, craving)
+            for image_name, disease, craving in todo
+        }
+        for future in as_completed(futures):
+            image_name, disease, craving = futures[future]
+            try:
+                writer.write(future.result())
+            except Exception as e:
+                errors += 1
+                writer.write({'id': item_id(image_name, disease, craving), 'image': image_name, 'disease': disease,
+                              'craving': craving, 'error': f'{type(e).__name__}: {e}'})
+            finished += 1
+            if finished % args.progress_every == 0 or finished == len(todo):
+                elapsed = time.perf_counter() - started
+                print(f'{finished}/{len(todo)} items, {finished / elapsed:.2f} items/s, {errors} errors', file=sys.stderr)
+    writer.close()
+    return {'done': finished, 'errors': errors, 'seconds': time.perf_counter() - started}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run SmartChef recommendations for every fridge photo x user profile.')
+    parser.add_argument('images_dir')
+    parser.add_argument('profiles', help='CSV with disease and craving columns')
+    parser.add_argument('--out', default='cache/batch.jsonl')
+    parser.add_argument('--assets-dir', default='cache/batch_assets')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--tts', action='store_true', help='synthesize the chefTip audio')
+    parser.add_argument('--voice', default='nova')
+    parser.add_argument('--images', action='store_true', help='generate a picture for each recipe')
+    parser.add_argument('--progress-every', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    stats = run(args)
+    rate = stats['done'] / stats['seconds'] if stats['seconds'] else 0.0
+    print(f"done: {stats['done']} items ({stats['errors']} errors) in {stats['seconds']:.1f}s, {rate:.2f} items/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import fakes
+
+# 오프라인 벤치마크: 실제 파이프라인 코드(vision → gptOutputStream → TTS/이미지)를
+# fakes.py의 가짜 OpenAI/Pinecone/Replicate에 연결해서 N개의 동시 세션으로 돌린다
+#
+#   python benchmark.py --sessions 50 --concurrency 10
+#   python benchmark.py --profile profile.json --scale 0.1 --json result.json
+
+DISEASES = ['당뇨병', '고혈압', '골다공증', '위염', '빈혈', '고지혈증, 지방간', '통풍', '야맹증']
+CRAVINGS = ['매운음식', '한식', '느끼한음식', '국물요리', '', '태국음식']
+def _load_images(directory):
+    from PIL import Image
+
+    images = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(('.jpg', '.jpeg', '.png')):
+            with Image.open(os.path.join(directory, name)) as img:
+                images.append(img.convert('RGB'))
+    if not images:
+        raise SystemExit(f'no images found in {directory}')
+    return images
+
+
+def run_session(index, images, inputs, args):
+    import imageGen
+    import llmStructure
+    import speech
+    import vision
+    from jsonStream import RecommendationStreamParser
+    from tracing import span
+
+    disease, craving = inputs[index % len(inputs)]
+    with span('session'):
+        ingredients = vision.recognize_ingredients(images[index % len(images)].copy(), 'benchmark')
+        parser = RecommendationStreamParser()
+        futures = []
+        for token in llmStructure.gptOutputStream(craving, ingredients, disease):
+            for event in parser.feed(token):
+                if event[0] == 'chefTip' and args.tts:
+                    futures.append(speech.submit_speech('nova', event[1]))
+                elif event[0] == 'recipe' and args.images:
+                    futures.append(imageGen.submit_recipe_image(event[2]['english_name']))
+        for future in futures:
+            future.result()
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='smartchef-bench-')
+    fakes.configure_environment(workdir, args.response_cache, args.vision_cache, args.recipe_store)
+
+    profile = None
+    if args.profile:
+        with open(args.profile, encoding='utf-8') as f:
+            profile = json.load(f)
+
+    from tracing import recorder
+
+    model = fakes.LatencyModel(profile, seed=args.seed, scale=args.scale)
+    fakes.install(model)
+    images = _load_images(args.images_dir)
+
+    rng = random.Random(args.seed)
+    pool = [(rng.choice(DISEASES), rng.choice(CRAVINGS)) for _ in range(args.input_pool)]
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    recorder.reset()
+
+    errors = []
+    started = time.perf_counter()
+
+    def guarded(i):
+        try:
+            run_session(i, images, pool, args)
+        except Exception as e:
+            errors.append(f'{type(e).__name__}: {e}')
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(guarded, range(args.sessions)))
+    wall = time.perf_counter() - started
+
+    summary = recorder.summary()
+    report = {
+        'sessions': args.sessions,
+        'concurrency': args.concurrency,
+        'errors': len(errors),
+        'error_samples': errors[:5],
+        'wall_seconds': wall,
+        'throughput_sessions_per_s': args.sessions / wall if wall else 0.0,
+        'end_to_end': summary.get('session', {}),
+        'stages': {k: v for k, v in summary.items() if k != 'session'},
+        # Linux에서 ru_maxrss 단위는 KB
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    if args.tracemalloc:
+        report['peak_traced_mb'] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+    return report
+
+
+def print_report(report, out=sys.stdout):
+    e2e = report['end_to_end']
+    out.write(f"sessions={report['sessions']} concurrency={report['concurrency']} errors={report['errors']}\n")
+    out.write(f"throughput={report['throughput_sessions_per_s']:.2f} sessions/s wall={report['wall_seconds']:.2f}s "
+              f"peak_rss={report['peak_rss_mb']:.1f}MB\n")
+    if e2e:
+        out.write(f"end-to-end p50={e2e['p50_ms']:.0f}ms p95={e2e['p95_ms']:.0f}ms p99={e2e['p99_ms']:.0f}ms\n")
+    out.write(f"{'stage':<24}{'count':>7}{'hits':>7}{'err':>5}{'p50':>10}{'p95':>10}{'p99':>10}\n")
+    for stage, s in report['stages'].items():
+        out.write(f"{stage:<24}{s['count']:>7}{s['cache_hits']:>7}{s['errors']:>5}"
+                  f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline SmartChef load benchmark against in-process fakes.')
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=5)
+    parser.add_argument('--images-dir', default='image')
+    parser.add_argument('--input-pool', type=int, default=1000, help='number of distinct (disease, craving) inputs')
+    parser.add_argument('--profile', help='JSON overrides for fakes.DEFAULT_PROFILE')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply every fake latency')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-tts', dest='tts', action='store_false')
+    parser.add_argument('--no-images', dest='images', action='store_false')
+    parser.add_argument('--response-cache', action='store_true')
+    parser.add_argument('--vision-cache', action='store_true')
+    parser.add_argument('--no-recipe-store', dest='recipe_store', action='store_false')
+    parser.add_argument('--tracemalloc', action='store_true')
+    parser.add_argument('--json', help='write the full report to this path')
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
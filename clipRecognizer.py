@@ -0,0 +1,219 @@
+import csv
+import hashlib
+import os
+
+import numpy as np
+
+import startup
+from tracing import span
+
+# main.py의 로컬 CLIP 재료 인식기
+# 모델은 프로세스당 한 번만 로드하고, 재료 어휘의 텍스트 임베딩은 미리 계산해서 디스크에 캐시한다
+# 이미지 인코더 백엔드: torch(기본) | int8(동적 양자화) | onnx(onnxruntime CPU)
+
+CLIP_MODEL_NAME = os.environ.get('SMARTCHEF_CLIP_MODEL', 'openai/clip-vit-base-patch32')
+CLIP_BACKEND = os.environ.get('SMARTCHEF_CLIP_BACKEND', 'torch')
+CLIP_CACHE_DIR = os.environ.get('SMARTCHEF_CLIP_CACHE_DIR', 'cache/clip')
+CLIP_THREADS = int(os.environ.get('SMARTCHEF_CLIP_THREADS', '0'))
+CLIP_VOCABULARY = os.environ.get('SMARTCHEF_CLIP_VOCABULARY', 'ingredients.csv')
+
+# 다중 크롭 탐지: 사진을 grid × grid개의 겹치는 타일로 나누고 전체 사진과 함께 한 배치로 인코딩한다
+CLIP_GRID = int(os.environ.get('SMARTCHEF_CLIP_GRID', '3'))
+CLIP_OVERLAP = float(os.environ.get('SMARTCHEF_CLIP_OVERLAP', '0.25'))
+CLIP_BATCH = int(os.environ.get('SMARTCHEF_CLIP_BATCH', '16'))
+# 크롭마다 상위 몇 개의 재료만 후보로 삼는다 (어휘가 커져도 결과 수가 일정하다)
+CLIP_TOP_K = int(os.environ.get('SMARTCHEF_CLIP_TOP_K', '5'))
+# softmax 임계값은 어휘 크기에 맞춰 보정한다: 균등 확률(1/V)의 몇 배 이상인지
+# (0.45는 예전 45개 어휘에서의 1% 임계값과 같다)
+CLIP_THRESHOLD_RATIO = float(os.environ.get('SMARTCHEF_CLIP_THRESHOLD_RATIO', '0.45'))
+
+
+def load_vocabulary(path=None):
+    """Reads (english, korean) rows; returns the CLIP vocabulary and the english → korean mapping."""
+    with open(path or CLIP_VOCABULARY, encoding='utf-8', newline='') as f:
+        rows = [row for row in csv.DictReader(f) if row['english'].strip()]
+    vocabulary = [row['english'].strip() for row in rows]
+    translation = {row['english'].strip(): (row.get('korean') or '').strip() or row['english'].strip() for row in rows}
+    return vocabulary, translation
+
+
+def crop_boxes(width, height, grid, overlap):
+    """Overlapping grid tiles (left, upper, right, lower); the whole image comes first."""
+    boxes = [(0, 0, width, height)]
+    if grid <= 1:
+        return boxes
+    tile_w = min(width, width / grid * (1 + overlap))
+    tile_h = min(height, height / grid * (1 + overlap))
+    step_w = (width - tile_w) / (grid - 1)
+    step_h = (height - tile_h) / (grid - 1)
+    for row in range(grid):
+        for col in range(grid):
+            left, upper = round(col * step_w), round(row * step_h)
+            boxes.append((left, upper, min(width, round(left + tile_w)), min(height, round(upper + tile_h))))
+    return boxes
+
+
+def _normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _write_atomic(path, array):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def text_cache_path(model_name, vocabulary, cache_dir=None):
+    key = hashlib.sha256('\0'.join([model_name, *vocabulary]).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir or CLIP_CACHE_DIR, f'text-{key}.npy')
+
+
+class ClipRecognizer:
+    """CLIP zero-shot ingredient recognizer with cached vocabulary embeddings."""
+
+    def __init__(self, model_name=CLIP_MODEL_NAME, backend=CLIP_BACKEND, vocabulary_path=None):
+        import torch
+        from transformers import CLIPModel, CLIPProcessor
+
+        if CLIP_THREADS:
+            torch.set_num_threads(CLIP_THREADS)
+        self.torch = torch
+        self.model_name = model_name
+        self.backend = backend
+        self.vocabulary, self.translation = load_vocabulary(vocabulary_path)
+
+        with span('clip.load', model=model_name, backend=backend):
+            self.processor = CLIPProcessor.from_pretrained(model_name)
+            self.model = CLIPModel.from_pretrained(model_name).eval()
+            self.logit_scale = float(self.model.logit_scale.exp())
+            # 텍스트 임베딩은 양자화 전의 fp32 모델로 계산한다
+            self.text_embeddings = self._load_text_embeddings()
+            self._image_encoder = self._build_image_encoder()
+
+    def _load_text_embeddings(self):
+        path = text_cache_path(self.model_name, self.vocabulary)
+        with span('clip.text_embeddings', entries=len(self.vocabulary)) as s:
+            if os.path.exists(path):
+                embeddings = np.load(path)
+                if embeddings.shape[0] == len(self.vocabulary):
+                    s.set(cache_hit=True)
+                    return embeddings
+            s.set(cache_hit=False)
+            embeddings = self.encode_texts(self.vocabulary)
+            _write_atomic(path, embeddings)
+            return embeddings
+
+    def encode_texts(self, texts, batch_size=256):
+        """Returns L2-normalized float32 text embeddings."""
+        parts = []
+        with self.torch.inference_mode():
+            for start in range(0, len(texts), batch_size):
+                inputs = self.processor(text=texts[start:start + batch_size], return_tensors='pt', padding=True)
+                parts.append(self.model.get_text_features(**inputs).float().numpy())
+        return _normalize_rows(np.concatenate(parts)).astype(np.float32)
+
+    def _build_image_encoder(self):
+        if self.backend == 'int8':
+            quantized = self.torch.ao.quantization.quantize_dynamic(
+                self.model, {self.torch.nn.Linear}, dtype=self.torch.qint8
+            )
+            return self._torch_encoder(quantized)
+        if self.backend == 'onnx':
+            return self._onnx_encoder()
+        if self.backend != 'torch':
+            raise ValueError(f'unknown CLIP backend: {self.backend}')
+        return self._torch_encoder(self.model)
+
+    def _torch_encoder(self, model):
+        def encode(pixel_values):
+            with self.torch.inference_mode():
+                return model.get_image_features(pixel_values=self.torch.from_numpy(pixel_values)).float().numpy()
+        return encode
+
+    def _onnx_encoder(self):
+        import onnxruntime
+
+        path = os.path.join(CLIP_CACHE_DIR, f'{self.model_name.replace("/", "--")}-vision.onnx')
+        if not os.path.exists(path):
+            self._export_onnx(path)
+        session = onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+
+        def encode(pixel_values):
+            return session.run(None, {'pixel_values': pixel_values})[0]
+        return encode
+
+    def _export_onnx(self, path):
+        torch = self.torch
+        model = self.model
+
+        class VisionTower(torch.nn.Module):
+            def forward(self, pixel_values):
+                return model.get_image_features(pixel_values=pixel_values)
+
+        size = self.processor.image_processor.crop_size['height']
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with torch.inference_mode():
+            torch.onnx.export(
+                VisionTower(), torch.zeros(1, 3, size, size), tmp_path,
+                input_names=['pixel_values'], output_names=['image_embeds'],
+                dynamic_axes={'pixel_values': {0: 'batch'}, 'image_embeds': {0: 'batch'}}, opset_version=17
+            )
+        os.replace(tmp_path, path)
+
+    def encode_images(self, images):
+        """Returns L2-normalized image embeddings for a list of PIL images, CLIP_BATCH at a time."""
+        parts = []
+        for start in range(0, len(images), CLIP_BATCH):
+            inputs = self.processor(images=images[start:start + CLIP_BATCH], return_tensors='np')
+            parts.append(self._image_encoder(inputs['pixel_values'].astype(np.float32)))
+        return _normalize_rows(np.concatenate(parts)).astype(np.float32)
+
+    def probabilities(self, images):
+        # CLIP logits_per_image와 같은 계산: logit_scale * cos 유사도 → 어휘 전체에 대한 softmax
+        # 크롭 C개 × 어휘 V개를 한 번의 행렬곱으로 계산한다
+        logits = self.logit_scale * (self.encode_images(images) @ self.text_embeddings.T)
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        return probs / probs.sum(axis=1, keepdims=True)
+
+    def recognize(self, image, grid=None):
+        """Returns Korean names of detected ingredients, best first.
+
+        The photo is split into overlapping crops; an ingredient counts when it is in a crop's
+        top CLIP_TOP_K and its probability beats CLIP_THRESHOLD_RATIO / vocabulary size.
+        """
+        grid = CLIP_GRID if grid is None else grid
+        with span('clip.recognize', backend=self.backend, grid=grid, vocabulary=len(self.vocabulary)) as s:
+            crops = [image.crop(box) for box in crop_boxes(image.width, image.height, grid, CLIP_OVERLAP)]
+            probs = self.probabilities(crops)
+            threshold = CLIP_THRESHOLD_RATIO / len(self.vocabulary)
+            top_k = min(CLIP_TOP_K, probs.shape[1])
+            candidates = np.argpartition(-probs, top_k - 1, axis=1)[:, :top_k]
+
+            # 재료별로 크롭 중 가장 높은 확률을 점수로 쓴다
+            columns = candidates.ravel()
+            scores = probs[np.repeat(np.arange(len(crops)), top_k), columns]
+            best = {}
+            for column, score in zip(columns[scores > threshold], scores[scores > threshold]):
+                best[column] = max(best.get(column, 0.0), float(score))
+
+            found = [self.vocabulary[c] for c in sorted(best, key=best.get, reverse=True)]
+            s.set(crops=len(crops), ingredients=len(found))
+            return [self.translation.get(name, name) for name in found]
+
+
+def _prime(recognizer):
+    # 빈 사진을 한 번 인식해 이미지 인코더(ONNX 세션, torch 커널)를 미리 데운다
+    from PIL import Image
+
+    recognizer.recognize(Image.new('RGB', (224, 224)), grid=1)
+
+
+# 프로세스 전체에서 하나만, 처음 쓸 때 로드한다. torch가 없는 서버도 있으므로 준비 상태에서는 선택 자원이다
+#   python startup.py --resources clip
+get_recognizer = startup.resource('clip', ClipRecognizer, warm=_prime, optional=True)
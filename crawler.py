@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import csv
+import os
+import sqlite3
+import sys
+import threading
+import time
+from urllib.parse import urljoin
+
+import httpx
+from selectolax.lexbor import LexborHTMLParser
+
+import upstream
+from healthLookup import HEALTH_COLUMNS
+
+# 서울아산병원 질환별 식사요법 페이지 → health.csv (crawling.ipynb를 모듈로 옮긴 것)
+# - 목록/상세 페이지를 제한된 동시성과 요청 간격으로 비동기 요청한다
+# - ETag/Last-Modified 조건부 요청과 로컬 페이지 캐시로 바뀌지 않은 페이지는 다시 받거나 파싱하지 않는다
+# - health.csv는 임시 파일에 쓴 뒤 교체하고, 행 id는 질병명 기준으로 유지한다 (인덱스/조회 id와 맞춘다)
+# - --embed를 주면 ingest.py로 내용이 바뀐 행만 다시 임베딩한다
+#
+#   python crawler.py --out health.csv --embed pinecone
+#   python crawler.py --base-url http://127.0.0.1:8081 --out /tmp/health.csv    # 로컬 픽스처 서버
+
+BASE_URL = 'https://www.amc.seoul.kr'
+LIST_PATH = '/asan/healthinfo/mealtherapy/mealTherapyList.do'
+LIST_PAGES = 11
+LIST_LINKS = '#listForm dl > dt > a'
+MISSING = 'N/A'
+PAGE_CACHE_PATH = os.environ.get('SMARTCHEF_CRAWL_CACHE', 'cache/crawl_pages.sqlite3')
+USER_AGENT = 'SmartChef-crawler/1.0 (+https://hack.primer.kr/rounds/5/ideas/461)'
+
+
+def list_url(base_url, page):
+    return f'{base_url}{LIST_PATH}?pageIndex={page}&searchCondition=&searchKeyword=&mtId=19'
+
+
+def parse_list(html, base_url):
+    """[(질병명, 상세 페이지 URL)] from one list page."""
+    tree = LexborHTMLParser(html)
+    return [(a.text(strip=True), urljoin(base_url, a.attributes.get('href') or ''))
+            for a in tree.css(LIST_LINKS) if a.attributes.get('href')]
+
+
+def parse_detail(html):
+    """Section title → text; text nodes are stripped and joined like BeautifulSoup get_text(strip=True)."""
+    tree = LexborHTMLParser(html)
+    sections = {}
+    for dt in tree.css('dt'):
+        node = dt.next
+        while node is not None and node.tag != 'dd':
+            node = node.next
+        title = dt.text(strip=True)
+        if node is not None and title not in sections:
+            sections[title] = node.text(separator='', strip=True)
+    return {col: sections.get(col, MISSING) for col in HEALTH_COLUMNS[1:]}
+
+
+class PageCache:
+    """url → (etag, last_modified, body) so unchanged pages can be revalidated with a conditional GET."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, '
+            'body TEXT, fetched_at REAL)'
+        )
+        self.conn.commit()
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        with self._lock:
+            return self.conn.execute('SELECT etag, last_modified, body FROM pages WHERE url = ?', (url,)).fetchone()
+
+    def put(self, url, etag, last_modified, body):
+        with self._lock:
+            self.conn.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)',
+                              (url, etag, last_modified, body, time.time()))
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class Fetcher:
+    """Async GET with bounded concurrency, a minimum interval between requests and conditional revalidation."""
+
+    def __init__(self, client, cache, concurrency=4, interval=0.2, retries=3):
+        self.client = client
+        self.cache = cache
+        self.interval = interval
+        self.retries = retries
+        self.stats = {'requests': 0, 'not_modified': 0, 'changed': 0, 'unchanged': 0}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._pace = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def _polite(self):
+        # 요청 시작 간격을 interval 이상으로 벌린다
+        async with self._pace:
+            delay = self._next_start - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_start = time.monotonic() + self.interval
+
+    async def _request(self, url, headers):
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphore:
+                    await self._polite()
+                    self.stats['requests'] += 1
+                    response = await self.client.get(url, headers=headers)
+                if response.status_code != 304:
+                    response.raise_for_status()
+                return response
+            except httpx.HTTPError as e:
+                if not upstream.is_retryable(e) or attempt == self.retries:
+                    raise
+                await asyncio.sleep(upstream.retry_after(e) or self.interval * 2 ** attempt)
+
+    async def get(self, url):
+        """Returns (html, changed); changed is False when the server or the body says nothing changed."""
+        cached = self.cache.get(url)
+        headers = {}
+        if cached is not None:
+            etag, last_modified, _ = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        response = await self._request(url, headers)
+        if response.status_code == 304 and cached is not None:
+            self.stats['not_modified'] += 1
+            return cached[2], False
+
+        body = response.text
+        changed = cached is None or cached[2] != body
+        self.stats['changed' if changed else 'unchanged'] += 1
+        self.cache.put(url, response.headers.get('etag'), response.headers.get('last-modified'), body)
+        return body, changed
+
+
+def read_health_csv(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8', newline='') as f:
+        return [{'id': int(row['id']), **{col: row.get(col, '') for col in HEALTH_COLUMNS}} for row in csv.DictReader(f)]
+
+
+def write_health_csv(path, rows):
+    # 기존 파일과 같은 형식 (id 컬럼 두 개), 임시 파일에 다 쓴 뒤 교체한다
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'id'] + HEALTH_COLUMNS)
+        for row in sorted(rows, key=lambda r: r['id']):
+            writer.writerow([row['id'], row['id']] + [row[col] for col in HEALTH_COLUMNS])
+    os.replace(tmp_path, path)
+
+
+def merge_rows(existing, crawled, prune=False):
+    """Keeps ids stable by disease name; returns (rows, changed ids, added ids, removed ids)."""
+    by_name = {row['질병명']: row for row in existing}
+    next_id = max((row['id'] for row in existing), default=-1) + 1
+    rows, changed, added = [], [], []
+    for row in crawled:
+        old = by_name.pop(row['질병명'], None)
+        if old is None:
+            row = {'id': next_id, **row}
+            next_id += 1
+            added.append(row['id'])
+        else:
+            row = {'id': old['id'], **row}
+            if any(old[col] != row[col] for col in HEALTH_COLUMNS):
+                changed.append(row['id'])
+        rows.append(row)
+    # 사이트에서 사라진 질병은 --prune일 때만 지운다
+    removed = [row['id'] for row in by_name.values()] if prune else []
+    if not prune:
+        rows.extend(by_name.values())
+    return rows, changed, added, removed
+
+
+async def crawl(base_url, existing, cache, pages=LIST_PAGES, concurrency=4, interval=0.2, timeout=30):
+    """Crawls every list and detail page; returns (crawled rows in list order, fetcher stats)."""
+    known = {row['질병명']: row for row in existing}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits, follow_redirects=True,
+                                 headers={'User-Agent': USER_AGENT}) as client:
+        fetcher = Fetcher(client, cache, concurrency, interval)
+        list_pages = await asyncio.gather(*(fetcher.get(list_url(base_url, p)) for p in range(1, pages + 1)))
+        links = list(dict.fromkeys(link for html, _ in list_pages for link in parse_list(html, base_url)))
+
+        async def detail(name, url):
+            html, changed = await fetcher.get(url)
+            # 바뀌지 않은 페이지는 파싱하지 않고 기존 행을 그대로 쓴다
+            if not changed and name in known:
+                return {col: known[name][col] for col in HEALTH_COLUMNS}
+            return {'질병명': name, **parse_detail(html)}
+
+        rows = await asyncio.gather(*(detail(name, url) for name, url in links))
+    return rows, fetcher.stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Incrementally crawl the diet-therapy pages into health.csv.')
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--out', default=os.environ.get('SMARTCHEF_HEALTH_CSV', 'health.csv'))
+    parser.add_argument('--pages', type=int, default=LIST_PAGES)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--interval', type=float, default=0.2, help='minimum seconds between request starts')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--cache', default=PAGE_CACHE_PATH)
+    parser.add_argument('--prune', action='store_true', help='drop diseases that are no longer listed')
+    parser.add_argument('--embed', choices=['pinecone', 'local'], help='re-embed changed rows into the health namespace')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    existing = read_health_csv(args.out)
+    cache = PageCache(args.cache)
+    try:
+        crawled, stats = asyncio.run(crawl(args.base_url, existing, cache, args.pages, args.concurrency,
+                                           args.interval, args.timeout))
+    finally:
+        cache.close()
+    if not crawled:
+        raise SystemExit('no diseases found; leaving health.csv untouched')
+
+    rows, changed, added, removed = merge_rows(existing, crawled, args.prune)
+    if changed or added or removed or not existing:
+        write_health_csv(args.out, rows)
+    print(f"{len(crawled)} diseases in {time.perf_counter() - started:.1f}s: {len(added)} added, {len(changed)} changed, "
+          f"{len(removed)} removed; {stats['requests']} requests, {stats['not_modified']} not modified, "
+          f"{stats['unchanged']} unchanged", file=sys.stderr)
+
+    if args.embed and (changed or added or removed):
+        import ingest
+
+        # ingest는 행 텍스트 해시로 바뀐 행만 임베딩한다
+        ingest_args = [args.out, '--id-column', 'id', '--namespace', 'health', '--target', args.embed]
+        ingest.main(ingest_args + (['--prune'] if removed else []))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+
+import upstream
+from tracing import span
+
+# 디스크 기반 임베딩 캐시 (SQLite, LRU 제거)
+# 키: 모델명 + 정규화된 텍스트의 sha256
+# 적중한 항목의 접근 시간은 TOUCH_INTERVAL초보다 오래됐을 때만 갱신한다 (읽기마다 SQLite 쓰기를 하지 않도록)
+TOUCH_INTERVAL = 300.0
+
+
+def normalize_text(text):
+    text = unicodedata.normalize('NFC', str(text))
+    return ' '.join(text.split())
+
+
+def cache_key(model, text):
+    return hashlib.sha256(f'{model}\0{normalize_text(text)}'.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Disk-backed LRU cache of embedding vectors with hit/miss counters."""
+
+    def __init__(self, path, max_entries=100000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings ('
+            'key TEXT PRIMARY KEY, model TEXT, vector BLOB, last_access REAL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings (last_access)')
+        self._conn.commit()
+
+    def get_many(self, model, texts):
+        """Returns a list aligned with texts holding cached vectors or None."""
+        keys = [cache_key(model, t) for t in texts]
+        now = time.time()
+        with self._lock:
+            rows = {key: (vector, last_access) for key, vector, last_access in self._conn.execute(
+                f'SELECT key, vector, last_access FROM embeddings WHERE key IN ({",".join("?" * len(keys))})', keys
+            ).fetchall()} if keys else {}
+            stale = [(now, k) for k, (_, last_access) in rows.items() if now - last_access > TOUCH_INTERVAL]
+            if stale:
+                self._conn.executemany('UPDATE embeddings SET last_access = ? WHERE key = ?', stale)
+                self._conn.commit()
+            hits = sum(1 for k in keys if k in rows)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return [array('f', rows[k][0]).tolist() if k in rows else None for k in keys]
+
+    def put_many(self, model, texts, vectors):
+        now = time.time()
+        records = [(cache_key(model, t), model, array('f', v).tobytes(), now) for t, v in zip(texts, vectors)]
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)', records)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (count,) = self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                'DELETE FROM embeddings WHERE key IN '
+                '(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)',
+                (count - self.max_entries,)
+            )
+
+    def stats(self):
+        with self._lock:
+            (size,) = self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': size,
+            'max_entries': self.max_entries,
+        }
+
+
+def embed_with_cache(client, cache, model, texts):
+    """Embeds texts, sending every cache miss in one batched embeddings request."""
+    with span('embeddings', texts=len(texts)) as s:
+        vectors = cache.get_many(model, texts) if cache is not None else [None] * len(texts)
+
+        # 중복 텍스트는 한 번만 요청한다
+        pending, seen = [], set()
+        for text, vector in zip(texts, vectors):
+            if vector is None and normalize_text(text) not in seen:
+                seen.add(normalize_text(text))
+                pending.append(text)
+        s.set(cache_hits=len(texts) - len(pending), cache_hit=not pending)
+
+        if pending:
+            with span('embeddings.request', inputs=len(pending), input_chars=sum(len(t) for t in pending)) as r:
+                # 글자 수를 토큰 수의 상한으로 보고 분당 토큰 한도를 예약한다
+                response = upstream.call('openai', client.embeddings.create, input=[normalize_text(t) for t in pending],
+                                         model=model, tokens=sum(len(t) for t in pending))
+                if getattr(response, 'usage', None) is not None:
+                    r.set(tokens=response.usage.total_tokens)
+            fetched = [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+            if cache is not None:
+                cache.put_many(model, pending, fetched)
+            by_text = {normalize_text(t): v for t, v in zip(pending, fetched)}
+            vectors = [v if v is not None else by_text[normalize_text(t)] for t, v in zip(texts, vectors)]
+
+    return vectors
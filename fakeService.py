@@ -0,0 +1,22 @@
+import os
+import tempfile
+
+import fakes
+
+# 개발/부하 테스트용 진입점: service.py를 fakes.py 업스트림에 연결해서 띄운다 (실제 API 키, 네트워크 불필요)
+# 워커 프로세스마다 이 모듈을 import하므로 환경 설정과 가짜 설치도 워커마다 한 번씩 한다
+#
+#   python fakeService.py --workers 2 --port 8000
+#   SMARTCHEF_FAKE_SCALE=0.1 uvicorn fakeService:app     # 지연시간 배율
+
+fakes.configure_environment(tempfile.mkdtemp(prefix='smartchef-service-'))
+
+# 환경 변수를 먼저 설정한 뒤에 파이프라인 모듈을 import한다
+import service
+
+fakes.install(fakes.LatencyModel(scale=float(os.environ.get('SMARTCHEF_FAKE_SCALE', '1.0'))))
+app = service.app
+
+
+if __name__ == '__main__':
+    service.main(app_path='fakeService:app')
@@ -0,0 +1,275 @@
+import csv
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+# 벤치마크용 가짜 업스트림 (OpenAI, Pinecone, Replicate, 비전 HTTP 호출)
+# 지연시간 분포, 오류율, 응답 크기를 설정할 수 있고 시드로 재현 가능하다
+#   fakes.configure_environment(workdir)   파이프라인 모듈 import 전에: 캐시 경로, 로컬 백엔드
+#   fakes.install(fakes.LatencyModel())     import 후에: 공용 클라이언트와 인덱스를 가짜로 바꾼다
+# benchmark.py, fakeService.py가 쓴다
+
+RECIPE_CSV = 'LLM_structure_swkim/data/processed.csv'
+HEALTH_CSV = 'health.csv'
+
+# 단계별 기본 설정: 중앙값(ms), 로그정규 sigma, 오류율, 크기
+DEFAULT_PROFILE = {
+    'embeddings': {'median_ms': 120, 'sigma': 0.3, 'error_rate': 0.0, 'dimension': 1536},
+    'index': {'median_ms': 40, 'sigma': 0.4, 'error_rate': 0.0},
+    'chat': {'median_ms': 600, 'sigma': 0.3, 'error_rate': 0.0, 'token_ms': 8, 'response_chars': 3000},
+    'vision': {'median_ms': 2500, 'sigma': 0.3, 'error_rate': 0.0, 'ingredients': 8},
+    'tts': {'median_ms': 1500, 'sigma': 0.3, 'error_rate': 0.0, 'audio_bytes': 200000},
+    'image': {'median_ms': 2000, 'sigma': 0.4, 'error_rate': 0.0, 'image_bytes': 150000},
+}
+
+SAMPLE_INGREDIENTS = ['🥚계란', '🥔감자', '🥕당근', '🧅양파', '🥒오이', '🌶️고추', '🫑파프리카', '🍄버섯',
+                      '🥬배추', '🧄마늘', '🐟생선', '🥩소고기', '🍅토마토', '🧀치즈', '🥛우유', '🍎사과']
+
+
+class FakeUpstreamError(Exception):
+    def __init__(self, service):
+        super().__init__(f'injected {service} failure')
+        self.status_code = 503
+
+
+class LatencyModel:
+    """Samples per-service latency and injected failures from a seeded RNG."""
+
+    def __init__(self, profile=None, seed=0, scale=1.0):
+        self.profile = json.loads(json.dumps(DEFAULT_PROFILE))
+        for service, overrides in (profile or {}).items():
+            self.profile.setdefault(service, {}).update(overrides)
+        self.scale = scale
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def config(self, service):
+        return self.profile[service]
+
+    def sample(self, service):
+        cfg = self.profile[service]
+        with self._lock:
+            latency = cfg['median_ms'] * math.exp(self._rng.gauss(0, cfg.get('sigma', 0))) / 1000 * self.scale
+            failed = self._rng.random() < cfg.get('error_rate', 0)
+        return latency, failed
+
+    def wait(self, service):
+        latency, failed = self.sample(service)
+        time.sleep(latency)
+        if failed:
+            raise FakeUpstreamError(service)
+
+
+def _fake_vector(text, dimension):
+    # 텍스트마다 항상 같은 벡터
+    seed = int(hashlib.sha256(text.encode('utf-8')).hexdigest()[:16], 16)
+    rng = random.Random(seed)
+    return [rng.uniform(-1, 1) for _ in range(dimension)]
+
+
+def canned_recommendation(chars, variant=''):
+    recipe = {
+        'english_name': 'Potato and Egg Stir-fry', 'name': '감자달걀볶음',
+        'additional_ingredients': '소금, 식용유', 'all_ingredients': '감자, 계란, 양파, 소금, 식용유',
+        'steps': '', 'cooking_time': '20분',
+    }
+    body = {'chefTip': '', 'recipes': {}}
+    for key, name in (('first', '감자달걀볶음'), ('second', '당근달걀말이'), ('third', '버섯양파볶음')):
+        body['recipes'][key] = dict(recipe, name=name, english_name=f'Korean {key} dish {variant}'.strip())
+    filler = '1. 재료를 손질합니다.\n2. 팬을 달굽니다.\n'
+    step_chars = max(0, chars // 2 // 3)
+    for r in body['recipes'].values():
+        r['steps'] = (filler * (step_chars // len(filler) + 1))[:step_chars]
+    tip_chars = max(0, chars - len(json.dumps(body, ensure_ascii=False)))
+    body['chefTip'] = (f'[{variant}] ' + '싱겁게 드시고 채소를 충분히 드세요. ' * (tip_chars // 20 + 1))[:tip_chars]
+    return json.dumps(body, ensure_ascii=False)
+
+
+class _Embeddings:
+    def __init__(self, model):
+        self.model = model
+
+    def create(self, input, model, **kwargs):
+        self.model.wait('embeddings')
+        texts = [input] if isinstance(input, str) else list(input)
+        dimension = self.model.config('embeddings')['dimension']
+        data = [SimpleNamespace(index=i, embedding=_fake_vector(t, dimension)) for i, t in enumerate(texts)]
+        tokens = sum(len(t) for t in texts)
+        return SimpleNamespace(data=data, usage=SimpleNamespace(prompt_tokens=tokens, total_tokens=tokens))
+
+
+class _Completions:
+    def __init__(self, model):
+        self.model = model
+
+    def create(self, model, messages, stream=False, **kwargs):
+        cfg = self.model.config('chat')
+        # 같은 프롬프트에는 같은 응답 (이미지/TTS 캐시가 실제처럼 입력이 반복될 때만 적중한다)
+        variant = hashlib.sha256(messages[-1]['content'].encode('utf-8')).hexdigest()[:8]
+        content = canned_recommendation(cfg['response_chars'], variant)
+        prompt_tokens = sum(len(m['content']) for m in messages) // 2
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(content) // 2)
+        self.model.wait('chat')
+        if not stream:
+            message = SimpleNamespace(content=content)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+        return self._stream(content, usage, cfg.get('token_ms', 0) / 1000 * self.model.scale)
+
+    def _stream(self, content, usage, token_delay):
+        for start in range(0, len(content), 4):
+            time.sleep(token_delay)
+            delta = SimpleNamespace(content=content[start:start + 4])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+        yield SimpleNamespace(choices=[], usage=usage)
+
+
+class _SpeechResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_bytes(self, chunk_size=65536):
+        for start in range(0, len(self.data), chunk_size):
+            yield self.data[start:start + chunk_size]
+
+
+class _Speech:
+    def __init__(self, model):
+        self.model = model
+        self.with_streaming_response = self
+
+    def create(self, model, voice, input, **kwargs):
+        self.model.wait('tts')
+        return _SpeechResponse(b'\0' * self.model.config('tts')['audio_bytes'])
+
+
+class FakeOpenAI:
+    """Stands in for openai.OpenAI: embeddings, chat completions (incl. streaming), TTS and models.list."""
+
+    def __init__(self, model):
+        self.embeddings = _Embeddings(model)
+        self.chat = SimpleNamespace(completions=_Completions(model))
+        self.audio = SimpleNamespace(speech=_Speech(model))
+        self.models = SimpleNamespace(list=lambda: SimpleNamespace(data=[]))
+
+
+class FakeIndex:
+    """Stands in for the Pinecone index, answering from the bundled sample CSVs."""
+
+    def __init__(self, model, recipe_csv, health_csv):
+        self.model = model
+        with open(recipe_csv, encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            columns = [c for c in reader.fieldnames if c != 'Recipe_ID']
+            self.recipes = [(r['Recipe_ID'], ', '.join(f'{c}: {r[c]}' for c in columns)) for r in reader]
+        with open(health_csv, encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            columns = [c for c in dict.fromkeys(reader.fieldnames) if c != 'id']
+            self.health = [(r['id'], ', '.join(f'{c}: {r[c]}' for c in columns)) for r in reader]
+
+    def query(self, vector=None, top_k=10, namespace='', include_metadata=False, **kwargs):
+        self.model.wait('index')
+        rows = self.health if namespace == 'health' else self.recipes
+        offset = int(abs(vector[0]) * 1000) % len(rows) if vector else 0
+        matches = []
+        for rank in range(min(top_k, len(rows))):
+            row_id, text = rows[(offset + rank) % len(rows)]
+            match = {'id': row_id, 'score': 0.9 - rank * 0.01}
+            if include_metadata:
+                match['metadata'] = {'text': text}
+            matches.append(match)
+        return {'matches': matches, 'namespace': namespace}
+
+
+class _FakeHTTPResponse:
+    def __init__(self, body):
+        self.body = body
+        self.status_code = 200
+        self.headers = {}
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeRequests:
+    """Stands in for the shared requests session used by the vision call."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def post(self, url, headers=None, json=None, **kwargs):
+        self.model.wait('vision')
+        count = self.model.config('vision')['ingredients']
+        content = repr(SAMPLE_INGREDIENTS[:count])
+        return _FakeHTTPResponse({
+            'choices': [{'message': {'content': content}}],
+            'usage': {'prompt_tokens': 1000, 'completion_tokens': len(content) // 2},
+        })
+
+
+class _FileOutput:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+
+class FakeReplicate:
+    """Stands in for the shared replicate client."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def run(self, ref, input=None, **kwargs):
+        self.model.wait('image')
+        return [_FileOutput(b'\xff\xd8' + b'\0' * self.model.config('image')['image_bytes'])]
+
+
+def configure_environment(workdir, response_cache=False, vision_cache=False, recipe_store=True):
+    """Points caches and backends at workdir; call before importing the pipeline modules."""
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    os.environ['SMARTCHEF_INDEX_BACKEND'] = 'local'
+    os.environ['SMARTCHEF_LOCAL_INDEX_DIR'] = os.path.join(workdir, 'index')
+    os.environ['SMARTCHEF_RECIPE_CSV'] = RECIPE_CSV
+    os.environ['SMARTCHEF_EMBEDDING_CACHE'] = os.path.join(workdir, 'embeddings.sqlite3')
+    os.environ['SMARTCHEF_VISION_CACHE'] = os.path.join(workdir, 'vision_hashes.jsonl')
+    os.environ['SMARTCHEF_IMAGE_CACHE_DIR'] = os.path.join(workdir, 'images')
+    os.environ['SMARTCHEF_RESPONSE_CACHE'] = 'memory' if response_cache else 'off'
+    if not vision_cache:
+        os.environ['SMARTCHEF_VISION_HASH_TOLERANCE'] = '-1'
+    os.environ.pop('SMARTCHEF_TRACE_FILE', None)
+    # 레시피 저장소를 만들어 두면 레시피 검색은 ID만 받아오고 필드는 저장소에서 채운다
+    os.environ['SMARTCHEF_RECIPE_STORE'] = os.path.join(workdir, 'recipes')
+    if recipe_store:
+        import recipeStore
+
+        recipeStore.build([RECIPE_CSV], os.environ['SMARTCHEF_RECIPE_STORE'])
+    # 가짜 업스트림에는 할당량이 없으므로 분당 한도는 기본으로 끈다 (환경 변수로 지정하면 그 값으로 잰다)
+    for name in ('SMARTCHEF_OPENAI_RPM', 'SMARTCHEF_OPENAI_TPM', 'SMARTCHEF_REPLICATE_RPM'):
+        os.environ.setdefault(name, '0')
+
+
+def install(model):
+    """Swaps the shared upstream clients and the vector index for fakes driven by model."""
+    import llmStructure
+    import upstream
+
+    # 공용 클라이언트 자리에 가짜를 넣으면 속도 제한, 재시도 계층은 그대로 거친다
+    upstream.openai_client.set(FakeOpenAI(model))
+    upstream.http_session.set(FakeRequests(model))
+    upstream.replicate_client.set(FakeReplicate(model))
+    llmStructure.index.set(FakeIndex(model, RECIPE_CSV, HEALTH_CSV))
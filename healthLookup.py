@@ -0,0 +1,188 @@
+import csv
+import os
+import re
+import unicodedata
+
+# health.csv의 질병명으로 만든 메모리 조회 인덱스
+# 정확 일치 → 별칭 → 접미사('식', '식단', '병') 제거 → 문자 n-gram 유사도 순서로 찾는다
+
+HEALTH_COLUMNS = ["질병명", "식사요법의 필요성", "식사요법의 실제", "권장 식품", "주의 식품", "그 외 주의사항"]
+
+# 사용자가 흔히 입력하는 표현 → health.csv 질병명
+ALIASES = {
+    '당뇨': '당뇨병식',
+    '혈압': '고혈압식 / 폐성 고혈압식',
+    '콜레스테롤': '고지혈증식',
+    '고콜레스테롤': '고지혈증식',
+    '이상지질혈증': '고지혈증식',
+    '통풍': '저퓨린식',
+    '요산': '저퓨린식',
+    '위염': '급성/만성 위염식',
+    '역류성식도염': '위식도역류질환식',
+    '역류성': '위식도역류질환식',
+    '신부전': '만성신부전식',
+    '콩팥병': '만성신부전식',
+    '신장병': '만성신부전식',
+    '간염': '바이러스성 간염식',
+    '간경변': '간경화식',
+    '비만': '열량조절식',
+    '다이어트': '열량조절식',
+    '임신': '산모식',
+    '임산부': '산모식',
+    '갱년기': '폐경기 및 여성의 갱년기',
+    '폐경': '폐경기 및 여성의 갱년기',
+    '치매': '알츠하이머식',
+    '아토피': '아토피성 피부염식',
+    '알레르기': '식품 알레르기식',
+    '알러지': '식품 알레르기식',
+    '췌장염': '만성 췌장염식',
+    '담낭염': '만성담낭염식',
+    '심장병': '허혈성심장질환식',
+    '뇌졸중': '뇌졸중식',
+    '중풍': '뇌졸중식',
+    '저혈당': '저혈당증식',
+    '백혈병': '급만성 림프모구성백혈병식',
+    'copd': '만성폐쇄성폐질환식',
+    'pku': '페닐케톤뇨증, PKU',
+}
+
+SUFFIXES = ('식단', '식', '병', '증')
+CONDITION_SEPARATORS = re.compile(r'[,/·&+|\n]|\s및\s|\s그리고\s')
+# 퍼지 일치는 Dice 점수, 2등과의 차이, 짧은 쪽/긴 쪽 길이 비율이 모두 넘어야 한다
+FUZZY_THRESHOLD = 0.7
+FUZZY_MARGIN = 0.15
+FUZZY_LENGTH_RATIO = 0.8
+
+
+def normalize_name(name):
+    name = unicodedata.normalize('NFC', str(name)).lower()
+    return re.sub(r'[\s\-_()\[\]."\']', '', name)
+
+
+def _strip_suffixes(key):
+    # '고혈압식' → '고혈압', '당뇨병식' → '당뇨병' → '당뇨'
+    variants = [key]
+    changed = True
+    while changed:
+        changed = False
+        for suffix in SUFFIXES:
+            if key.endswith(suffix) and len(key) > len(suffix) + 1:
+                key = key[:-len(suffix)]
+                variants.append(key)
+                changed = True
+                break
+    return variants
+
+
+def _bigrams(key):
+    return {key[i:i + 2] for i in range(len(key) - 1)} or {key}
+
+
+def _length_ratio(a, b):
+    return min(len(a), len(b)) / max(len(a), len(b))
+
+
+def row_text(row):
+    return ', '.join(f'{col}: {row.get(col, "")}' for col in HEALTH_COLUMNS)
+
+
+class HealthLookup:
+    """Dictionary lookup from disease names to health.csv diet-therapy rows."""
+
+    def __init__(self, rows, ids=None):
+        self.rows = rows
+        # 문서 id는 health.csv의 id 컬럼 (crawler.py가 질병명 기준으로 유지, 인덱스와 같은 id). 없으면 행 번호
+        self.ids = [str(i) for i in ids] if ids is not None else [str(i) for i in range(len(rows))]
+        self.keys = {}
+        self.bigram_index = {}
+        self._grams = {}
+        for row_id, row in enumerate(rows):
+            # '고혈압식 / 폐성 고혈압식', '장폐색식, 또는 장유착식' 처럼 한 행에 여러 이름이 있다
+            names = [row['질병명']] + [n.replace('또는', '') for n in re.split(r'[/,]', row['질병명'])]
+            for name in names:
+                key = normalize_name(name)
+                if not key:
+                    continue
+                for variant in _strip_suffixes(key):
+                    self.keys.setdefault(variant, row_id)
+        for key, row_id in self.keys.items():
+            grams = _bigrams(key)
+            self._grams[key] = grams
+            for g in grams:
+                self.bigram_index.setdefault(g, set()).add(key)
+        self.aliases = {}
+        for alias, name in ALIASES.items():
+            row_id = self.keys.get(normalize_name(name))
+            if row_id is not None:
+                self.aliases[normalize_name(alias)] = row_id
+
+    @classmethod
+    def from_csv(cls, path):
+        if not os.path.exists(path):
+            return cls([])
+        with open(path, encoding='utf-8') as f:
+            records = list(csv.DictReader(f))
+        rows = [{col: r.get(col, '') for col in HEALTH_COLUMNS} for r in records]
+        ids = [r['id'] for r in records] if records and 'id' in records[0] else None
+        return cls(rows, ids)
+
+    def _match_exact(self, key):
+        for variant in _strip_suffixes(key):
+            if variant in self.keys:
+                return self.keys[variant], 1.0
+            if variant in self.aliases:
+                return self.aliases[variant], 0.95
+        return None
+
+    def _match_fuzzy(self, key):
+        # 공통 bigram이 있는 후보만 Dice 계수로 비교한다. '고혈당' → 고혈압식처럼 글자만 비슷한 다른 질병을 잡지 않도록
+        # 점수가 높고, 길이가 비슷하고, 2등과 차이가 날 때만 받아들인다. 아니면 None → 벡터 검색
+        for alias in self.aliases:
+            if len(alias) >= 2 and alias in key and _length_ratio(alias, key) >= FUZZY_LENGTH_RATIO:
+                return self.aliases[alias], 0.9
+        grams = _bigrams(key)
+        candidates = set()
+        for g in grams:
+            candidates |= self.bigram_index.get(g, set())
+        scores = {}
+        for candidate in candidates:
+            if _length_ratio(key, candidate) < FUZZY_LENGTH_RATIO:
+                continue
+            other = self._grams[candidate]
+            row_id = self.keys[candidate]
+            scores[row_id] = max(scores.get(row_id, 0), 2 * len(grams & other) / (len(grams) + len(other)))
+        if not scores:
+            return None
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        best = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0
+        if best[1] >= FUZZY_THRESHOLD and best[1] - runner_up >= FUZZY_MARGIN:
+            return best
+        return None
+
+    def match(self, condition):
+        """Returns (row_id, score) for one condition string, or None."""
+        key = normalize_name(condition)
+        if not key:
+            return None
+        return self._match_exact(key) or self._match_fuzzy(key)
+
+    def lookup(self, disease):
+        """Resolves every comma-separated condition; returns Pinecone-style matches."""
+        if not self.rows or not disease:
+            return []
+        conditions = CONDITION_SEPARATORS.split(disease)
+        matches, seen = [], set()
+        for condition in conditions:
+            found = self.match(condition)
+            if found is None or found[0] in seen:
+                continue
+            row_id, score = found
+            seen.add(row_id)
+            row = self.rows[row_id]
+            matches.append({
+                'id': self.ids[row_id],
+                'score': score,
+                'metadata': {'text': row_text(row), **row},
+            })
+        return matches
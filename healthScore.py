@@ -0,0 +1,173 @@
+import csv
+import os
+import re
+import threading
+
+import numpy as np
+
+from pantryIndex import SYNONYMS, parse_ingredient_details
+from promptBuilder import HEALTH_COLUMNS, parse_fields
+from textUtils import normalize_ingredient
+
+# 레시피 건강 점수: health.csv의 '권장 식품' / '주의 식품'을 시작 시 한 번 식품어 집합으로 만들고,
+# 레시피 재료 × 식품어 일치 행렬 하나로 후보 레시피 전체와 사용자의 모든 질병을 한 번에 채점한다
+#   점수 = 3 + 0.5 × 권장 식품 수(최대 4개) − 1 × 주의 식품 수, 1~5점 (★★★★☆)
+# LLM은 점수를 만들지 않고, 생성 전에 후보 레시피를 걸러내는 데에도 같은 점수를 쓴다
+
+BASE_SCORE = 3.0
+RECOMMENDED_POINTS = 0.5
+MAX_RECOMMENDED = 4
+CAUTION_POINTS = 1.0
+
+# 식품 목록에 섞여 있는 일반어는 식품어로 쓰지 않는다
+STOPWORDS = {'식품', '음식', '식사', '섭취', '주의', '제품', '기타', '것', '경우', '필요', '권장', '형태', '종류', '대부분',
+             '하루', '매일', '1일', '강화', '함유', '함유식품'}
+MAX_TERM_CHARS = 10
+# 한 글자 식품어는 이 목록에 있는 것만 쓴다 ('두류' → '두', '주류' → '주' 같은 조각은 버린다)
+SINGLE_CHAR_FOODS = {'김', '무', '밤', '배', '떡', '밥', '빵', '귤', '굴', '꿀', '감', '콩', '쌀', '밀', '술', '잣', '햄'}
+_NUMBERING = re.compile(r'\d+\.')
+# '3잔이상', '250~300ml', '40~60g' 같은 양 표현
+_QUANTITY = re.compile(r'\d[\d~.]*\s*[^\s,()/]*')
+# '김치섭취를 줄입니다.' 같은 문장 조각
+_SENTENCE_ENDING = re.compile(r'(?:니다|십시오|세요)$')
+_BULLETS = '-–•*~.'
+_LABEL = re.compile(r'[^\s,:()]+\s*:')
+_SEPARATORS = re.compile(r'[,()/·\n\[\]]|\s(?:및|그리고|또는)\s')
+
+
+def food_terms(text):
+    """'카페인(커피, 콜라), 주류(소주, 맥주 등)' → ['카페인', '커피', '콜라', '주류', '소주', '맥주']."""
+    text = _QUANTITY.sub(' ', _LABEL.sub(',', _NUMBERING.sub(',', str(text))))
+    terms = []
+    for piece in _SEPARATORS.split(text):
+        # '- 우유 및 유제품'처럼 글머리표로 시작하는 항목
+        words = [w.strip(_BULLETS) for w in piece.split()]
+        words = [w for w in words if w and w != '등' and w not in STOPWORDS]
+        if not words:
+            continue
+        candidates = []
+        if len(words) <= 3:
+            candidates.append(normalize_ingredient(''.join(words)))
+        # '제철 과일과 우유' 같은 구절은 마지막 낱말('우유')도 식품어로 쓴다
+        if 1 < len(words) <= 4:
+            candidates.append(normalize_ingredient(words[-1]))
+        for term in candidates:
+            term = term.strip(_BULLETS).removesuffix('등')
+            if not _is_food_term(term):
+                continue
+            terms.append(SYNONYMS.get(term, term))
+            # '김치류' → '김치'
+            if term.endswith('류') and _is_food_term(term[:-1]):
+                terms.append(term[:-1])
+    return list(dict.fromkeys(terms))
+
+
+def _is_food_term(term):
+    if len(term) < 2 and term not in SINGLE_CHAR_FOODS:
+        return False
+    return term not in STOPWORDS and len(term) <= MAX_TERM_CHARS and not _SENTENCE_ENDING.search(term)
+
+
+def recipe_tokens(ingredients):
+    """Ingredient tokens of a recipe, from a string ('감자 2개, 소금 약간') or a list; staples are kept."""
+    if not isinstance(ingredients, str):
+        ingredients = '|'.join(str(i) for i in ingredients)
+    return parse_ingredient_details(re.sub(r'[,\n]', '|', ingredients), staples=())
+
+
+def stars(score):
+    # round()는 2.5 → 2, 3.5 → 4처럼 짝수 쪽으로 반올림하므로 0.5는 항상 올린다
+    filled = int(score + 0.5)
+    return '★' * filled + '☆' * (5 - filled)
+
+
+class HealthScorer:
+    """Condition × food-term masks from health.csv for vectorized recipe scoring."""
+
+    def __init__(self, rows):
+        # rows: health.csv 행. 문서 id는 id 컬럼 (crawler.py가 질병명 기준으로 유지), 없으면 행 번호
+        self.row_of_id = {str(row.get('id', i)): i for i, row in enumerate(rows)}
+        self.vocabulary = {}
+        recommended, caution = [], []
+        for row in rows:
+            recommended.append([self._term_id(t) for t in food_terms(row.get('권장 식품', ''))])
+            caution.append([self._term_id(t) for t in food_terms(row.get('주의 식품', ''))])
+        self.terms = np.array(list(self.vocabulary) or [''])
+        self._term_lengths = np.char.str_len(self.terms)
+        self.recommended = np.zeros((len(rows), len(self.terms)), dtype=bool)
+        self.caution = np.zeros((len(rows), len(self.terms)), dtype=bool)
+        for row, (good, bad) in enumerate(zip(recommended, caution)):
+            self.recommended[row, good] = True
+            self.caution[row, bad] = True
+        # 같은 질병에서 권장이기도 한 식품어('자반 생선류'의 '생선' 등)는 주의 식품으로 세지 않는다
+        self.caution &= ~self.recommended
+        self._token_columns = {}
+        self._lock = threading.Lock()
+
+    def _term_id(self, term):
+        return self.vocabulary.setdefault(term, len(self.vocabulary))
+
+    @classmethod
+    def from_csv(cls, path):
+        if not os.path.exists(path):
+            return cls([])
+        with open(path, encoding='utf-8', newline='') as f:
+            return cls(list(csv.DictReader(f)))
+
+    def columns(self, token):
+        """Food-term columns an ingredient token matches: exact, or a ≥2-character term inside it ('김치' ⊂ '배추김치')."""
+        with self._lock:
+            cols = self._token_columns.get(token)
+        if cols is None:
+            contained = np.char.find(np.full(len(self.terms), token), self.terms) >= 0
+            hits = (self.terms == token) | ((self._term_lengths >= 2) & contained)
+            cols = np.flatnonzero(hits)
+            with self._lock:
+                self._token_columns[token] = cols
+        return cols
+
+    def condition_masks(self, health_matches):
+        """ORs the recommended/caution masks of every matched condition.
+
+        Matches are health.csv rows by id; anything else is parsed from its metadata text.
+        """
+        recommended = np.zeros(len(self.terms), dtype=bool)
+        caution = np.zeros(len(self.terms), dtype=bool)
+        for match in health_matches:
+            row = self.row_of_id.get(str(match.get('id', '')))
+            if row is not None:
+                recommended |= self.recommended[row]
+                caution |= self.caution[row]
+                continue
+            fields = parse_fields(match.get('metadata', {}).get('text', ''), HEALTH_COLUMNS)
+            for mask, column in ((recommended, '권장 식품'), (caution, '주의 식품')):
+                ids = [self.vocabulary[t] for t in food_terms(fields.get(column, '')) if t in self.vocabulary]
+                mask[ids] = True
+        return recommended, caution
+
+    def match_matrix(self, recipes):
+        """Recipe × food-term boolean matrix for a list of ingredient-token sets."""
+        matrix = np.zeros((len(recipes), len(self.terms)), dtype=bool)
+        for row, tokens in enumerate(recipes):
+            for token in tokens:
+                matrix[row, self.columns(token)] = True
+        return matrix
+
+    def score(self, recipes, health_matches):
+        """Returns (scores, caution foods per recipe); scores is None when no condition is known."""
+        recommended, caution = self.condition_masks(health_matches)
+        if not recommended.any() and not caution.any():
+            return None, [[] for _ in recipes]
+        matrix = self.match_matrix(recipes)
+        good = np.minimum(matrix.astype(np.int32) @ recommended, MAX_RECOMMENDED)
+        bad_matrix = matrix & caution
+        scores = np.clip(BASE_SCORE + RECOMMENDED_POINTS * good - CAUTION_POINTS * bad_matrix.sum(axis=1), 1, 5)
+        return scores, [self.terms[np.flatnonzero(row)].tolist() for row in bad_matrix]
+
+    def annotate(self, recipes, health_matches):
+        """Sets health_score (stars) and caution_foods on recipe dicts with an all_ingredients field."""
+        scores, cautions = self.score([recipe_tokens(r.get('all_ingredients', '')) for r in recipes], health_matches)
+        for n, recipe in enumerate(recipes):
+            recipe['health_score'] = stars(scores[n]) if scores is not None else ''
+            recipe['caution_foods'] = cautions[n]
+        return recipes
@@ -0,0 +1,86 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import upstream
+from tracing import span, submit
+
+# 레시피 이미지 생성 (FLUX) + 내용 주소 기반 디스크 캐시
+# 같은 요리(english_name + 프롬프트)는 한 번만 생성하고 이후에는 로컬 바이트를 돌려준다
+
+IMAGE_MODEL = "black-forest-labs/flux-schnell"
+IMAGE_CACHE_DIR = os.environ.get('SMARTCHEF_IMAGE_CACHE_DIR', 'cache/images')
+
+image_executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix='image')
+_in_flight = {}
+_in_flight_lock = threading.RLock()
+
+
+def recipe_image_prompt(english_name):
+    return f"Realistically, {english_name}, and Korean style food, Only Food, tasty, dynamic shot"
+
+
+def image_cache_key(english_name, prompt):
+    name = ' '.join(str(english_name).lower().split())
+    return hashlib.sha256(f'{IMAGE_MODEL}\0{name}\0{prompt}'.encode('utf-8')).hexdigest()
+
+
+def image_cache_path(key):
+    return os.path.join(IMAGE_CACHE_DIR, key[:2], key)
+
+
+def _read_output(output):
+    # replicate.run은 FileOutput 목록 또는 URL 문자열 목록을 돌려준다
+    item = output[0] if isinstance(output, (list, tuple)) else output
+    if hasattr(item, 'read'):
+        return item.read()
+    response = upstream.http_session().get(str(item), timeout=upstream.get('replicate').timeout)
+    response.raise_for_status()
+    return response.content
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def generate_recipe_image(english_name):
+    """Returns image bytes for a dish, generating and caching them on a miss."""
+    prompt = recipe_image_prompt(english_name)
+    path = image_cache_path(image_cache_key(english_name, prompt))
+    with span('image.generate') as s:
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+            s.set(cache_hit=True, image_bytes=len(data))
+            return data
+
+        s.set(cache_hit=False)
+        with span('image.replicate'):
+            output = upstream.call('replicate', upstream.replicate_client().run, IMAGE_MODEL, input={"prompt": prompt})
+        with span('image.download'):
+            data = _read_output(output)
+        _write_atomic(path, data)
+        s.set(image_bytes=len(data))
+        return data
+
+
+def submit_recipe_image(english_name):
+    """Schedules image generation; concurrent requests for the same dish share one future."""
+    key = image_cache_key(english_name, recipe_image_prompt(english_name))
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        if future is None:
+            future = submit(image_executor, generate_recipe_image, english_name)
+            _in_flight[key] = future
+            future.add_done_callback(lambda _: _forget(key))
+        return future
+
+
+def _forget(key):
+    with _in_flight_lock:
+        _in_flight.pop(key, None)
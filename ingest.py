@@ -0,0 +1,212 @@
+import argparse
+import csv
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import upstream
+
+# 레시피(또는 health.csv) 코퍼스를 벡터 인덱스에 적재하는 배치 파이프라인
+# - CSV를 청크 단위로 읽고, 행 텍스트 해시가 바뀐 행만 임베딩한다
+# - 임베딩은 큰 배치로, 제한된 동시성으로 요청한다
+# - 업서트가 끝난 배치마다 상태 DB에 기록하므로 중단되어도 이어서 진행한다
+# - 인덱스를 지우지 않고 필요한 행만 덮어쓴다 (--prune 시 사라진 행만 삭제)
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+DEFAULT_CSV = 'LLM_structure_swkim/data/whole_processed.csv'
+DEFAULT_STATE = 'cache/ingest_state.sqlite3'
+
+csv.field_size_limit(sys.maxsize)
+
+
+def row_text(row, columns):
+    # 노트북의 pandas 변환과 같은 형식: "col: val, col: val, ..." (빈 값은 nan)
+    return ', '.join(f'{col}: {row.get(col) or "nan"}' for col in columns)
+
+
+def row_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def read_chunks(path, id_column, chunk_size):
+    """Streams (id, text) pairs from the CSV in chunks without loading the whole file."""
+    with open(path, encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        columns = [c for c in dict.fromkeys(reader.fieldnames) if c != id_column]
+        chunk = []
+        for row in reader:
+            chunk.append((str(row[id_column]), row_text(row, columns)))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+class IngestState:
+    """Per-namespace checkpoint of which row hashes are already in the index."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS rows ('
+            'namespace TEXT, id TEXT, hash TEXT, text TEXT, embedding BLOB, '
+            'PRIMARY KEY (namespace, id))'
+        )
+        self.conn.commit()
+
+    def known_hashes(self, namespace, ids):
+        hashes = {}
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            hashes.update(self.conn.execute(
+                f'SELECT id, hash FROM rows WHERE namespace = ? AND id IN ({",".join("?" * len(batch))})',
+                [namespace] + batch
+            ).fetchall())
+        return hashes
+
+    def record(self, namespace, records):
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?, ?)',
+            [(namespace, i, row_hash(t), t, array('f', v).tobytes()) for i, t, v in records]
+        )
+        self.conn.commit()
+
+    def all_ids(self, namespace):
+        return [r[0] for r in self.conn.execute('SELECT id FROM rows WHERE namespace = ?', (namespace,))]
+
+    def forget(self, namespace, ids):
+        self.conn.executemany('DELETE FROM rows WHERE namespace = ? AND id = ?', [(namespace, i) for i in ids])
+        self.conn.commit()
+
+    def iter_rows(self, namespace):
+        for row_id, text, blob in self.conn.execute(
+            'SELECT id, text, embedding FROM rows WHERE namespace = ? ORDER BY id', (namespace,)
+        ):
+            yield row_id, text, array('f', blob).tolist()
+
+
+def embed_batch(client, texts):
+    # 재시도와 분당 요청/토큰 한도는 upstream 계층이 맡는다
+    response = upstream.call('openai', client.embeddings.create, input=texts, model=EMBEDDING_MODEL,
+                             tokens=sum(len(t) for t in texts))
+    return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
+
+def upsert_batches(index, namespace, records, batch_size):
+    for start in range(0, len(records), batch_size):
+        batch = records[start:start + batch_size]
+        index.upsert(
+            vectors=[{'id': i, 'values': v, 'metadata': {'text': t}} for i, t, v in batch],
+            namespace=namespace
+        )
+
+
+def ingest_rows(chunks, client, state, index=None, namespace='', embed_batch_size=256,
+                upsert_batch_size=100, concurrency=4, log=print):
+    """Embeds and upserts only new or changed rows; returns (seen_ids, stats)."""
+    seen_ids = set()
+    stats = {'rows': 0, 'skipped': 0, 'embedded': 0}
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for chunk in chunks:
+            ids = [i for i, _ in chunk]
+            seen_ids.update(ids)
+            known = state.known_hashes(namespace, ids)
+            changed = [(i, t) for i, t in chunk if known.get(i) != row_hash(t)]
+            stats['rows'] += len(chunk)
+            stats['skipped'] += len(chunk) - len(changed)
+
+            batches = [changed[s:s + embed_batch_size] for s in range(0, len(changed), embed_batch_size)]
+            futures = [executor.submit(embed_batch, client, [t for _, t in b]) for b in batches]
+            for batch, future in zip(batches, futures):
+                records = [(i, t, v) for (i, t), v in zip(batch, future.result())]
+                if index is not None:
+                    upsert_batches(index, namespace, records, upsert_batch_size)
+                # 업서트가 끝난 뒤에 체크포인트를 남긴다
+                state.record(namespace, records)
+                stats['embedded'] += len(records)
+
+            elapsed = time.perf_counter() - started
+            log(f"rows={stats['rows']} embedded={stats['embedded']} skipped={stats['skipped']} "
+                f"({stats['rows'] / elapsed:.1f} rows/s)")
+
+    return seen_ids, stats
+
+
+def prune(state, index, namespace, seen_ids, batch_size=1000):
+    stale = [i for i in state.all_ids(namespace) if i not in seen_ids]
+    for start in range(0, len(stale), batch_size):
+        batch = stale[start:start + batch_size]
+        if index is not None:
+            index.delete(ids=batch, namespace=namespace)
+        state.forget(namespace, batch)
+    return len(stale)
+
+
+def build_local(state, root, namespace, dtype='float32', nlist=0):
+    from localIndex import build_namespace
+
+    ids, vectors, metadatas = [], [], []
+    for row_id, text, vector in state.iter_rows(namespace):
+        ids.append(row_id)
+        vectors.append(vector)
+        metadatas.append({'text': text})
+    if ids:
+        build_namespace(root, namespace, ids, vectors, metadatas, dtype=dtype, nlist=nlist)
+    return len(ids)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Incrementally embed a CSV corpus into the recipe index.')
+    parser.add_argument('csv', nargs='?', default=DEFAULT_CSV)
+    parser.add_argument('--id-column', default='Recipe_ID')
+    parser.add_argument('--namespace', default='')
+    parser.add_argument('--target', choices=['pinecone', 'local'], default='pinecone')
+    parser.add_argument('--index-name', default='receipe')
+    parser.add_argument('--local-dir', default=os.environ.get('SMARTCHEF_LOCAL_INDEX_DIR', 'index'))
+    parser.add_argument('--local-dtype', choices=['float32', 'int8'], default='float32')
+    parser.add_argument('--local-nlist', type=int, default=0)
+    parser.add_argument('--state', default=DEFAULT_STATE)
+    parser.add_argument('--chunk-size', type=int, default=2000)
+    parser.add_argument('--embed-batch', type=int, default=256)
+    parser.add_argument('--upsert-batch', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--prune', action='store_true', help='delete ids that no longer appear in the CSV')
+    args = parser.parse_args(argv)
+
+    client = upstream.openai_client()
+    state = IngestState(args.state)
+
+    index = None
+    if args.target == 'pinecone':
+        from pinecone.grpc import PineconeGRPC as Pinecone
+        index = Pinecone(api_key=os.environ['PINECONE_API_KEY']).Index(args.index_name)
+
+    chunks = read_chunks(args.csv, args.id_column, args.chunk_size)
+    seen_ids, stats = ingest_rows(
+        chunks, client, state, index=index, namespace=args.namespace,
+        embed_batch_size=args.embed_batch, upsert_batch_size=args.upsert_batch,
+        concurrency=args.concurrency
+    )
+
+    if args.prune:
+        print(f'pruned {prune(state, index, args.namespace, seen_ids)} stale rows')
+
+    if args.target == 'local':
+        count = build_local(state, args.local_dir, args.namespace, args.local_dtype, args.local_nlist)
+        print(f'wrote {count} vectors to {args.local_dir}')
+
+    print(f"done: {stats['embedded']} embedded, {stats['skipped']} unchanged")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import json
+
+# 스트리밍으로 들어오는 gptOutput JSON을 조각 단위로 파싱한다
+# chefTip 문자열과 recipes의 각 레시피 객체가 완성되는 즉시 이벤트로 돌려준다
+
+
+class RecommendationStreamParser:
+    """Incremental scanner for {"chefTip": "...", "recipes": {"first": {...}, ...}}."""
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.emitted = set()
+
+    def feed(self, chunk):
+        """Consumes a chunk of model output and returns newly completed events."""
+        self.buffer += chunk
+        events = []
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    self._string_done(self.string_start, self.pos + 1, events)
+            elif ch == '"':
+                self.in_string = True
+                self.string_start = self.pos
+            elif ch in '{[':
+                self.stack.append({
+                    'kind': ch,
+                    'path': self._child_path(),
+                    'start': self.pos,
+                    'key': None,
+                    'expect_key': ch == '{',
+                })
+            elif ch in '}]':
+                if self.stack:
+                    frame = self.stack.pop()
+                    self._value_done(frame['path'], frame['start'], self.pos + 1, events)
+            elif ch == ',' and self.stack and self.stack[-1]['kind'] == '{':
+                self.stack[-1]['expect_key'] = True
+            elif ch == ':' and self.stack:
+                self.stack[-1]['expect_key'] = False
+            self.pos += 1
+        return events
+
+    def _child_path(self):
+        if not self.stack:
+            return ()
+        parent = self.stack[-1]
+        return parent['path'] + (parent['key'],)
+
+    def _string_done(self, start, end, events):
+        if not self.stack:
+            return
+        top = self.stack[-1]
+        if top['kind'] == '{' and top['expect_key']:
+            top['key'] = json.loads(self.buffer[start:end])
+            return
+        self._value_done(self._child_path(), start, end, events)
+
+    def _value_done(self, path, start, end, events):
+        if path in self.emitted:
+            return
+        if path == ('chefTip',):
+            self.emitted.add(path)
+            events.append(('chefTip', json.loads(self.buffer[start:end])))
+        elif len(path) == 2 and path[0] == 'recipes' and self.buffer[start] == '{':
+            self.emitted.add(path)
+            events.append(('recipe', path[1], json.loads(self.buffer[start:end])))
+
+    def result(self):
+        """Parses the full buffered output once the stream has ended."""
+        text = self.buffer.strip()
+        start, end = text.find('{'), text.rfind('}')
+        return json.loads(text[start:end + 1])
@@ -1,56 +1,192 @@
-from openai import OpenAI
-from pinecone.grpc import PineconeGRPC as Pinecone
-import pandas as pd
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from embeddingCache import EmbeddingCache, embed_with_cache
+from healthLookup import HealthLookup
+from healthScore import HealthScorer, recipe_tokens
+from pantryIndex import PANTRY_WEIGHT, PantryIndex, rerank
+from promptBuilder import PROMPT_TOKEN_BUDGET, compact_health, compact_recipes, count_tokens, fit_to_budget, recipe_fields
+from recipeStore import RecipeStore
+from responseCache import response_cache_from_env, response_cache_key
+from tracing import span, submit
+import startup
+import upstream
 
-OPENAI_API_KEY = os.environ['OPENAI_API_KEY']
-PINECONE_API_KEY = os.environ['PINECONE_API_KEY']
+# 벡터 인덱스 백엔드 선택: 'pinecone' (기본) 또는 'local' (네트워크 없이 메모리맵 인덱스 사용)
+INDEX_BACKEND = os.environ.get('SMARTCHEF_INDEX_BACKEND', 'pinecone')
+LOCAL_INDEX_DIR = os.environ.get('SMARTCHEF_LOCAL_INDEX_DIR', 'index')
 
-client = OpenAI(api_key=OPENAI_API_KEY)
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index('receipe')
+EMBEDDING_MODEL = "text-embedding-ada-002"
+CHAT_MODEL = "gpt-4o-mini"
+# 분당 토큰 한도 예약용 응답 길이 추정치 (실제 사용량이 오면 보정한다)
+COMPLETION_TOKEN_ESTIMATE = 1500
+# 프롬프트 문구를 바꾸면 올려서 이전 응답 캐시를 무효화한다
+PROMPT_VERSION = '3'
+EMBEDDING_CACHE_PATH = os.environ.get('SMARTCHEF_EMBEDDING_CACHE', 'cache/embeddings.sqlite3')
 
-def request_query_recipe(query):
-    response = client.embeddings.create(
-        input=query,
-        model="text-embedding-ada-002"
-    )
+# 레시피는 넓은 후보에서 냉장고 재료 충족률로 재정렬해 RECIPE_POOL개를 남기고,
+# 건강 점수로 주의 식품이 든 후보를 뒤로 보낸 뒤 상위 RECIPE_TOP_K개만 프롬프트에 넣는다
+RECIPE_TOP_K = 6
+RECIPE_POOL = int(os.environ.get('SMARTCHEF_RECIPE_POOL', '12'))
+RECIPE_CANDIDATES = int(os.environ.get('SMARTCHEF_RECIPE_CANDIDATES', '30'))
+RECIPE_CSV = os.environ.get('SMARTCHEF_RECIPE_CSV', 'LLM_structure_swkim/data/whole_processed.csv')
+# recipeStore.py로 만든 레시피 저장소가 있으면 벡터 검색은 ID와 점수만 받고 필드는 로컬에서 채운다
+RECIPE_STORE_DIR = os.environ.get('SMARTCHEF_RECIPE_STORE', 'index/recipes')
+
+# 검색 단계별 타임아웃 (초)
+STAGE_TIMEOUTS = {
+    'embed': float(os.environ.get('SMARTCHEF_TIMEOUT_EMBED', '10')),
+    'recipe': float(os.environ.get('SMARTCHEF_TIMEOUT_RECIPE', '10')),
+    'health': float(os.environ.get('SMARTCHEF_TIMEOUT_HEALTH', '10')),
+}
+
+HEALTH_CSV = os.environ.get('SMARTCHEF_HEALTH_CSV', 'health.csv')
+retrieval_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='retrieval')
+
+
+def _open_index():
+    if INDEX_BACKEND == 'local':
+        from localIndex import LocalIndex
+        return LocalIndex(LOCAL_INDEX_DIR, nprobe=int(os.environ.get('SMARTCHEF_LOCAL_INDEX_NPROBE', '8')))
+    from pinecone.grpc import PineconeGRPC as Pinecone
+    pc = Pinecone(api_key=os.environ['PINECONE_API_KEY'])
+    return pc.Index('receipe')
+
+
+def _warm_index(opened):
+    # 로컬 인덱스는 벡터 파일을 페이지 캐시에 올리고, Pinecone은 gRPC 채널을 열어 둔다
+    if hasattr(opened, 'preload'):
+        opened.preload(['', 'health'])
+    elif hasattr(opened, 'describe_index_stats'):
+        opened.describe_index_stats()
+
+
+def _open_embedding_cache():
+    return EmbeddingCache(EMBEDDING_CACHE_PATH,
+                          max_entries=int(os.environ.get('SMARTCHEF_EMBEDDING_CACHE_SIZE', '100000')))
+
+# 무거운 객체는 import 때 만들지 않고 처음 쓸 때(또는 startup.warm_up) 한 번만 만든다
+#   index()            벡터 인덱스 (Pinecone 또는 localIndex.py)
+#   health_lookup()    health.csv 질병명 조회 인덱스
+#   health_scorer()    권장/주의 식품 행렬
+#   pantry_index()     재료 역색인 (CSV가 없으면 후보 메타데이터에서 바로 파싱)
+#   recipe_store()     레시피 저장소 (만들지 않았으면 None)
+#   response_cache()   SMARTCHEF_RESPONSE_CACHE = memory(기본) | disk | off (off면 None)
+# OpenAI 클라이언트는 upstream.py가 프로세스 전체에 하나만 만든다 (연결 풀, 속도 제한, 재시도)
+index = startup.resource('index', _open_index, warm=_warm_index)
+health_lookup = startup.resource('health_lookup', lambda: HealthLookup.from_csv(HEALTH_CSV))
+health_scorer = startup.resource('health_scorer', lambda: HealthScorer.from_csv(HEALTH_CSV))
+pantry_index = startup.resource('pantry_index', lambda: PantryIndex.from_csv(RECIPE_CSV))
+recipe_store = startup.resource('recipe_store', lambda: RecipeStore.open(RECIPE_STORE_DIR))
+embedding_cache = startup.resource('embedding_cache', _open_embedding_cache)
+response_cache = startup.resource('response_cache', response_cache_from_env)
+
+
+def embed_texts(texts):
+    # 캐시에 없는 텍스트만 모아서 한 번의 embeddings 요청으로 보낸다
+    return embed_with_cache(upstream.openai_client(), embedding_cache(), EMBEDDING_MODEL, texts)
+
+
+def _ingredient_details(match):
+    return recipe_fields(match).get('Ingredient_Details', '')
 
-    embedded_query=response.data[0].embedding
-    results=index.query(embedded_query, top_k=6, include_metadata=True)
 
+def _query_recipes(embedded_query, top_k):
+    store = recipe_store()
+    if store is None:
+        with span('index.query', namespace='', top_k=top_k, metadata=True) as s:
+            results=index().query(embedded_query, top_k=top_k, include_metadata=True)
+            s.set(matches=len(results['matches']))
+        return results['matches']
+
+    with span('index.query', namespace='', top_k=top_k, metadata=False) as s:
+        results=index().query(embedded_query, top_k=top_k, include_metadata=False)
+        s.set(matches=len(results['matches']))
+    with span('recipes.hydrate') as s:
+        matches = [{'id': str(m['id']), 'score': float(m['score'])} for m in results['matches']]
+        complete = store.hydrate(matches)
+        s.set(missing=sum(1 for m in matches if 'recipe' not in m))
+    if complete:
+        return matches
+    # 저장소에 없는 ID(다른 CSV로 적재된 인덱스 등)가 있으면 이번 검색만 메타데이터를 받아온다
+    with span('index.query', namespace='', top_k=top_k, metadata=True):
+        results=index().query(embedded_query, top_k=top_k, include_metadata=True)
     return results['matches']
 
-def request_query_health(query):
-    response = client.embeddings.create(
-        input=query,
-        model="text-embedding-ada-002"
-    )
 
-    embedded_query=response.data[0].embedding
-    results=index.query(embedded_query, top_k=3, include_metadata=True, namespace='health')
+def request_query_recipe(query, embedded_query=None, ingredients=None):
+    if embedded_query is None:
+        embedded_query = embed_texts([query])[0]
+    rerank_enabled = ingredients is not None and PANTRY_WEIGHT > 0 and RECIPE_CANDIDATES > RECIPE_POOL
+    top_k = RECIPE_CANDIDATES if rerank_enabled else RECIPE_POOL
+    candidates = _query_recipes(embedded_query, top_k)
+
+    if not rerank_enabled:
+        return candidates
+    with span('pantry.rerank', candidates=len(candidates)) as s:
+        matches, coverage, missing = rerank(candidates, ingredients, pantry_index(), RECIPE_POOL, _ingredient_details)
+        if len(matches):
+            s.set(mean_coverage=float(coverage.mean()), mean_missing=float(missing.mean()))
+    return matches
+
+
+def request_query_health(query, embedded_query=None):
+    if embedded_query is None:
+        embedded_query = embed_texts([query])[0]
+    with span('index.query', namespace='health', top_k=3) as s:
+        results=index().query(embedded_query, top_k=3, include_metadata=True, namespace='health')
+        s.set(matches=len(results['matches']))
 
     return results['matches']
 
 
+def _wait_stage(stage, future):
+    try:
+        return future.result(timeout=STAGE_TIMEOUTS[stage])
+    except FutureTimeoutError:
+        future.cancel()
+        raise TimeoutError(f'{stage} retrieval timed out after {STAGE_TIMEOUTS[stage]}s')
+
+
+def recipe_query_text(user_need, ingredients):
+    return f'{user_need}, Ingredient_Details: {ingredients}'
 
-def gptOutput(user_need, ingredients, disease):
 
-    recipe_request = request_query_recipe(f'{user_need}, Ingredient_Details: {ingredients}')
-    recipes = [i['metadata']['text'] for i in recipe_request]
+def lookup_health(disease):
+    # 질병명이 health.csv에서 바로 찾아지면 건강정보 벡터 검색은 생략한다
+    with span('health.lookup') as lookup_span:
+        health_matches = health_lookup().lookup(disease)
+        lookup_span.set(matches=len(health_matches), cache_hit=bool(health_matches))
+    return health_matches
 
-    health_request = request_query_health(disease)
-    health = [i['metadata']['text'] for i in health_request]
 
-    print(health)
+def retrieve_recipes(user_need, ingredients):
+    """Recipe retrieval; stages.context runs it next to retrieve_health and caches each half."""
+    recipe_query = recipe_query_text(user_need, ingredients)
+    vector = _wait_stage('embed', submit(retrieval_executor, embed_texts, [recipe_query]))[0]
+    return _wait_stage('recipe', submit(retrieval_executor, request_query_recipe, recipe_query, vector, ingredients))
 
-    prompt = f"""
+
+def retrieve_health(disease):
+    """Health retrieval: health.csv lookup first, vector search only when nothing matches."""
+    health_matches = lookup_health(disease)
+    if health_matches:
+        return health_matches
+    vector = _wait_stage('embed', submit(retrieval_executor, embed_texts, [disease]))[0]
+    return _wait_stage('health', submit(retrieval_executor, request_query_health, disease, vector))
+
+
+def _render_prompt(user_need, ingredients, disease, recipes, health):
+    recipe_info = '\n\n    '.join(f'[레시피{n}]\n    {doc["text"]}' for n, doc in enumerate(recipes, 1))
+    health_info = '\n    '.join(doc['text'] for doc in health)
+
+    return f"""
     당신은 한식 요리사 겸 영양사입니다. 당신은 요리 초보자에게 요리 레시피 및 건강정보를 알려줘야합니다.
     요리 초보자는 현재 냉장고에 있는 재료들을 토대로 요리를 하려고 하는데요, 자신의 건강 정보와 현재 땡기는 음식을 기반으로 요리를 만들고 싶어 합니다.
 
     요리 초보자의 니즈에 맞는 정보를 다음과 같은 순서로 제공해보세요. []는 사용자가 입력하는 정보입니다.
-    1. [재료]와 그 재료로 만들 수 있는 [레시피], 그리고 [현재 땡기는 음식], 그리고 [질병에 따른 건강정보] 를 기반으로 '레시피(recipes)'를 만드세요. 특히, [질병에 따른 건강정보]의 권장식품을 최대한 반영해서 레시피는 총 3개를 만들어야 하며, 각 레시피에는 '요리 제목(name, english_name)', '추가 구비 재료(additional_ingredients)', '전체 필요 재료(all_ingredients)', '요리 시간(cooking_time)', '요리 단계(step)', '건강 점수(health_score)'이 필요합니다.
-    2. [레시피]를 참고해서 '요리 제목', '추가 구비 재료', '전체 필요 재료', '요리 시간', '요리 단계'를 생성하세요. '요리 제목'은 요리의 제목을 의미하고, '추가 구비 재료'는 [재료]에는 없지만 요리에 필요한 재료를 의미하고, '전체 필요 재료'는 요리에 필요한 모든 재료를 의미하고, '요리 시간'은 요리에 필요한 시간을 의미합니다. '요리 단계'는 최대한 자세하게(줄넘김으로 출력) 초보자도 이해하기 쉽게 설명하세요.  '건강 점수'는 [질병에 따른 건강정보]를 토대로 계산해주세요. '전체 필요 재료'에 [질병에 따른 건강정보]에 있는 주의식품이 많으면 점수가 깎이고, 권장식품이 많으면 점수가 올라갑니다. 그리고, 예시로 4점은 ★★★★☆ 같이 표현합니다.
+    1. [재료]와 그 재료로 만들 수 있는 [레시피], 그리고 [현재 땡기는 음식], 그리고 [질병에 따른 건강정보] 를 기반으로 '레시피(recipes)'를 만드세요. 특히, [질병에 따른 건강정보]의 권장식품을 최대한 반영해서 레시피는 총 3개를 만들어야 하며, 각 레시피에는 '요리 제목(name, english_name)', '추가 구비 재료(additional_ingredients)', '전체 필요 재료(all_ingredients)', '요리 시간(cooking_time)', '요리 단계(step)'이 필요합니다.
+    2. [레시피]를 참고해서 '요리 제목', '추가 구비 재료', '전체 필요 재료', '요리 시간', '요리 단계'를 생성하세요. '요리 제목'은 요리의 제목을 의미하고, '추가 구비 재료'는 [재료]에는 없지만 요리에 필요한 재료를 의미하고, '전체 필요 재료'는 요리에 필요한 모든 재료를 의미하고, '요리 시간'은 요리에 필요한 시간을 의미합니다. '요리 단계'는 최대한 자세하게(줄넘김으로 출력) 초보자도 이해하기 쉽게 설명하세요. '전체 필요 재료'에는 [질병에 따른 건강정보]의 주의식품을 되도록 넣지 마세요.
     3. 요리 초보자의 [몸상태(질병) 정보]와 [질병에 따른 건강정보]를 토대로 '쉐프의 한 마디(chefTip)'를 출력하세요. ***'쉐프의 한 마디'는 전체 요리에 대해 건강 관점에서 음식에 대한 설명을 해줘야합니다.*** '쉐프의 한 마디'는 최대한 자세하고 길게 설명해주고, 주의식품에 대해 강조해서 설명해주세요. 그리고 가독성이 있도록 적절하게 줄바꿈을 해주세요.
 
     다음은 입력 정보입니다.
@@ -60,48 +196,147 @@ def gptOutput(user_need, ingredients, disease):
     [현재 땡기는 음식]
     {user_need}
 
-    [레시피1]
-    {recipes[0]}
+    {recipe_info}
+
+    [몸상태(질병) 정보]
+    {disease}
+
+    [질병에 따른 건강 정보]
+    {health_info}
 
-    [레시피2]
-    {recipes[1]}
+    **중요: 아래와 같이 json형태로 출력하세요. 이외에는 그 어떤 말도 출력하지 마세요.**
+    {{"chefTip":"","recipes":{{"first":{{"english_name":"", "name":"","additional_ingredients":"","all_ingredients":"", "steps":"","cooking_time":""}} ,"second":{{"english_name":"", "name":"","additional_ingredients":"","all_ingredients":"","steps":"","cooking_time":""}} ,"third":{{"english_name":"", "name":"","additional_ingredients":"","all_ingredients":"","steps":"","cooking_time":""}}}}}}
+    """
 
-    [레시피3]
-    {recipes[2]}
 
-    [레시피4]
-    {recipes[3]}
+def build_prompt(user_need, ingredients, disease, recipe_request, health_request):
+    # 필요한 필드만 뽑은 문서로 프롬프트를 만들고, 토큰 예산을 넘으면 점수 낮은 문서부터 뺀다
+    with span('prompt.build', budget=PROMPT_TOKEN_BUDGET) as s:
+        recipes = compact_recipes(recipe_request)
+        health = compact_health(health_request)
+        duplicates = len(recipe_request) + len(health_request) - len(recipes) - len(health)
+        prompt, tokens, recipes, health, dropped = fit_to_budget(
+            lambda r, h: _render_prompt(user_need, ingredients, disease, r, h),
+            recipes, health, PROMPT_TOKEN_BUDGET, CHAT_MODEL
+        )
+        s.set(prompt_tokens=tokens, recipes=len(recipes), health_docs=len(health), dropped=dropped,
+              duplicates=duplicates)
+    return prompt, [d['id'] for d in recipes], [d['id'] for d in health]
 
-    [레시피5]
-    {recipes[4]}
 
-    [레시피6]
-    {recipes[5]}
+def select_recipes(recipe_matches, health_matches):
+    # 후보 전체를 한 번에 채점해서 주의 식품이 든 후보는 뒤로 보내고 (같은 조건이면 기존 순서) 상위 RECIPE_TOP_K개만 남긴다
+    with span('health.score', candidates=len(recipe_matches)) as s:
+        tokens = [recipe_tokens(_ingredient_details(m)) for m in recipe_matches]
+        scores, cautions = health_scorer().score(tokens, health_matches)
+        if scores is None:
+            return recipe_matches[:RECIPE_TOP_K]
+        order = sorted(range(len(recipe_matches)), key=lambda i: bool(cautions[i]))
+        s.set(with_caution=sum(1 for c in cautions if c))
+    return [recipe_matches[i] for i in order[:RECIPE_TOP_K]]
 
 
-    [몸상태(질병) 정보]
-    {disease}
+def score_recommendation(recommendation, health_matches):
+    """Fills each recipe's health_score and caution_foods locally from its all_ingredients."""
+    recipes = list((recommendation or {}).get('recipes', {}).values())
+    health_scorer().annotate(recipes, health_matches)
+    return recommendation
 
-    [질병에 따른 건강 정보]
-    {health[0]}
-    {health[1]}
-    {health[2]}
 
-    **중요: 아래와 같이 json형태로 출력하세요. 이외에는 그 어떤 말도 출력하지 마세요.**
-    {{"chefTip":"","recipes":{{"first":{{"english_name":"", "name":"","additional_ingredients":"","all_ingredients":"", "steps":"","cooking_time":"", "health_score":""}} ,"second":{{"english_name":"", "name":"","additional_ingredients":"","all_ingredients":"","steps":"","cooking_time":"", "health_score":""}} ,"third":{{"english_name":"", "name":"","additional_ingredients":"","all_ingredients":"","steps":"","cooking_time":"", "health_score":""}}}}}}
-    """
+def prepare_completion(user_need, ingredients, disease, context=None):
+    # 검색 결과로 프롬프트를 만들고, 입력 + 프롬프트에 들어간 문서 ID로 응답 캐시 키를 계산한다
+    # context = (레시피 검색 결과, 건강정보 검색 결과)를 넘기면 검색을 다시 하지 않는다
+    if context is None:
+        # 검색은 stages.context 한 곳에서 병렬로 한다 (stages가 이 모듈을 import하므로 여기서 불러온다)
+        import stages
+        context = stages.context(user_need, ingredients, disease)
+    recipe_request, health_request = context
+    recipe_request = select_recipes(recipe_request, health_request)
+    prompt, recipe_ids, health_ids = build_prompt(user_need, ingredients, disease, recipe_request, health_request)
+    cache_key = response_cache_key(
+        CHAT_MODEL, ingredients, disease, user_need,
+        recipe_ids, health_ids,
+        PROMPT_VERSION
+    )
+    return prompt, cache_key
+
+
+def _chat_tokens(prompt):
+    return count_tokens(prompt, CHAT_MODEL) + COMPLETION_TOKEN_ESTIMATE
+
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+def _chat_request(prompt, stream=False):
+    # 스트리밍이면 응답 헤더가 올 때까지만 동시성 슬롯을 잡는다
+    options = {'stream_options': {'include_usage': True}} if stream else {}
+    return upstream.call(
+        'openai', upstream.openai_client().chat.completions.create,
+        model=CHAT_MODEL,
         temperature=0,
         messages=[
             {"role": "user", "content": prompt}
-        ]
-        # stream=True
+        ],
+        stream=stream,
+        tokens=_chat_tokens(prompt),
+        **options
     )
 
-    # for chunk in response:
-    #     if chunk.choices[0].delta.content is not None:
-    #         return print(chunk.choices[0].delta.content, end="")
 
-    return (response.choices[0].message.content, prompt)
\ No newline at end of file
+def _settle_usage(prompt, usage):
+    upstream.get('openai').settle_tokens(_chat_tokens(prompt), usage.prompt_tokens + usage.completion_tokens)
+
+
+def _cached_response(cache_key):
+    cache = response_cache()
+    return cache.get(cache_key) if cache is not None else None
+
+
+def _store_response(cache_key, content):
+    cache = response_cache()
+    if cache is not None and content:
+        cache.put(cache_key, content)
+
+
+def gptOutput(user_need, ingredients, disease, context=None):
+
+    prompt, cache_key = prepare_completion(user_need, ingredients, disease, context)
+    with span('llm.completion', prompt_chars=len(prompt)) as s:
+        content = _cached_response(cache_key)
+        s.set(cache_hit=content is not None)
+        if content is None:
+            response = _chat_request(prompt)
+            content = response.choices[0].message.content
+            if response.usage is not None:
+                s.set(prompt_tokens=response.usage.prompt_tokens, completion_tokens=response.usage.completion_tokens)
+                _settle_usage(prompt, response.usage)
+            _store_response(cache_key, content)
+
+    return (content, prompt)
+
+
+def gptOutputStream(user_need, ingredients, disease, context=None):
+    # 검색은 동기로 끝낸 뒤, 채팅 응답은 토큰이 도착하는 대로 흘려보낸다
+    prompt, cache_key = prepare_completion(user_need, ingredients, disease, context)
+    content = _cached_response(cache_key)
+    if content is not None:
+        with span('llm.completion', prompt_chars=len(prompt), cache_hit=True, stream=True):
+            pass
+        yield content
+        return
+
+    with span('llm.completion', prompt_chars=len(prompt), cache_hit=False, stream=True) as s:
+        started = time.perf_counter()
+        response = _chat_request(prompt, stream=True)
+
+        parts = []
+        for chunk in response:
+            if chunk.usage is not None:
+                s.set(prompt_tokens=chunk.usage.prompt_tokens, completion_tokens=chunk.usage.completion_tokens)
+                _settle_usage(prompt, chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content is not None:
+                if not parts:
+                    s.set(first_token_ms=(time.perf_counter() - started) * 1000)
+                parts.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+
+        # 끝까지 받은 응답만 캐시한다
+        _store_response(cache_key, ''.join(parts))
@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+# service.py 부하 생성기: 같은 입력이 얼마나 겹치는지(--distinct)를 바꿔 가며 single-flight 효과를 잰다
+#
+#   python fakeService.py --port 8000 &
+#   python loadgen.py --requests 200 --concurrency 50 --distinct 5
+#   python loadgen.py --endpoint recognize --image image/demo1.jpg --requests 100 --concurrency 50
+
+DISEASES = ['당뇨병', '고혈압', '골다공증', '위염', '빈혈', '통풍', '야맹증', '고지혈증']
+CRAVINGS = ['매운음식', '한식', '느끼한음식', '국물요리', '', '태국음식']
+INGREDIENTS = ['🥚계란', '🥔감자', '🥕당근', '🧅양파', '🥒오이', '🍄버섯', '🥬배추', '🧄마늘', '🐟생선', '🍅토마토']
+
+
+def _inputs(distinct, seed):
+    rng = random.Random(seed)
+    return [{'ingredients': rng.sample(INGREDIENTS, 5), 'disease': rng.choice(DISEASES), 'craving': rng.choice(CRAVINGS)}
+            for _ in range(distinct)]
+
+
+def _quantile(samples, q):
+    return samples[min(len(samples) - 1, int(q * len(samples)))] if samples else 0.0
+
+
+async def _stats(client, url):
+    try:
+        return (await client.get(f'{url}/stats')).json()['single_flight']
+    except (httpx.HTTPError, KeyError, ValueError):
+        return None
+
+
+async def run(args):
+    bodies = _inputs(args.distinct, args.seed)
+    image = open(args.image, 'rb').read() if args.endpoint == 'recognize' else None
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    latencies, errors = [], []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        before = await _stats(client, args.url)
+
+        async def one(i):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    if image is not None:
+                        response = await client.post(f'{args.url}/recognize', content=image)
+                    else:
+                        response = await client.post(f'{args.url}/{args.endpoint}', json=bodies[i % len(bodies)])
+                    response.raise_for_status()
+                    await response.aread()
+                    latencies.append(time.perf_counter() - started)
+                except httpx.HTTPError as e:
+                    errors.append(f'{type(e).__name__}: {e}')
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        wall = time.perf_counter() - started
+        after = await _stats(client, args.url)
+
+    latencies.sort()
+    report = {
+        'requests': args.requests, 'concurrency': args.concurrency, 'distinct_inputs': args.distinct,
+        'errors': len(errors), 'error_samples': errors[:5], 'wall_seconds': wall,
+        'throughput_rps': args.requests / wall if wall else 0.0,
+        'p50_ms': _quantile(latencies, 0.5) * 1000, 'p95_ms': _quantile(latencies, 0.95) * 1000,
+        'p99_ms': _quantile(latencies, 0.99) * 1000,
+    }
+    # 워커가 여럿이면 /stats는 응답한 한 워커의 값이다
+    if before and after:
+        report['upstream_executions'] = after['leaders'] - before['leaders']
+        report['coalesced'] = after['followers'] - before['followers']
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load generator for the SmartChef HTTP service.')
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--endpoint', choices=['recommend', 'recommend/stream', 'recognize'], default='recommend')
+    parser.add_argument('--image', default='image/demo1.jpg')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--distinct', type=int, default=5, help='number of distinct request bodies')
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write the report to this path')
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+import json
+import os
+
+import numpy as np
+
+# Pinecone 'receipe' 인덱스를 대신하는 로컬 벡터 인덱스
+# 디렉토리 구조: {root}/{namespace}/vectors.npy, ids.json, metadata.jsonl, meta.json
+# (int8 저장 시 scales.npy, IVF 사용 시 centroids.npy, list_offsets.npy 추가)
+
+DEFAULT_NAMESPACE = '__default__'
+QUERY_CHUNK_ROWS = 65536
+
+
+def _namespace_dir(root, namespace):
+    return os.path.join(root, namespace or DEFAULT_NAMESPACE)
+
+
+def _normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _kmeans(vectors, nlist, iterations=20, seed=0):
+    """Spherical k-means used as the IVF coarse quantizer."""
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), size=min(len(vectors), nlist * 256), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = sample[assign == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids = _normalize_rows(centroids)
+    return centroids.astype(np.float32)
+
+
+def build_namespace(root, namespace, ids, vectors, metadatas=None, dtype='float32', nlist=0):
+    """Writes one namespace of the local index from precomputed embeddings."""
+    vectors = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+    ids = [str(i) for i in ids]
+    metadatas = metadatas if metadatas is not None else [{} for _ in ids]
+    if not (len(ids) == len(vectors) == len(metadatas)):
+        raise ValueError('ids, vectors and metadatas must have the same length')
+
+    meta = {'dtype': dtype, 'dimension': int(vectors.shape[1]), 'count': len(ids), 'nlist': 0}
+
+    # IVF: 행을 클러스터 순서로 재배치해서 리스트별로 연속된 구간을 스캔한다
+    if nlist and len(vectors) > nlist:
+        centroids = _kmeans(vectors, nlist)
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        order = np.argsort(assign, kind='stable')
+        vectors = vectors[order]
+        ids = [ids[i] for i in order]
+        metadatas = [metadatas[i] for i in order]
+        offsets = np.searchsorted(assign[order], np.arange(nlist + 1)).astype(np.int64)
+        meta['nlist'] = int(nlist)
+
+    path = _namespace_dir(root, namespace)
+    os.makedirs(path, exist_ok=True)
+
+    if dtype == 'int8':
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+        np.save(os.path.join(path, 'vectors.npy'), quantized)
+        np.save(os.path.join(path, 'scales.npy'), scales.astype(np.float32))
+    elif dtype == 'float32':
+        np.save(os.path.join(path, 'vectors.npy'), vectors)
+    else:
+        raise ValueError(f'unsupported dtype: {dtype}')
+
+    if meta['nlist']:
+        np.save(os.path.join(path, 'centroids.npy'), centroids)
+        np.save(os.path.join(path, 'list_offsets.npy'), offsets)
+
+    with open(os.path.join(path, 'ids.json'), 'w', encoding='utf-8') as f:
+        json.dump(ids, f, ensure_ascii=False)
+    with open(os.path.join(path, 'metadata.jsonl'), 'w', encoding='utf-8') as f:
+        for m in metadatas:
+            f.write(json.dumps(m, ensure_ascii=False) + '\n')
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+
+class _Namespace:
+    def __init__(self, path):
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        with open(os.path.join(path, 'ids.json'), encoding='utf-8') as f:
+            self.ids = json.load(f)
+        self.path = path
+        self.vectors = np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r')
+        self.scales = None
+        if self.meta['dtype'] == 'int8':
+            self.scales = np.load(os.path.join(path, 'scales.npy'))
+        self.centroids = None
+        if self.meta.get('nlist'):
+            self.centroids = np.load(os.path.join(path, 'centroids.npy'))
+            self.offsets = np.load(os.path.join(path, 'list_offsets.npy'))
+        self._metadata = None
+
+    @property
+    def metadata(self):
+        # 메타데이터는 include_metadata=True 로 처음 요청될 때 읽는다
+        if self._metadata is None:
+            with open(os.path.join(self.path, 'metadata.jsonl'), encoding='utf-8') as f:
+                self._metadata = [json.loads(line) for line in f]
+        return self._metadata
+
+    def _score_rows(self, queries, start, stop):
+        block = np.asarray(self.vectors[start:stop], dtype=np.float32)
+        scores = queries @ block.T
+        if self.scales is not None:
+            scores *= self.scales[start:stop]
+        return scores
+
+    def _ranges(self, query, nprobe):
+        if self.centroids is None:
+            n = len(self.ids)
+            return [(s, min(s + QUERY_CHUNK_ROWS, n)) for s in range(0, n, QUERY_CHUNK_ROWS)]
+        probe = np.argsort(-(self.centroids @ query))[:nprobe]
+        return [(int(self.offsets[c]), int(self.offsets[c + 1])) for c in sorted(probe)]
+
+    def search(self, queries, top_k, nprobe):
+        queries = _normalize_rows(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        # top_k가 0 이하면 argpartition(-1)이 엉뚱한 결과를 내므로 바로 돌려주고, 행 수보다 크면 행 수로 줄인다
+        top_k = min(int(top_k), len(self.ids))
+        if top_k <= 0:
+            return [[] for _ in queries]
+        if self.centroids is None:
+            # 전체 스캔: 모든 쿼리를 청크 단위 행렬곱으로 한 번에 처리한다
+            idx, score = self._top_k(queries, self._ranges(None, nprobe), top_k)
+            return [list(zip(i, s)) for i, s in zip(idx, score)]
+        results = []
+        for q in queries:
+            idx, score = self._top_k(q[None, :], self._ranges(q, nprobe), top_k)
+            results.append(list(zip(idx[0], score[0])))
+        return results
+
+    def _top_k(self, queries, ranges, top_k):
+        best_idx = np.empty((len(queries), 0), dtype=np.int64)
+        best_score = np.empty((len(queries), 0), dtype=np.float32)
+        for start, stop in ranges:
+            if stop <= start:
+                continue
+            scores = self._score_rows(queries, start, stop)
+            idx = np.broadcast_to(np.arange(start, stop), scores.shape)
+            best_idx = np.concatenate([best_idx, idx], axis=1)
+            best_score = np.concatenate([best_score, scores], axis=1)
+            if best_score.shape[1] > top_k:
+                keep = np.argpartition(-best_score, top_k - 1, axis=1)[:, :top_k]
+                best_idx = np.take_along_axis(best_idx, keep, axis=1)
+                best_score = np.take_along_axis(best_score, keep, axis=1)
+        order = np.argsort(-best_score, axis=1)
+        return np.take_along_axis(best_idx, order, axis=1), np.take_along_axis(best_score, order, axis=1)
+
+
+class LocalIndex:
+    """In-process replacement for the Pinecone index with the same query interface."""
+
+    def __init__(self, root, nprobe=8):
+        self.root = root
+        self.nprobe = nprobe
+        self._namespaces = {}
+
+    def _namespace(self, namespace):
+        key = namespace or DEFAULT_NAMESPACE
+        if key not in self._namespaces:
+            path = _namespace_dir(self.root, namespace)
+            if not os.path.exists(os.path.join(path, 'meta.json')):
+                raise KeyError(f'local index namespace not found: {path}')
+            self._namespaces[key] = _Namespace(path)
+        return self._namespaces[key]
+
+    def _format(self, ns, namespace, hits, include_metadata, include_values):
+        matches = []
+        for row, score in hits:
+            match = {'id': ns.ids[row], 'score': float(score)}
+            if include_metadata:
+                match['metadata'] = ns.metadata[row]
+            if include_values:
+                values = np.asarray(ns.vectors[row], dtype=np.float32)
+                if ns.scales is not None:
+                    values = values * ns.scales[row]
+                match['values'] = values.tolist()
+            matches.append(match)
+        return {'matches': matches, 'namespace': namespace}
+
+    def query(self, vector=None, top_k=10, namespace='', include_metadata=False, include_values=False, **kwargs):
+        ns = self._namespace(namespace)
+        hits = ns.search([vector], top_k, self.nprobe)[0]
+        return self._format(ns, namespace, hits, include_metadata, include_values)
+
+    def query_batch(self, vectors, top_k=10, namespace='', include_metadata=False, include_values=False):
+        """Answers several queries against one namespace with a single matrix product."""
+        ns = self._namespace(namespace)
+        return [self._format(ns, namespace, hits, include_metadata, include_values)
+                for hits in ns.search(vectors, top_k, self.nprobe)]
+
+    def preload(self, namespaces):
+        """Opens the given namespaces and reads their vector files once so the first query is not a cold page-in."""
+        for namespace in namespaces:
+            path = _namespace_dir(self.root, namespace)
+            if not os.path.exists(os.path.join(path, 'meta.json')):
+                continue
+            ns = self._namespace(namespace)
+            for start in range(0, len(ns.vectors), 65536):
+                np.asarray(ns.vectors[start:start + 65536]).sum()
+
+    def describe_index_stats(self):
+        namespaces = {}
+        if os.path.isdir(self.root):
+            for name in sorted(os.listdir(self.root)):
+                if os.path.exists(os.path.join(self.root, name, 'meta.json')):
+                    ns = self._namespace('' if name == DEFAULT_NAMESPACE else name)
+                    namespaces['' if name == DEFAULT_NAMESPACE else name] = {'vector_count': ns.meta['count']}
+        return {'namespaces': namespaces}
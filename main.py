@@ -1,8 +1,7 @@
 import streamlit as st
 from PIL import Image
 import openai
-from transformers import CLIPProcessor, CLIPModel
-import torch
+from clipRecognizer import get_recognizer
 import os
 from dotenv import load_dotenv
 
@@ -12,49 +11,10 @@ load_dotenv()
 # OpenAI API Key 설정 (환경 변수 사용)
 openai.api_key = os.getenv('OPENAI_API_KEY')
 
-# CLIP 모델 및 프로세서 로드
-model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-
-# 확장된 재료 리스트
-ingredient_list = [
-    "lettuce", "tomato", "cucumber", "olive oil", "banana", "strawberry", "yogurt", "honey",
-    "cheese", "bread", "egg", "chicken", "beef", "pork", "fish", "garlic", "onion", "carrot",
-    "potato", "bell pepper", "spinach", "mushroom", "avocado", "rice", "pasta", "milk", "butter",
-    "flour", "sugar", "salt", "pepper", "chocolate", "bacon", "sausage", "apple", "orange", "grapes",
-    "peanut butter", "almond", "walnut", "blueberry", "raspberry", "blackberry", "cabbage", "zucchini"
-]
-
-# 영어 재료명과 대응하는 한국어 재료명 사전
-ingredient_translation = {
-    "lettuce": "상추", "tomato": "토마토", "cucumber": "오이", "olive oil": "올리브 오일",
-    "banana": "바나나", "strawberry": "딸기", "yogurt": "요거트", "honey": "꿀",
-    "cheese": "치즈", "bread": "빵", "egg": "계란", "chicken": "닭고기", "beef": "소고기",
-    "pork": "돼지고기", "fish": "생선", "garlic": "마늘", "onion": "양파", "carrot": "당근",
-    "potato": "감자", "bell pepper": "피망", "spinach": "시금치", "mushroom": "버섯",
-    "avocado": "아보카도", "rice": "쌀", "pasta": "파스타", "milk": "우유", "butter": "버터",
-    "flour": "밀가루", "sugar": "설탕", "salt": "소금", "pepper": "후추", "chocolate": "초콜릿",
-    "bacon": "베이컨", "sausage": "소세지", "apple": "사과", "orange": "오렌지", "grapes": "포도",
-    "peanut butter": "땅콩버터", "almond": "아몬드", "walnut": "호두", "blueberry": "블루베리",
-    "raspberry": "라즈베리", "blackberry": "블랙베리", "cabbage": "양배추", "zucchini": "애호박"
-}
-
 def recognize_ingredients_from_image(image):
     try:
-        inputs = processor(text=ingredient_list, images=image, return_tensors="pt", padding=True)
-        outputs = model(**inputs)
-        logits_per_image = outputs.logits_per_image
-        probs = logits_per_image.softmax(dim=1)
-
-        recognized_ingredients = []
-        threshold = 0.01  # 예제 기준, 재료 인식 확률이 1% 이상일 경우
-        for i, prob in enumerate(probs[0]):
-            if prob > threshold:
-                recognized_ingredients.append(ingredient_list[i])
-
-        # 인식된 재료를 한국어로 변환
-        recognized_ingredients_ko = [ingredient_translation.get(ingredient, ingredient) for ingredient in recognized_ingredients]
-        return recognized_ingredients_ko
+        # CLIP 인식기는 get_recognizer()가 프로세스당 한 번만 로드하고 rerun마다 재사용한다
+        return get_recognizer().recognize(image)
     except Exception as e:
         st.error(f"Error in ingredient recognition: {e}")
         return []
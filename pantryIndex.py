@@ -0,0 +1,146 @@
+import csv
+import os
+import re
+
+import numpy as np
+
+from textUtils import normalize_ingredient
+
+# 재료 역색인: 레시피 Ingredient_Details('[재료] 어묵 2개| 김밥용김 3장| ...')의 재료 토큰 → 레시피
+# 토큰마다 그 재료가 들어가는 레시피 행 목록(posting)을 CSC 희소 행렬(열 = 재료 토큰)로 저장하고,
+# 냉장고 재료가 가리키는 열의 posting만 모아서 후보 레시피 전체의 재료 충족률/부족 재료 수를 한 번에 계산한다.
+# 냉장고 재료는 토큰 전체와 같거나, 여러 낱말로 된 재료의 한 낱말('계란 노른자'의 '계란', '청양 고추'의 '고추')과
+# 같을 때만 그 재료를 덮는다 (글자 포함 관계는 보지 않으므로 '고추'는 '고추장'을 덮지 않는다). 이 점수를 벡터 유사도와 섞어 재정렬한다
+
+PANTRY_WEIGHT = float(os.environ.get('SMARTCHEF_PANTRY_WEIGHT', '0.1'))
+MISSING_PENALTY = float(os.environ.get('SMARTCHEF_PANTRY_MISSING_PENALTY', '0.005'))
+
+# 대부분의 집에 있는 기본 양념은 부족 재료로 세지 않는다
+STAPLES = {
+    '소금', '굵은소금', '꽃소금', '설탕', '흑설탕', '후추', '후춧가루', '통후추', '간장', '진간장', '국간장', '양조간장',
+    '식용유', '올리브유', '포도씨유', '카놀라유', '참기름', '들기름', '물', '깨', '통깨', '참깨', '깨소금', '식초',
+    '맛술', '미림', '청주', '물엿', '올리고당',
+}
+SYNONYMS = {'달걀': '계란', '계란물': '계란', '쇠고기': '소고기', '돈육': '돼지고기', '파': '대파', '밀가루(중력분)': '밀가루'}
+QUANTITY_WORDS = {'약간', '적당량', '조금', '적당히', '소량', '한줌', '한꼬집', '반개', '한개', '두개'}
+_SECTION = re.compile(r'\[[^\]]*\]')
+_PARENS = re.compile(r'\([^)]*\)')
+
+
+def parse_ingredient_words(details, staples=STAPLES):
+    """'[재료] 계란 노른자 2알| 소금 약간' → {'계란노른자': ('계란', '노른자')}; one-word names map to ()."""
+    names = {}
+    for part in _SECTION.sub('|', str(details)).split('|'):
+        words = _PARENS.sub(' ', part).split()
+        name = []
+        for word in words:
+            if word in QUANTITY_WORDS or re.match(r'[\d½¼¾/.]', word):
+                break
+            name.append(word)
+        name = name or words[:1]
+        token = normalize_ingredient(''.join(name))
+        token = SYNONYMS.get(token, token)
+        if token and token not in staples:
+            words = [normalize_ingredient(w) for w in name] if len(name) > 1 else []
+            names.setdefault(token, tuple(SYNONYMS.get(w, w) for w in words if w))
+    return names
+
+
+def parse_ingredient_details(details, staples=STAPLES):
+    """'[재료] 계란 노른자 2알| 소금 약간' → {'계란노른자'}; staples are dropped."""
+    return set(parse_ingredient_words(details, staples))
+
+
+def pantry_tokens(ingredients):
+    if isinstance(ingredients, str):
+        ingredients = ingredients.split(',')
+    tokens = {normalize_ingredient(i) for i in ingredients}
+    return {SYNONYMS.get(t, t) for t in tokens} - {''}
+
+
+class PantryIndex:
+    """Ingredient-token → recipe postings (CSC matrix) for vectorized pantry-coverage scoring."""
+
+    def __init__(self, recipes):
+        # recipes: [(recipe_id, {재료 토큰: 낱말들})], parse_ingredient_words 결과. 토큰 집합만 넘기면 정확 일치만 본다
+        self.ids = [str(recipe_id) for recipe_id, _ in recipes]
+        self.rows = {recipe_id: row for row, recipe_id in enumerate(self.ids)}
+        self.vocabulary = {}
+        # 냉장고 재료 → 그 재료가 덮는 열 (토큰 자체와 토큰을 이루는 낱말)
+        self.columns = {}
+        entries, owners = [], []
+        for row, (_, tokens) in enumerate(recipes):
+            words = tokens if isinstance(tokens, dict) else {}
+            for token in sorted(tokens):
+                col = self.vocabulary.get(token)
+                if col is None:
+                    col = self.vocabulary[token] = len(self.vocabulary)
+                    for key in dict.fromkeys((token,) + tuple(words.get(token, ()))):
+                        self.columns.setdefault(key, []).append(col)
+                entries.append(col)
+                owners.append(row)
+        entries = np.asarray(entries, dtype=np.int32)
+        owners = np.asarray(owners, dtype=np.int32)
+        self.lengths = np.bincount(owners, minlength=len(self.ids)).astype(np.int64)
+        # 열 순서로 정렬한 행 번호: 열 c의 posting은 postings[indptr[c]:indptr[c + 1]]
+        order = np.argsort(entries, kind='stable')
+        self.postings = owners[order]
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(entries, minlength=len(self.vocabulary)))])
+        self.tokens = list(self.vocabulary)
+
+    @classmethod
+    def from_csv(cls, path, id_column='Recipe_ID', details_column='Ingredient_Details'):
+        if not os.path.exists(path):
+            return cls([])
+        with open(path, encoding='utf-8', newline='') as f:
+            return cls([(row[id_column], parse_ingredient_words(row.get(details_column, '')))
+                        for row in csv.DictReader(f)])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def pantry_columns(self, pantry):
+        """Vocabulary columns the pantry covers: exact tokens and multi-word names containing a pantry item as a word."""
+        return sorted({col for item in pantry for col in self.columns.get(item, ())})
+
+    def coverage(self, rows, pantry):
+        """Returns (coverage fraction, missing count) for each row index in one vectorized pass."""
+        rows = np.asarray(rows, dtype=np.int64)
+        lengths = self.lengths[rows]
+        hits = np.zeros(len(rows))
+        cols = self.pantry_columns(pantry)
+        if cols and len(rows):
+            # 냉장고 재료 열들의 posting을 이어 붙여 레시피별 일치 수를 세고, 후보 행만 골라낸다
+            hit_rows = np.concatenate([self.postings[self.indptr[c]:self.indptr[c + 1]] for c in cols])
+            found, counts = np.unique(hit_rows, return_counts=True)
+            at = np.minimum(np.searchsorted(found, rows), len(found) - 1)
+            hits = np.where(found[at] == rows, counts[at], 0).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            covered = np.where(lengths > 0, hits / lengths, 1.0)
+        return covered, lengths - hits
+
+
+def rerank(matches, ingredients, index, top_k, text_details=None):
+    """Re-orders vector matches by similarity + pantry coverage − missing ingredients.
+
+    Returns the top_k matches with their coverage and missing-ingredient arrays. Matches
+    missing from the index are parsed from their metadata text via text_details(match).
+    """
+    if not matches:
+        return matches, np.ones(0), np.zeros(0)
+    pantry = pantry_tokens(ingredients)
+    known = [i for i, m in enumerate(matches) if str(m['id']) in index.rows]
+    unknown = [i for i, m in enumerate(matches) if str(m['id']) not in index.rows]
+    coverage = np.ones(len(matches))
+    missing = np.zeros(len(matches))
+    if known:
+        coverage[known], missing[known] = index.coverage([index.rows[str(matches[i]['id'])] for i in known], pantry)
+    if unknown and text_details is not None:
+        # 시작 시 만든 색인에 없는 후보(다른 CSV로 적재된 인덱스 등)는 메타데이터에서 바로 파싱한다
+        extra = PantryIndex([(i, parse_ingredient_words(text_details(matches[i]))) for i in unknown])
+        coverage[unknown], missing[unknown] = extra.coverage(range(len(unknown)), pantry)
+
+    scores = np.array([m['score'] for m in matches], dtype=np.float64)
+    fused = scores + PANTRY_WEIGHT * coverage - MISSING_PENALTY * missing
+    order = np.argsort(-fused, kind='stable')[:top_k]
+    return [matches[i] for i in order], coverage[order], missing[order]
@@ -0,0 +1,83 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import stages
+from tracing import span, submit
+
+# 추천 버튼을 누르기 전에 레시피/건강정보 검색을 미리 돌려 둔다 (app.py 로컬 모드)
+# - 재료 인식이 끝나거나 재료, 땡기는 음식, 질병 입력이 바뀔 때마다 예약하고, 입력이 PREFETCH_DELAY초 동안
+#   그대로일 때만 시작한다. 그 사이 같은 단계의 입력이 또 바뀌면 이전 예약은 취소된다
+# - 결과는 stages.py 단계 캐시에 같은 키로 들어가므로 버튼을 누르면 그대로 재사용되고,
+#   아직 검색 중이면 새로 요청하지 않고 그 결과를 기다린다 → 클릭 뒤에는 LLM 응답만 남는다
+
+PREFETCH_ENABLED = os.environ.get('SMARTCHEF_PREFETCH', '1') != '0'
+PREFETCH_DELAY = float(os.environ.get('SMARTCHEF_PREFETCH_DELAY', '0.5'))
+
+prefetch_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('SMARTCHEF_PREFETCH_THREADS', '4')),
+                                       thread_name_prefix='prefetch')
+
+
+class Prefetcher:
+    """Speculative retrieval for one user session; a newer input for a stage cancels the older prefetch."""
+
+    def __init__(self, delay=PREFETCH_DELAY):
+        self.delay = delay
+        # 단계 → (단계 캐시 키, Future, 취소 이벤트)
+        self.tasks = {}
+        self.scheduled = 0
+        self.cancelled = 0
+        self._lock = threading.Lock()
+
+    def update(self, user_need, ingredients, disease):
+        """Schedules recipe retrieval for the current inputs, and health retrieval once a condition is typed."""
+        if ingredients:
+            self._schedule('recipes', stages.recipe_key(user_need, ingredients),
+                           stages.recipe_matches, user_need, list(ingredients))
+        else:
+            self.cancel('recipes')
+        if disease and disease.strip():
+            self._schedule('health', stages.health_key(disease), stages.health_matches, disease)
+        else:
+            self.cancel('health')
+
+    def cancel(self, stage=None):
+        with self._lock:
+            for name in [stage] if stage else list(self.tasks):
+                task = self.tasks.pop(name, None)
+                if task is not None:
+                    self._stop(task)
+
+    def _stop(self, task):
+        _, future, stop = task
+        if not future.done():
+            # 아직 대기 중이면 시작하지 않고, 이미 검색 중이면 끝난 결과만 캐시에 남는다
+            stop.set()
+            future.cancel()
+            self.cancelled += 1
+
+    def _schedule(self, stage, key, fn, *args):
+        with self._lock:
+            task = self.tasks.get(stage)
+            if task is not None:
+                if task[0] == key:
+                    return
+                self._stop(task)
+            if key in stages.stage_cache:
+                self.tasks.pop(stage, None)
+                return
+            stop = threading.Event()
+            self.tasks[stage] = (key, submit(prefetch_executor, self._run, stage, key, stop, fn, *args), stop)
+            self.scheduled += 1
+
+    def _run(self, stage, key, stop, fn, *args):
+        # 입력이 잠시 그대로일 때만 시작한다
+        if stop.wait(self.delay) or key in stages.stage_cache:
+            return None
+        with span(f'prefetch.{stage}'):
+            return fn(*args)
+
+    def stats(self):
+        with self._lock:
+            return {'scheduled': self.scheduled, 'cancelled': self.cancelled,
+                    'pending': sum(1 for _, future, _ in self.tasks.values() if not future.done())}
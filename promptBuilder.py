@@ -0,0 +1,131 @@
+import math
+import os
+import re
+
+from pantryIndex import parse_ingredient_details
+from textUtils import normalize_phrase
+
+# 프롬프트용 문서 압축: 레시피 저장소 필드 또는 검색된 메타데이터 텍스트("col: val, col: val, ...")에서
+# 모델에 필요한 필드만 뽑고, 중복 레시피를 제거하고, 토큰 예산에 맞게 목록별로 점수 낮은 문서부터 뺀다
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+PROMPT_TOKEN_BUDGET = int(os.environ.get('SMARTCHEF_PROMPT_TOKEN_BUDGET', '3500'))
+# 예산을 넘어도 남기는 최소 문서 수 (레시피와 건강정보는 따로 센다)
+MIN_RECIPE_DOCS = 1
+MIN_HEALTH_DOCS = 1
+
+RECIPE_COLUMNS = ['Recipe_Title', 'Dish_Name', 'Cooking_Method', 'Cooking_Status', 'Ingredient_List', 'Dish_Type',
+                  'Cooking_Intro', 'Ingredient_Details', 'Serving_Size', 'Difficulty_Level', 'Cooking_Time']
+HEALTH_COLUMNS = ['질병명', '식사요법의 필요성', '식사요법의 실제', '권장 식품', '주의 식품', '그 외 주의사항']
+
+# 프롬프트에 넣는 필드와 표시 이름
+RECIPE_FIELDS = (('Dish_Name', '요리'), ('Ingredient_Details', '재료'), ('Cooking_Time', '시간'))
+HEALTH_FIELDS = (('질병명', '질병'), ('권장 식품', '권장 식품'), ('주의 식품', '주의 식품'))
+
+_encodings = {}
+
+
+def _encoding(model):
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding('o200k_base')
+    return _encodings[model]
+
+
+def count_tokens(text, model='gpt-4o-mini'):
+    """Counts prompt tokens with tiktoken, or estimates them when it is not installed."""
+    if tiktoken is not None:
+        return len(_encoding(model).encode(text))
+    # 대략치: 영문/숫자는 4글자당 1토큰, 한글 등 비ASCII는 글자당 1토큰 (실제보다 약간 많게)
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return math.ceil(ascii_chars / 4) + len(text) - ascii_chars
+
+
+def parse_fields(text, columns):
+    # 값 안에도 ', '가 있으므로 알려진 컬럼 이름을 기준으로 자른다
+    pattern = re.compile(r'(?:^|, )(' + '|'.join(re.escape(c) for c in columns) + r'): ')
+    fields = {}
+    found = list(pattern.finditer(text))
+    for match, following in zip(found, found[1:] + [None]):
+        end = following.start() if following is not None else len(text)
+        value = text[match.end():end].strip()
+        if value and value != 'nan':
+            fields[match.group(1)] = value
+    return fields
+
+
+def _compact(fields, spec):
+    return ' / '.join(f'{label}: {fields[key]}' for key, label in spec if key in fields)
+
+
+def recipe_fields(match):
+    """Recipe columns of a match: the hydrated recipeStore record if attached, else parsed metadata text."""
+    recipe = match.get('recipe')
+    if recipe is not None:
+        return recipe.fields()
+    return parse_fields(match['metadata']['text'], RECIPE_COLUMNS)
+
+
+def compact_recipes(matches):
+    """Extracts the prompt fields from rank-ordered recipe matches, dropping duplicate dishes."""
+    docs = []
+    seen = set()
+    for match in matches:
+        fields = recipe_fields(match)
+        if 'Dish_Name' not in fields and 'Recipe_Title' in fields:
+            fields['Dish_Name'] = fields['Recipe_Title']
+        # 같은 요리 이름이나 같은 재료 구성은 순위가 높은 하나만 남긴다
+        keys = {('name', normalize_phrase(fields.get('Dish_Name', '')))}
+        ingredients = frozenset(parse_ingredient_details(fields.get('Ingredient_Details', '')))
+        if ingredients:
+            keys.add(('ingredients', ingredients))
+        if keys & seen:
+            continue
+        seen |= keys
+        docs.append({'id': match['id'], 'score': match.get('score', 0), 'text': _compact(fields, RECIPE_FIELDS)})
+    return docs
+
+
+def compact_health(matches):
+    """Extracts disease name, recommended and caution foods from rank-ordered health matches."""
+    docs = []
+    seen = set()
+    for match in matches:
+        text = _compact(parse_fields(match['metadata']['text'], HEALTH_COLUMNS), HEALTH_FIELDS)
+        if text and text not in seen:
+            seen.add(text)
+            docs.append({'id': match['id'], 'score': match.get('score', 0), 'text': text})
+    return docs
+
+
+def fit_to_budget(render, recipes, health, budget=None, model='gpt-4o-mini'):
+    """Renders the prompt, dropping the lowest-scored documents until it fits the token budget.
+
+    Recipe similarity and health lookup confidence are not on one scale, so each list is trimmed
+    on its own score: recipes first down to MIN_RECIPE_DOCS, then health down to MIN_HEALTH_DOCS.
+    Returns (prompt, tokens, recipes, health, dropped).
+    """
+    budget = PROMPT_TOKEN_BUDGET if budget is None else budget
+    recipes, health = list(recipes), list(health)
+    dropped = 0
+    while True:
+        prompt = render(recipes, health)
+        tokens = count_tokens(prompt, model)
+        if tokens <= budget:
+            break
+        if len(recipes) > MIN_RECIPE_DOCS:
+            docs = recipes
+        elif len(health) > MIN_HEALTH_DOCS:
+            docs = health
+        else:
+            break
+        # 점수가 같으면 순위가 낮은(뒤쪽) 문서를 뺀다
+        docs.pop(min(range(len(docs)), key=lambda i: (docs[i]['score'], -i)))
+        dropped += 1
+    return prompt, tokens, recipes, health, dropped
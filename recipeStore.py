@@ -0,0 +1,180 @@
+import argparse
+import csv
+import json
+import os
+import re
+import shutil
+import sys
+
+import numpy as np
+
+# 레시피 컬럼 저장소: processed.csv / whole_processed.csv → Recipe_ID로 찾는 메모리맵 파일
+# 벡터 검색은 ID와 점수만 받아오고 (include_metadata=False), 필요한 필드만 여기서 꺼내 쓴다
+# 디렉토리 구조: {root}/ids.json, meta.json, {컬럼}.bin(UTF-8 이어붙임) + {컬럼}.offsets.npy,
+#                cooking_minutes.npy(int32, 모르면 -1), difficulty.npy(int8 범주 코드)
+#
+#   python recipeStore.py LLM_structure_swkim/data/whole_processed.csv --out index/recipes
+
+TEXT_COLUMNS = ['Recipe_Title', 'Dish_Name', 'Ingredient_Details', 'Cooking_Time', 'Difficulty_Level']
+_MINUTES = re.compile(r'(\d+)\s*(분|시간)')
+
+csv.field_size_limit(sys.maxsize)
+
+
+def cooking_minutes(text):
+    """'60분이내' → 60, '2시간이상' → 120, unknown → -1."""
+    match = _MINUTES.search(str(text))
+    if match is None:
+        return -1
+    return int(match.group(1)) * (60 if match.group(2) == '시간' else 1)
+
+
+def build(csv_paths, root, id_column='Recipe_ID'):
+    """Writes the store from one or more recipe CSVs; the first occurrence of an id wins."""
+    ids, seen = [], set()
+    blobs = {col: bytearray() for col in TEXT_COLUMNS}
+    offsets = {col: [0] for col in TEXT_COLUMNS}
+    minutes, difficulty, levels = [], [], {}
+    for path in csv_paths:
+        with open(path, encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                recipe_id = str(row[id_column])
+                if recipe_id in seen:
+                    continue
+                seen.add(recipe_id)
+                ids.append(recipe_id)
+                for col in TEXT_COLUMNS:
+                    value = row.get(col) or ''
+                    blobs[col] += (value if value != 'nan' else '').encode('utf-8')
+                    offsets[col].append(len(blobs[col]))
+                minutes.append(cooking_minutes(row.get('Cooking_Time', '')))
+                difficulty.append(levels.setdefault(row.get('Difficulty_Level') or '', len(levels)))
+
+    # 다 쓴 뒤에 디렉토리를 통째로 바꿔서 읽는 쪽이 반쯤 쓴 저장소를 보지 않게 한다
+    tmp_root = f'{root}.{os.getpid()}.tmp'
+    os.makedirs(tmp_root, exist_ok=True)
+    for col in TEXT_COLUMNS:
+        with open(os.path.join(tmp_root, f'{col}.bin'), 'wb') as f:
+            f.write(blobs[col])
+        np.save(os.path.join(tmp_root, f'{col}.offsets.npy'), np.asarray(offsets[col], dtype=np.int64))
+    np.save(os.path.join(tmp_root, 'cooking_minutes.npy'), np.asarray(minutes, dtype=np.int32))
+    np.save(os.path.join(tmp_root, 'difficulty.npy'), np.asarray(difficulty, dtype=np.int8))
+    with open(os.path.join(tmp_root, 'ids.json'), 'w', encoding='utf-8') as f:
+        json.dump(ids, f, ensure_ascii=False)
+    with open(os.path.join(tmp_root, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'count': len(ids), 'columns': TEXT_COLUMNS, 'difficulty_levels': list(levels)}, f, ensure_ascii=False)
+    if os.path.exists(root):
+        shutil.rmtree(root)
+    os.replace(tmp_root, root)
+    return len(ids)
+
+
+class Recipe:
+    """Lazily decoded view of one stored recipe; each field is read from the memory map on access."""
+
+    __slots__ = ('store', 'row', 'id')
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+        self.id = store.ids[row]
+
+    @property
+    def title(self):
+        return self.store.text('Recipe_Title', self.row)
+
+    @property
+    def dish_name(self):
+        return self.store.text('Dish_Name', self.row) or self.title
+
+    @property
+    def ingredient_details(self):
+        return self.store.text('Ingredient_Details', self.row)
+
+    @property
+    def cooking_time(self):
+        return self.store.text('Cooking_Time', self.row)
+
+    @property
+    def cooking_minutes(self):
+        value = int(self.store.minutes[self.row])
+        return value if value >= 0 else None
+
+    @property
+    def difficulty(self):
+        return self.store.difficulty_levels[self.store.difficulty[self.row]]
+
+    def fields(self):
+        """The CSV column → value mapping that parse_fields would give for the stored columns."""
+        values = {col: self.store.text(col, self.row) for col in TEXT_COLUMNS}
+        return {col: value for col, value in values.items() if value}
+
+    def __repr__(self):
+        return f'Recipe({self.id!r}, {self.dish_name!r})'
+
+
+class RecipeStore:
+    """Recipe_ID → Recipe over memory-mapped column files."""
+
+    def __init__(self, root):
+        self.root = root
+        with open(os.path.join(root, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(os.path.join(root, 'ids.json'), encoding='utf-8') as f:
+            self.ids = json.load(f)
+        self.rows = {recipe_id: row for row, recipe_id in enumerate(self.ids)}
+        self.difficulty_levels = meta['difficulty_levels']
+        self.minutes = np.load(os.path.join(root, 'cooking_minutes.npy'), mmap_mode='r')
+        self.difficulty = np.load(os.path.join(root, 'difficulty.npy'), mmap_mode='r')
+        self._offsets = {}
+        self._blobs = {}
+        for col in meta['columns']:
+            self._offsets[col] = np.load(os.path.join(root, f'{col}.offsets.npy'), mmap_mode='r')
+            path = os.path.join(root, f'{col}.bin')
+            # 빈 파일은 메모리맵을 만들 수 없다
+            self._blobs[col] = np.memmap(path, dtype=np.uint8, mode='r') if os.path.getsize(path) else np.zeros(0, np.uint8)
+
+    @classmethod
+    def open(cls, root):
+        """Returns the store at root, or None when it has not been built."""
+        if not os.path.exists(os.path.join(root, 'meta.json')):
+            return None
+        return cls(root)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, recipe_id):
+        return str(recipe_id) in self.rows
+
+    def text(self, column, row):
+        offsets = self._offsets[column]
+        return self._blobs[column][offsets[row]:offsets[row + 1]].tobytes().decode('utf-8')
+
+    def get(self, recipe_id):
+        row = self.rows.get(str(recipe_id))
+        return Recipe(self, row) if row is not None else None
+
+    def hydrate(self, matches):
+        """Attaches match['recipe'] to ID-only matches; returns False if any id is not in the store."""
+        complete = True
+        for match in matches:
+            recipe = self.get(match['id'])
+            if recipe is None:
+                complete = False
+            else:
+                match['recipe'] = recipe
+        return complete
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the memory-mapped recipe store from recipe CSVs.')
+    parser.add_argument('csv', nargs='+')
+    parser.add_argument('--out', default=os.environ.get('SMARTCHEF_RECIPE_STORE', 'index/recipes'))
+    parser.add_argument('--id-column', default='Recipe_ID')
+    args = parser.parse_args(argv)
+    print(f'wrote {build(args.csv, args.out, args.id_column)} recipes to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
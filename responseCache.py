@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from textUtils import normalize_ingredients, normalize_phrase
+
+# gptOutput 응답 캐시 (temperature=0 이므로 같은 입력 + 같은 검색 결과면 같은 추천)
+# 키: 정렬/이모지 제거된 재료 집합, 정규화된 질병/땡기는 음식, 검색된 레시피/건강정보 ID
+
+
+def response_cache_key(model, ingredients, disease, user_need, recipe_ids, health_ids, prompt_version=''):
+    payload = json.dumps({
+        'model': model,
+        'prompt_version': prompt_version,
+        'ingredients': normalize_ingredients(ingredients),
+        'disease': normalize_phrase(disease),
+        'user_need': normalize_phrase(user_need),
+        'recipe_ids': [str(i) for i in recipe_ids],
+        'health_ids': [str(i) for i in health_ids],
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class MemoryBackend:
+    """Process-local LRU with per-entry expiry."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+
+    def get(self, key, now):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at < now:
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    def put(self, key, value, expires_at):
+        self._items[key] = (value, expires_at)
+        self._items.move_to_end(key)
+        evicted = 0
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def __len__(self):
+        return len(self._items)
+
+
+class DiskBackend:
+    """SQLite store shared by every process on the machine."""
+
+    def __init__(self, path, max_entries):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, value TEXT, expires_at REAL, last_access REAL)'
+        )
+        self._conn.commit()
+
+    def get(self, key, now):
+        row = self._conn.execute('SELECT value, expires_at FROM responses WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self._conn.commit()
+            return None
+        self._conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+        self._conn.commit()
+        return row[0]
+
+    def put(self, key, value, expires_at):
+        now = time.time()
+        self._conn.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)', (key, value, expires_at, now))
+        self._conn.execute('DELETE FROM responses WHERE expires_at < ?', (now,))
+        (count,) = self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()
+        evicted = max(0, count - self.max_entries)
+        if evicted:
+            self._conn.execute(
+                'DELETE FROM responses WHERE key IN '
+                '(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)', (evicted,)
+            )
+        self._conn.commit()
+        return evicted
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+
+class ResponseCache:
+    """TTL + size bounded cache in front of the chat completion."""
+
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self.backend.get(key, time.time())
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self.evictions += self.backend.put(key, value, time.time() + self.ttl)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'backend': type(self.backend).__name__,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self.backend),
+                'ttl': self.ttl,
+            }
+
+
+def response_cache_from_env():
+    kind = os.environ.get('SMARTCHEF_RESPONSE_CACHE', 'memory')
+    if kind == 'off':
+        return None
+    ttl = float(os.environ.get('SMARTCHEF_RESPONSE_CACHE_TTL', str(24 * 3600)))
+    size = int(os.environ.get('SMARTCHEF_RESPONSE_CACHE_SIZE', '1000'))
+    if kind == 'disk':
+        path = os.environ.get('SMARTCHEF_RESPONSE_CACHE_PATH', 'cache/responses.sqlite3')
+        return ResponseCache(DiskBackend(path, size), ttl)
+    return ResponseCache(MemoryBackend(size), ttl)
@@ -0,0 +1,289 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+# 추천 파이프라인 HTTP 서비스 (app.py는 SMARTCHEF_API_URL이 설정되면 이 서비스의 클라이언트가 된다)
+#   POST /recognize          body: 이미지 바이트            → {"ingredients": [...]}
+#   POST /recommend          {"ingredients", "disease", "craving"} → {"content": "..."}
+#   POST /recommend/stream   같은 입력, 응답 텍스트를 도착하는 대로 흘려보낸다
+#   POST /speech             {"voice", "text"}              → audio/mpeg
+#   GET  /image?name=...     레시피 영문명                    → image/jpeg
+#   GET  /stats, /healthz
+#   GET  /readyz             자원별 준비 상태 (웜업이 끝나고 필수 자원이 모두 준비되면 200, 아니면 503)
+# 같은 입력의 요청이 동시에 들어오면 한 번만 실행하고 결과를 나눠 갖는다 (single-flight, 워커 프로세스 단위)
+# 스트림 팔로워는 리더의 토큰을 처음부터 다시 받고 이어서 실시간으로 받는다 (TokenBroadcast)
+#
+#   uvicorn service:app --workers 4 --port 8000
+#   python fakeService.py --workers 2    # fakes.py 업스트림으로 부하 테스트
+
+import apiClient
+import imageGen
+import speech
+import stages
+import startup
+import upstream
+from textUtils import normalize_ingredients, normalize_phrase
+from tracing import recorder, submit
+from vision import recognize_ingredients
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution."""
+
+    def __init__(self):
+        self.leaders = 0
+        self.followers = 0
+        self._calls = {}
+
+    def join(self, key):
+        """Registers the caller synchronously: (new future, True) for the leader, (leader's future, False) otherwise."""
+        future = self._calls.get(key)
+        if future is not None:
+            self.followers += 1
+            return future, False
+        self.leaders += 1
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        return future, True
+
+    async def do(self, key, fn):
+        future, leader = self.join(key)
+        if not leader:
+            return await asyncio.shield(future)
+        return await self.lead(key, future, fn)
+
+    async def lead(self, key, future, fn):
+        """Runs fn for a key registered by join() and hands the result to the followers."""
+        try:
+            result = await fn()
+        except Exception as e:
+            future.set_exception(e)
+            # 기다리는 요청이 없으면 예외를 읽은 것으로 처리한다
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    def stats(self):
+        return {'leaders': self.leaders, 'followers': self.followers, 'in_flight': len(self._calls)}
+
+
+class TokenBroadcast:
+    """Tokens of one streaming leader; each follower replays what was sent so far, then follows live."""
+
+    def __init__(self):
+        self.tokens = []
+        self.finished = False
+        self.error = None
+        self._changed = asyncio.Event()
+
+    def publish(self, token):
+        self.tokens.append(token)
+        self._wake()
+
+    def close(self, error=None):
+        self.finished = True
+        self.error = error
+        self._wake()
+
+    def _wake(self):
+        # 기다리던 구독자를 모두 깨우고 다음 변경용 이벤트로 바꾼다 (이벤트 루프 스레드에서만 부른다)
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def follow(self):
+        sent = 0
+        while True:
+            changed = self._changed
+            while sent < len(self.tokens):
+                yield self.tokens[sent]
+                sent += 1
+            if self.finished:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # 요청을 받기 시작한 뒤 백그라운드에서 클라이언트, 인덱스, 캐시를 미리 만든다 (준비 상태는 /readyz)
+    if startup.WARMUP_ENABLED:
+        startup.warm_up_in_background()
+    yield
+
+
+flights = SingleFlight()
+# 스트리밍 중인 추천의 토큰 → 같은 입력으로 나중에 들어온 /recommend/stream 요청도 토큰 단위로 받는다
+streams = {}
+app = FastAPI(title='SmartChef', lifespan=lifespan)
+# 파이프라인 호출은 블로킹이므로 전용 스레드 풀에서 실행한다 (asyncio 기본 풀은 CPU 수 + 4개뿐)
+pipeline_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('SMARTCHEF_API_THREADS', '64')),
+                                       thread_name_prefix='pipeline')
+
+
+def _in_thread(fn, *args):
+    return asyncio.wrap_future(submit(pipeline_executor, fn, *args))
+
+
+def _key(*parts):
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+async def _json_body(request):
+    # 깨진 JSON이나 객체가 아닌 본문은 500이 아니라 400으로 돌려준다
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(400, 'request body must be JSON')
+    if not isinstance(body, dict):
+        raise HTTPException(400, 'request body must be a JSON object')
+    return body
+
+
+def _text_field(body, name):
+    value = body.get(name) or ''
+    if not isinstance(value, str):
+        raise HTTPException(400, f'{name} must be a string')
+    return value
+
+
+def _recommend_inputs(body):
+    ingredients = body.get('ingredients') or []
+    if isinstance(ingredients, str):
+        ingredients = ingredients.split(',')
+    if not isinstance(ingredients, list) or not all(isinstance(i, str) for i in ingredients):
+        raise HTTPException(400, 'ingredients must be a list of strings')
+    disease = _text_field(body, 'disease')
+    craving = _text_field(body, 'craving')
+    key = _key('recommend', normalize_ingredients(ingredients), normalize_phrase(disease), normalize_phrase(craving))
+    return ingredients, disease, craving, key
+
+
+def _recognize_bytes(data):
+    key = stages.image_key(data)
+    image = stages.decode_image(key, data)
+    return stages.ingredients(key, image, lambda img: recognize_ingredients(img, os.environ['OPENAI_API_KEY']))
+
+
+@app.post('/recognize')
+async def recognize(request: Request):
+    data = await request.body()
+    if not data:
+        raise HTTPException(400, 'empty image body')
+    ingredients = await flights.do(_key('recognize', stages.image_key(data)),
+                                   lambda: _in_thread(_recognize_bytes, data))
+    return {'ingredients': ingredients}
+
+
+@app.post('/recommend')
+async def recommend(request: Request):
+    ingredients, disease, craving, key = _recommend_inputs(await _json_body(request))
+    content = await flights.do(key, lambda: _in_thread(
+        lambda: ''.join(stages.recommendation_stream(craving, ingredients, disease))))
+    return {'content': content}
+
+
+@app.post('/recommend/stream')
+async def recommend_stream(request: Request):
+    ingredients, disease, craving, key = _recommend_inputs(await _json_body(request))
+    # 검색은 스트림보다 먼저 끝내고 (단계 캐시에 남아 스트림이 그대로 쓴다), 프롬프트에 들어갈 건강정보 id를
+    # 헤더로 보낸다 → 클라이언트가 같은 문서로 건강 점수를 계산한다
+    _, health = await _in_thread(stages.context, craving, ingredients, disease)
+    headers = {apiClient.HEALTH_IDS_HEADER: json.dumps([str(m['id']) for m in health])}
+    # 응답을 돌려주기 전에 리더/팔로워를 정하고 등록까지 끝낸다 (동시에 들어온 요청이 모두 리더가 되지 않게)
+    future, leader = flights.join(key)
+    if not leader:
+        broadcast = streams.get(key)
+        if broadcast is not None:
+            # 같은 추천이 이미 스트리밍 중이면 지금까지 나온 토큰부터 이어서 받는다
+            return StreamingResponse(broadcast.follow(), media_type='text/plain; charset=utf-8', headers=headers)
+
+        # 리더가 /recommend(비스트리밍)이면 끝날 때까지 기다렸다가 한 번에 보낸다
+        async def replay():
+            yield await asyncio.shield(future)
+        return StreamingResponse(replay(), media_type='text/plain; charset=utf-8', headers=headers)
+
+    loop = asyncio.get_running_loop()
+    broadcast = streams[key] = TokenBroadcast()
+
+    def produce():
+        # 스레드에서 토큰을 만들어 이벤트 루프의 broadcast로 넘긴다
+        parts = []
+        for token in stages.recommendation_stream(craving, ingredients, disease):
+            parts.append(token)
+            loop.call_soon_threadsafe(broadcast.publish, token)
+        return ''.join(parts)
+
+    async def run():
+        try:
+            content = await _in_thread(produce)
+        except Exception as e:
+            broadcast.close(e)
+            raise
+        finally:
+            streams.pop(key, None)
+        broadcast.close()
+        return content
+
+    # 리더 요청의 연결이 끊겨도 생성은 끝까지 하고 팔로워에게 전달한다. 오류는 각 스트림이 받는다
+    task = asyncio.ensure_future(flights.lead(key, future, run))
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return StreamingResponse(broadcast.follow(), media_type='text/plain; charset=utf-8', headers=headers)
+
+
+@app.post('/speech')
+async def synthesize(request: Request):
+    body = await _json_body(request)
+    voice, text = _text_field(body, 'voice') or 'nova', _text_field(body, 'text')
+    data = await flights.do(_key('speech', voice, text), lambda: _in_thread(speech.synthesize_speech, voice, text))
+    return Response(data, media_type='audio/mpeg')
+
+
+@app.get('/image')
+async def recipe_image(name: str):
+    data = await flights.do(_key('image', ' '.join(name.lower().split())),
+                            lambda: _in_thread(imageGen.generate_recipe_image, name))
+    return Response(data, media_type='image/jpeg')
+
+
+@app.get('/stats')
+async def stats():
+    return JSONResponse({'pid': os.getpid(), 'single_flight': flights.stats(),
+                         'stage_cache': stages.stage_cache.stats(), 'upstreams': upstream.stats(),
+                         'startup': startup.readiness(), 'stages': recorder.summary()})
+
+
+@app.get('/healthz')
+async def healthz():
+    return {'ok': True}
+
+
+@app.get('/readyz')
+async def readyz():
+    report = startup.readiness()
+    return JSONResponse(report, status_code=200 if report['ready'] else 503)
+
+
+def main(argv=None, app_path='service:app'):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='Serve the SmartChef pipeline over HTTP.')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('SMARTCHEF_API_PORT', '8000')))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('SMARTCHEF_API_WORKERS', '1')))
+    args = parser.parse_args(argv)
+    uvicorn.run(app_path, host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import upstream
+from tracing import span, submit
+
+# 음성 합성 (TTS): 파일 대신 메모리 바이트로 돌려주고, 목소리+텍스트 해시로 캐시한다
+
+TTS_MODEL = "tts-1-hd"
+TTS_FORMAT = "mp3"
+TTS_CACHE_MAX_BYTES = int(os.environ.get('SMARTCHEF_TTS_CACHE_BYTES', str(64 * 1024 * 1024)))
+
+speech_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='tts')
+
+
+def get_client():
+    # 호출마다 새 클라이언트를 만들지 않고 프로세스 공용 클라이언트(연결 풀)를 쓴다
+    return upstream.openai_client()
+
+
+class AudioCache:
+    """In-memory LRU of synthesized audio bounded by total bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self.size -= len(self._items.pop(key))
+            self._items[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._items),
+                    'bytes': self.size, 'max_bytes': self.max_bytes}
+
+
+audio_cache = AudioCache(TTS_CACHE_MAX_BYTES)
+_in_flight = {}
+_in_flight_lock = threading.RLock()
+
+
+def speech_cache_key(voice, text):
+    return hashlib.sha256(f'{TTS_MODEL}\0{voice}\0{text}'.encode('utf-8')).hexdigest()
+
+
+def _request_speech(voice, text):
+    with get_client().audio.speech.with_streaming_response.create(
+        model=TTS_MODEL,
+        voice=voice,  # options: alloy, echo, fable, onyx, nova, shimmer
+        input=text,
+        response_format=TTS_FORMAT
+    ) as response:
+        return b''.join(response.iter_bytes())
+
+
+def synthesize_speech(voice, text):
+    """Returns mp3 bytes for text, streaming the response into memory on a miss."""
+    key = speech_cache_key(voice, text)
+    with span('tts', input_chars=len(text)) as s:
+        data = audio_cache.get(key)
+        s.set(cache_hit=data is not None)
+        if data is not None:
+            return data
+
+        data = upstream.call('openai', _request_speech, voice, text)
+        s.set(audio_bytes=len(data))
+        audio_cache.put(key, data)
+        return data
+
+
+def submit_speech(voice, text):
+    """Starts TTS in the background; identical concurrent requests share one future."""
+    key = speech_cache_key(voice, text)
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        if future is None:
+            future = submit(speech_executor, synthesize_speech, voice, text)
+            _in_flight[key] = future
+            future.add_done_callback(lambda _: _forget(key))
+        return future
+
+
+def _forget(key):
+    with _in_flight_lock:
+        _in_flight.pop(key, None)
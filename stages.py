@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image
+
+import llmStructure
+from textUtils import normalize_ingredients, normalize_phrase
+from tracing import span, submit
+
+# 추천 파이프라인을 단계로 나누고, 단계 결과를 입력 해시로 메모이즈한다
+#   사진 → 재료 → 레시피 검색 ┐
+#   질병 → 건강정보 검색 ─────┴→ LLM → (LLM 응답은 responseCache, TTS, 이미지는 speech/imageGen 캐시)
+# Streamlit rerun에서 입력이 바뀐 단계만 다시 계산하고 나머지는 원격 호출 없이 재사용한다
+
+STAGE_CACHE_SIZE = int(os.environ.get('SMARTCHEF_STAGE_CACHE_SIZE', '256'))
+
+stage_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='stage')
+
+
+class StageCache:
+    """Process-wide LRU of stage results keyed by (stage, hash of inputs)."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0
+        self._items = OrderedDict()
+        # 계산 중인 키 → Future: 같은 입력을 동시에 요청하면 한 번만 계산한다 (미리 가져오기 + 클릭)
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(stage, inputs):
+        payload = json.dumps([stage, inputs], ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def lookup(self, key):
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return False, None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return True, self._items[key]
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def run(self, stage, inputs, fn, *args):
+        """Returns the cached result for (stage, inputs), computing it with fn(*args) on a miss.
+
+        A miss on a key another thread is already computing waits for that result instead.
+        """
+        key = self.key(stage, inputs)
+        with span(f'stage.{stage}') as s:
+            found, value = self.lookup(key)
+            s.set(cache_hit=found)
+            if found:
+                return value
+            with self._lock:
+                pending = self._pending.get(key)
+                if pending is None and key in self._items:
+                    return self._items[key]
+                leader = pending is None
+                if leader:
+                    pending = self._pending[key] = Future()
+                else:
+                    self.joined += 1
+            if not leader:
+                s.set(joined=True)
+                try:
+                    return pending.result()
+                except Exception:
+                    # 먼저 시작한 계산이 실패하면 (미리 가져오기 중 타임아웃 등) 직접 다시 계산한다
+                    value = fn(*args)
+                    self.put(key, value)
+                    return value
+            try:
+                value = fn(*args)
+            except BaseException as e:
+                pending.set_exception(e)
+                raise
+            else:
+                self.put(key, value)
+                pending.set_result(value)
+                return value
+            finally:
+                with self._lock:
+                    del self._pending[key]
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._pending
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'joined': self.joined,
+                    'in_flight': len(self._pending), 'entries': len(self._items)}
+
+
+stage_cache = StageCache(STAGE_CACHE_SIZE)
+
+
+def read_image_bytes(source):
+    # 경로(str) 또는 Streamlit UploadedFile 모두 받는다
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            return f.read()
+    return source.getvalue()
+
+
+def image_key(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _decode_image(data):
+    img = Image.open(BytesIO(data))
+    # RGBA 이미지를 RGB로 변환
+    return img.convert('RGB') if img.mode != 'RGB' else img
+
+
+def decode_image(key, data):
+    return stage_cache.run('image', [key], _decode_image, data)
+
+
+def ingredients_cached(key):
+    return StageCache.key('ingredients', [key]) in stage_cache
+
+
+def ingredients(key, image, recognize):
+    """Ingredients recognized in the image identified by key; recognize(image) runs on a miss."""
+    return stage_cache.run('ingredients', [key], recognize, image)
+
+
+def _recipe_inputs(user_need, ingredients):
+    return [normalize_phrase(user_need), normalize_ingredients(ingredients)]
+
+
+def recipe_key(user_need, ingredients):
+    return StageCache.key('recipes', _recipe_inputs(user_need, ingredients))
+
+
+def health_key(disease):
+    return StageCache.key('health', [normalize_phrase(disease)])
+
+
+def recipe_matches(user_need, ingredients):
+    return stage_cache.run('recipes', _recipe_inputs(user_need, ingredients),
+                           llmStructure.retrieve_recipes, user_need, ingredients)
+
+
+def health_matches(disease):
+    return stage_cache.run('health', [normalize_phrase(disease)], llmStructure.retrieve_health, disease)
+
+
+def context(user_need, ingredients, disease):
+    """(recipe matches, health matches); the two independent stages run in parallel."""
+    health_future = submit(stage_executor, health_matches, disease)
+    recipes = recipe_matches(user_need, ingredients)
+    return recipes, health_future.result()
+
+
+def recommendation_stream(user_need, ingredients, disease, health=None):
+    """Streams the LLM answer, or yields the cached answer in one piece.
+
+    If health is a list, it is filled with the health matches the prompt used (for local health scoring).
+    """
+    ctx = context(user_need, ingredients, disease)
+    if health is not None:
+        health.extend(ctx[1])
+    # LLM 응답은 단계 캐시에 두지 않는다: 같은 입력 + 문서 ID 키로 responseCache(TTL, 디스크)가 이미 캐시한다
+    with span('stage.llm'):
+        yield from llmStructure.gptOutputStream(user_need, ingredients, disease, context=ctx)
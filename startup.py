@@ -0,0 +1,216 @@
+import argparse
+import importlib
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from tracing import register_gauges, span
+
+# 프로세스 시작 비용 관리
+# - 무거운 객체(API 클라이언트, 벡터 인덱스, CSV로 만드는 색인, 캐시, 모델)는 import 때 만들지 않고
+#   resource()로 등록해 두었다가 처음 쓸 때 한 번만 만든다 (프로세스 전체 싱글턴). 키가 없어도 import는 실패하지 않는다
+# - warm_up()은 등록된 자원을 병렬로 미리 만들고 연결을 열어 둔다 (서비스 시작, Streamlit 첫 실행)
+# - readiness()는 자원별 상태(ready/cold/failed, 만든 시간, 오류)를 돌려준다 → service.py /readyz
+#
+#   python startup.py                         # 웜업 후 준비 상태 출력 (준비되지 않으면 종료 코드 1)
+#   python startup.py --imports --budget-ms 1500    # 모듈별 import 시간 (새 프로세스에서 -X importtime)
+
+# 웜업할 때 먼저 import해서 자원을 등록시키는 모듈
+WARMUP_MODULES = ['upstream', 'llmStructure', 'vision', 'clipRecognizer']
+# import 시간을 재는 진입 모듈
+IMPORT_MODULES = ['llmStructure', 'stages', 'service', 'batch']
+WARMUP_ENABLED = os.environ.get('SMARTCHEF_WARMUP', '1') != '0'
+WARMUP_THREADS = int(os.environ.get('SMARTCHEF_WARMUP_THREADS', '8'))
+WARMUP_TIMEOUT = float(os.environ.get('SMARTCHEF_WARMUP_TIMEOUT', '60'))
+
+_IMPORT_TIME = re.compile(r'import time:\s+(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)')
+
+
+class Resource:
+    """Process-wide singleton built by factory() on first call; a failed build is retried on the next call."""
+
+    def __init__(self, name, factory, warm=None, optional=False):
+        self.name = name
+        self.factory = factory
+        self.warm = warm
+        # optional 자원(로컬 CLIP 모델 등)은 실패해도 준비 상태를 막지 않는다
+        self.optional = optional
+        self.value = None
+        self.built = False
+        self.seconds = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        if self.built:
+            return self.value
+        with self._lock:
+            if not self.built:
+                started = time.perf_counter()
+                with span('startup.build', resource=self.name):
+                    try:
+                        self.value = self.factory()
+                    except Exception as e:
+                        self.error = f'{type(e).__name__}: {e}'
+                        raise
+                self.seconds = time.perf_counter() - started
+                self.error = None
+                self.built = True
+            return self.value
+
+    def set(self, value):
+        """Replaces the instance (fakes in benchmark.py, tests against another backend)."""
+        with self._lock:
+            self.value = value
+            self.built = True
+            self.error = None
+
+    def status(self):
+        state = 'ready' if self.built and self.error is None else 'failed' if self.error else 'cold'
+        report = {'state': state, 'optional': self.optional}
+        if self.seconds is not None:
+            report['seconds'] = round(self.seconds, 4)
+        if self.error:
+            report['error'] = self.error
+        return report
+
+
+resources = {}
+_warmup = {'started': None, 'finished': None, 'timed_out': 0}
+_warmup_lock = threading.Lock()
+
+
+def resource(name, factory, warm=None, optional=False):
+    """Registers and returns a lazily built singleton; call it to get the instance."""
+    resources[name] = Resource(name, factory, warm, optional)
+    return resources[name]
+
+
+def _warm_one(res):
+    res()
+    if res.warm is not None:
+        # 연결 열기, 메모리맵 미리 읽기처럼 만든 뒤에 하는 준비. 실패하면 그 자원은 failed로 보고한다
+        try:
+            with span('startup.warm', resource=res.name):
+                res.warm(res.value)
+        except Exception as e:
+            res.error = f'{type(e).__name__}: {e}'
+            raise
+
+
+def warm_up(names=None, timeout=WARMUP_TIMEOUT):
+    """Imports WARMUP_MODULES, builds and warms resources in parallel and returns readiness()."""
+    with _warmup_lock:
+        _warmup['started'] = time.time()
+        _warmup['finished'] = None
+    with span('startup.warmup'):
+        for module in WARMUP_MODULES:
+            try:
+                importlib.import_module(module)
+            except Exception as e:
+                # import부터 실패한 모듈도 보고에 나오게 한다. 그 모듈의 필수 자원이 있었다면 그 자원이 쓰일 때
+                # 실패하므로, 모듈 항목 자체는 준비 상태를 막지 않는다 (선택 의존성이 없는 서버도 준비될 수 있게)
+                failed = resources.setdefault(f'module:{module}', Resource(f'module:{module}', None, optional=True))
+                failed.error = f'{type(e).__name__}: {e}'
+        targets = [resources[n] for n in (names or list(resources)) if n in resources and resources[n].factory]
+        # with 블록을 쓰면 빠져나갈 때 모든 작업을 기다리므로 timeout이 의미가 없다
+        executor = ThreadPoolExecutor(max_workers=WARMUP_THREADS, thread_name_prefix='warmup')
+        futures = [executor.submit(_warm_one, res) for res in targets if not res.optional or names]
+        _, pending = wait(futures, timeout=timeout)
+        # 시간 안에 끝나지 않은 자원은 cold로 남고 처음 쓸 때 마저 만든다
+        executor.shutdown(wait=False, cancel_futures=True)
+    with _warmup_lock:
+        _warmup['finished'] = time.time()
+        _warmup['timed_out'] = len(pending)
+    return readiness()
+
+
+def warm_up_in_background(names=None):
+    """Starts warm_up() on a daemon thread once per process."""
+    with _warmup_lock:
+        if _warmup['started'] is not None:
+            return False
+        _warmup['started'] = time.time()
+    threading.Thread(target=warm_up, args=(names,), name='warmup', daemon=True).start()
+    return True
+
+
+def readiness():
+    """{'ready', 'warmup', 'resources'}; ready once warm-up finished and every required resource is built."""
+    statuses = {name: res.status() for name, res in resources.items()}
+    with _warmup_lock:
+        started, finished, timed_out = _warmup['started'], _warmup['finished'], _warmup['timed_out']
+    warmup = {'state': 'done' if finished else 'running' if started else 'not started'}
+    if finished:
+        warmup['seconds'] = round(finished - started, 3)
+        warmup['timed_out'] = timed_out
+    ready = finished is not None and all(s['state'] == 'ready' for s in statuses.values() if not s['optional'])
+    return {'ready': ready, 'warmup': warmup, 'resources': statuses}
+
+
+def import_times(module):
+    """(cumulative seconds, [(seconds, submodule)] heaviest first) for importing module in a fresh interpreter."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(f'import {module} failed: {result.stderr.strip().splitlines()[-1:]}')
+    # -X importtime은 자식 모듈을 부모보다 먼저 찍는다: 진입 모듈 줄 바로 위의 더 깊은 줄들이 그 하위 트리
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match is not None:
+            entries.append(((len(match.group(3)) - 1) // 2, int(match.group(2)) / 1e6, match.group(4)))
+    position = max(i for i, (depth, _, name) in enumerate(entries) if depth == 0 and name == module)
+    parts = []
+    for depth, seconds, name in reversed(entries[:position]):
+        if depth == 0:
+            break
+        if depth == 1:
+            parts.append((seconds, name))
+    return entries[position][1], sorted(parts, reverse=True)
+
+
+def _gauges():
+    for name, res in resources.items():
+        yield 'smartchef_resource_ready', {'resource': name}, 1 if res.status()['state'] == 'ready' else 0
+        if res.seconds is not None:
+            yield 'smartchef_resource_build_seconds', {'resource': name}, res.seconds
+
+
+register_gauges(_gauges)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Warm up SmartChef resources or measure import time.')
+    parser.add_argument('--imports', action='store_true', help='measure import time instead of warming up')
+    parser.add_argument('--modules', nargs='+', default=IMPORT_MODULES)
+    parser.add_argument('--top', type=int, default=5, help='heaviest direct imports to list per module')
+    parser.add_argument('--budget-ms', type=float, help='exit 1 if any module takes longer to import')
+    parser.add_argument('--resources', nargs='+', help='warm up only these resources')
+    args = parser.parse_args(argv)
+
+    if not args.imports:
+        report = warm_up(args.resources)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        raise SystemExit(0 if report['ready'] else 1)
+
+    over_budget = False
+    for module in args.modules:
+        total, parts = import_times(module)
+        print(f'{module:<16} {total * 1000:8.1f}ms')
+        for seconds, name in parts[:args.top]:
+            print(f'    {name:<28} {seconds * 1000:8.1f}ms')
+        over_budget |= args.budget_ms is not None and total * 1000 > args.budget_ms
+    raise SystemExit(1 if over_budget else 0)
+
+
+if __name__ == '__main__':
+    # 다른 모듈이 등록하는 자원 목록은 'startup' 모듈에 있으므로 __main__이 아니라 그쪽으로 실행한다
+    import startup
+
+    startup.main()
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crawler  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# 서울아산병원 식사요법 페이지를 흉내 내는 로컬 픽스처 서버
+# - 목록: LIST_PATH?pageIndex=N → list_N.html, 상세: mealTherapyDetail.do?mtId=N → detail_N.html
+# - 본문 해시로 ETag를 주고 If-None-Match가 맞으면 304를 돌려준다
+DETAIL_PATH = '/asan/healthinfo/mealtherapy/mealTherapyDetail.do'
+
+
+class FixtureSite:
+    """Fixture pages keyed by name ('list_1', 'detail_101'); tests may edit or delete them between crawls."""
+
+    def __init__(self, directory):
+        self.pages = {}
+        for filename in os.listdir(directory):
+            name, ext = os.path.splitext(filename)
+            if ext == '.html':
+                with open(os.path.join(directory, filename), encoding='utf-8') as f:
+                    self.pages[name] = f.read()
+        self.log = []
+        self.url = None
+
+    def page_name(self, path, query):
+        params = parse_qs(query)
+        if path == crawler.LIST_PATH:
+            return f"list_{params.get('pageIndex', ['1'])[0]}"
+        if path == DETAIL_PATH:
+            return f"detail_{params.get('mtId', [''])[0]}"
+        return None
+
+    def statuses(self):
+        return [status for _, status in self.log]
+
+
+def _handler(site):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            body = site.pages.get(site.page_name(parts.path, parts.query))
+            if body is None:
+                site.log.append((self.path, 404))
+                self.send_error(404)
+                return
+            data = body.encode('utf-8')
+            etag = '"%s"' % hashlib.sha1(data).hexdigest()[:16]
+            if self.headers.get('If-None-Match') == etag:
+                site.log.append((self.path, 304))
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            site.log.append((self.path, 200))
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+@pytest.fixture
+def fixture_site():
+    site = FixtureSite(os.path.join(FIXTURES, 'mealtherapy'))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _handler(site))
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    site.url = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        yield site
+    finally:
+        server.shutdown()
+        server.server_close()
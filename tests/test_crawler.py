@@ -0,0 +1,132 @@
+import asyncio
+import csv
+import os
+
+import pytest
+
+import crawler
+from healthLookup import HEALTH_COLUMNS
+
+
+def run(site, tmp_path, *extra):
+    out = tmp_path / 'health.csv'
+    crawler.main(['--base-url', site.url, '--out', str(out), '--cache', str(tmp_path / 'pages.sqlite3'),
+                  '--pages', '2', '--interval', '0', *extra])
+    return out
+
+
+def read_rows(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        rows = list(csv.reader(f))
+    return rows[0], rows[1:]
+
+
+def test_parse_list_keeps_only_list_form_links(fixture_site):
+    links = crawler.parse_list(fixture_site.pages['list_1'], fixture_site.url)
+    assert links == [
+        ('당뇨병', f'{fixture_site.url}/asan/healthinfo/mealtherapy/mealTherapyDetail.do?mtId=101'),
+        ('고혈압', f'{fixture_site.url}/asan/healthinfo/mealtherapy/mealTherapyDetail.do?mtId=102'),
+    ]
+
+
+def test_parse_detail_joins_text_and_marks_missing_sections(fixture_site):
+    diabetes = crawler.parse_detail(fixture_site.pages['detail_101'])
+    assert list(diabetes) == HEALTH_COLUMNS[1:]
+    assert diabetes['식사요법의 필요성'] == '혈당을 정상 범위로 유지하고합병증을 예방합니다.'
+    assert diabetes['식사요법의 실제'] == '규칙적으로 식사합니다.단순당 섭취를 줄입니다.'
+    assert diabetes['권장 식품'] == '현미, 잡곡, 채소, 생선'
+
+    hypertension = crawler.parse_detail(fixture_site.pages['detail_102'])
+    assert hypertension['그 외 주의사항'] == crawler.MISSING
+
+
+def test_first_crawl_writes_csv_in_list_order(fixture_site, tmp_path):
+    out = run(fixture_site, tmp_path)
+
+    header, rows = read_rows(out)
+    assert header == ['id', 'id'] + HEALTH_COLUMNS
+    assert [(r[0], r[1], r[2]) for r in rows] == [('0', '0', '당뇨병'), ('1', '1', '고혈압'), ('2', '2', '통풍')]
+    assert rows[2][6] == '내장류, 멸치, 맥주'
+    # 두 목록에 모두 나오는 상세 페이지는 한 번만 받는다
+    assert sorted(path for path, _ in fixture_site.log).count(
+        '/asan/healthinfo/mealtherapy/mealTherapyDetail.do?mtId=101') == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+def test_second_crawl_revalidates_with_304_and_leaves_csv_alone(fixture_site, tmp_path):
+    out = run(fixture_site, tmp_path)
+    before = out.read_bytes()
+    mtime = os.stat(out).st_mtime_ns
+    fixture_site.log.clear()
+
+    run(fixture_site, tmp_path)
+
+    assert fixture_site.statuses() == [304] * 5
+    assert out.read_bytes() == before
+    assert os.stat(out).st_mtime_ns == mtime
+
+
+def test_fetcher_counts_not_modified(fixture_site, tmp_path):
+    cache = crawler.PageCache(str(tmp_path / 'pages.sqlite3'))
+    try:
+        first, stats = asyncio.run(crawler.crawl(fixture_site.url, [], cache, pages=2, interval=0))
+        assert stats == {'requests': 5, 'not_modified': 0, 'changed': 5, 'unchanged': 0}
+
+        existing = [{'id': i, **row} for i, row in enumerate(first)]
+        second, stats = asyncio.run(crawler.crawl(fixture_site.url, existing, cache, pages=2, interval=0))
+        assert stats == {'requests': 5, 'not_modified': 5, 'changed': 0, 'unchanged': 0}
+        assert second == first
+    finally:
+        cache.close()
+
+
+def test_changed_and_new_pages_keep_ids_stable(fixture_site, tmp_path):
+    run(fixture_site, tmp_path)
+    fixture_site.log.clear()
+    fixture_site.pages['detail_102'] = fixture_site.pages['detail_102'].replace('젓갈, 장아찌, 라면', '젓갈, 장아찌')
+    fixture_site.pages['list_1'] = fixture_site.pages['list_1'].replace('mtId=101">당뇨병', 'mtId=104">신부전')
+    fixture_site.pages['detail_104'] = fixture_site.pages['detail_103'].replace('<title>통풍', '<title>신부전')
+
+    out = run(fixture_site, tmp_path)
+
+    _, rows = read_rows(out)
+    by_name = {r[2]: r for r in rows}
+    assert {name: r[0] for name, r in by_name.items()} == {'당뇨병': '0', '고혈압': '1', '통풍': '2', '신부전': '3'}
+    assert by_name['고혈압'][6] == '젓갈, 장아찌'
+    # 바뀐 목록/상세 페이지와 새 상세 페이지만 200, 나머지는 304
+    assert sorted(fixture_site.statuses()) == [200, 200, 200, 304, 304, 304]
+
+
+def test_prune_drops_unlisted_diseases(fixture_site, tmp_path):
+    run(fixture_site, tmp_path)
+    fixture_site.pages['list_2'] = '<html><body><form id="listForm"></form></body></html>'
+
+    out = run(fixture_site, tmp_path)
+    assert [r[2] for r in read_rows(out)[1]] == ['당뇨병', '고혈압', '통풍']
+
+    out = run(fixture_site, tmp_path, '--prune')
+    assert [(r[0], r[2]) for r in read_rows(out)[1]] == [('0', '당뇨병'), ('1', '고혈압')]
+
+
+def test_failed_write_keeps_previous_csv(fixture_site, tmp_path, monkeypatch):
+    out = run(fixture_site, tmp_path)
+    before = out.read_bytes()
+
+    def fail(src, dst):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(crawler.os, 'replace', fail)
+    with pytest.raises(OSError):
+        crawler.write_health_csv(str(out), [])
+    assert out.read_bytes() == before
+
+
+def test_empty_listing_leaves_csv_untouched(fixture_site, tmp_path):
+    out = run(fixture_site, tmp_path)
+    before = out.read_bytes()
+    for name in ('list_1', 'list_2'):
+        fixture_site.pages[name] = '<html><body><form id="listForm"></form></body></html>'
+
+    with pytest.raises(SystemExit):
+        run(fixture_site, tmp_path)
+    assert out.read_bytes() == before
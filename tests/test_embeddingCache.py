@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+import pytest
+
+import embeddingCache
+from embeddingCache import EmbeddingCache, cache_key, embed_with_cache
+
+MODEL = 'text-embedding-3-small'
+
+
+class FakeEmbeddings:
+    """Records each embeddings.create call and returns [len(text), i] vectors."""
+
+    def __init__(self):
+        self.calls = []
+
+    def create(self, input, model):
+        self.calls.append(list(input))
+        data = [SimpleNamespace(index=i, embedding=[float(len(t)), float(i)]) for i, t in enumerate(input)]
+        return SimpleNamespace(data=data[::-1], usage=SimpleNamespace(total_tokens=len(input)))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache(str(tmp_path / 'embeddings.sqlite3'), max_entries=3)
+
+
+def test_key_ignores_whitespace_and_unicode_form():
+    assert cache_key(MODEL, '  감자   양파 ') == cache_key(MODEL, '감자 양파')
+    assert cache_key(MODEL, '감자') != cache_key('other-model', '감자')
+
+
+def test_round_trip_and_counters(cache):
+    cache.put_many(MODEL, ['감자', '양파'], [[0.5, 1.0], [2.0, -1.0]])
+    assert cache.get_many(MODEL, ['양파', '당근', '감자']) == [[2.0, -1.0], None, [0.5, 1.0]]
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 1, 2)
+
+
+def access_times(cache):
+    return dict(cache._conn.execute('SELECT key, last_access FROM embeddings').fetchall())
+
+
+def test_hits_touch_only_stale_entries(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(embeddingCache.time, 'time', lambda: now[0])
+    cache.put_many(MODEL, ['감자'], [[1.0]])
+
+    now[0] += embeddingCache.TOUCH_INTERVAL / 2
+    cache.get_many(MODEL, ['감자'])
+    assert list(access_times(cache).values()) == [1000.0]
+
+    now[0] += embeddingCache.TOUCH_INTERVAL
+    cache.get_many(MODEL, ['감자'])
+    assert list(access_times(cache).values()) == [now[0]]
+
+
+def test_eviction_drops_least_recently_used(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(embeddingCache.time, 'time', lambda: now[0])
+    for text in ('a', 'b', 'c'):
+        now[0] += embeddingCache.TOUCH_INTERVAL + 1
+        cache.put_many(MODEL, [text], [[1.0]])
+    now[0] += embeddingCache.TOUCH_INTERVAL + 1
+    cache.get_many(MODEL, ['a'])
+    cache.put_many(MODEL, ['d'], [[1.0]])
+    assert [v is not None for v in cache.get_many(MODEL, ['a', 'b', 'c', 'd'])] == [True, False, True, True]
+
+
+def test_embed_with_cache_batches_unique_misses(cache):
+    client = SimpleNamespace(embeddings=FakeEmbeddings())
+    cache.put_many(MODEL, ['감자'], [[9.0, 9.0]])
+
+    vectors = embed_with_cache(client, cache, MODEL, ['감자', '양파 볶음', '양파  볶음', '당근'])
+    assert client.embeddings.calls == [['양파 볶음', '당근']]
+    assert vectors == [[9.0, 9.0], [5.0, 0.0], [5.0, 0.0], [2.0, 1.0]]
+
+    assert embed_with_cache(client, cache, MODEL, ['당근', '양파 볶음']) == [[2.0, 1.0], [5.0, 0.0]]
+    assert len(client.embeddings.calls) == 1
+
+
+def test_embed_without_cache(cache):
+    client = SimpleNamespace(embeddings=FakeEmbeddings())
+    assert embed_with_cache(client, None, MODEL, ['감자', '감자']) == [[2.0, 0.0], [2.0, 0.0]]
+    assert client.embeddings.calls == [['감자']]
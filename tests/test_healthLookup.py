@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from healthLookup import HEALTH_COLUMNS, HealthLookup
+
+HEALTH_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'health.csv')
+
+
+@pytest.fixture(scope='module')
+def lookup():
+    return HealthLookup.from_csv(HEALTH_CSV)
+
+
+def names(lookup, disease):
+    return [m['metadata']['질병명'] for m in lookup.lookup(disease)]
+
+
+def test_exact_suffix_and_alias_matches(lookup):
+    assert names(lookup, '당뇨병식') == ['당뇨병식']
+    assert names(lookup, '당뇨') == ['당뇨병식']
+    assert names(lookup, '고혈압') == ['고혈압식 / 폐성 고혈압식']
+    assert names(lookup, '위염') == ['급성/만성 위염식']
+    assert lookup.match('위염')[1] == 0.95
+
+
+def test_several_conditions_keep_csv_ids(lookup):
+    matches = lookup.lookup('당뇨, 고혈압 및 통풍, 당뇨병')
+    assert [(m['id'], m['metadata']['질병명']) for m in matches] == [
+        ('25', '당뇨병식'), ('2', '고혈압식 / 폐성 고혈압식'), ('75', '저퓨린식')]
+    assert set(HEALTH_COLUMNS) <= set(matches[0]['metadata'])
+    assert matches[0]['metadata']['text'].startswith('질병명: 당뇨병식, 식사요법의 필요성: ')
+
+
+def test_fuzzy_match_accepts_close_spelling(lookup):
+    row_id, score = lookup.match('아토피피부염')
+    assert lookup.rows[row_id]['질병명'] == '아토피성 피부염식'
+    assert 0.7 <= score < 0.95
+
+
+@pytest.mark.parametrize('condition', ['고혈당', '갑상선', '감기', ''])
+def test_fuzzy_match_leaves_lookalikes_to_vector_search(lookup, condition):
+    assert lookup.match(condition) is None
+    assert lookup.lookup(condition) == []
+
+
+def test_fuzzy_match_needs_margin_over_runner_up():
+    rows = [{col: '' for col in HEALTH_COLUMNS} for _ in range(2)]
+    rows[0]['질병명'] = '가나다라마'
+    rows[1]['질병명'] = '가나다라바'
+    lookup = HealthLookup(rows)
+    assert lookup.match('가나다라사') is None
+    assert lookup.match('가나다라마') == (0, 1.0)
+
+
+def test_missing_csv_gives_empty_lookup(tmp_path):
+    lookup = HealthLookup.from_csv(str(tmp_path / 'missing.csv'))
+    assert lookup.lookup('당뇨') == []
@@ -0,0 +1,53 @@
+import pytest
+
+from healthScore import HealthScorer, food_terms, recipe_tokens, stars
+
+ROWS = [
+    {'id': '7', '질병명': '당뇨병식', '권장 식품': '현미, 채소, 생선', '주의 식품': '설탕, 자반 생선류, 라면'},
+    {'id': '9', '질병명': '통풍', '권장 식품': '우유', '주의 식품': '맥주, 멸치'},
+]
+
+
+@pytest.mark.parametrize('text, terms', [
+    ('카페인(커피, 콜라), 주류(소주, 맥주 등)', ['카페인', '커피', '콜라', '주류', '소주', '맥주']),
+    ('1. 김치류 2. 하루 3잔이상 커피', ['김치류', '김치', '커피']),
+    ('두류, 주류, 김, 무', ['두류', '주류', '김', '무']),
+    ('함유식품, 강화 우유', ['우유']),
+    ('김치섭취를 줄입니다.', []),
+])
+def test_food_terms_drop_quantities_stopwords_and_sentences(text, terms):
+    assert food_terms(text) == terms
+
+
+def test_stars_round_half_up():
+    assert [stars(s) for s in (1, 2.5, 3.5, 4.49, 5)] == ['★☆☆☆☆', '★★★☆☆', '★★★★☆', '★★★★☆', '★★★★★']
+
+
+def test_score_counts_recommended_and_caution_foods():
+    scorer = HealthScorer(ROWS)
+    recipes = [recipe_tokens('현미밥 1공기, 설탕 1큰술'), recipe_tokens(['생선', '라면']), recipe_tokens('채소, 생선')]
+    scores, cautions = scorer.score(recipes, [{'id': '7'}])
+    # '생선'은 같은 질병의 권장 식품이라 주의 식품으로 세지 않는다
+    assert scores.tolist() == [2.5, 2.5, 4.0]
+    assert cautions == [['설탕'], ['라면'], []]
+
+
+def test_several_conditions_are_combined():
+    scores, cautions = HealthScorer(ROWS).score([recipe_tokens('우유, 멸치볶음, 설탕')], [{'id': '7'}, {'id': '9'}])
+    assert scores.tolist() == [1.5]
+    assert sorted(cautions[0]) == ['멸치', '설탕']
+
+
+def test_unknown_ids_fall_back_to_metadata_text():
+    match = {'id': 'x', 'metadata': {'text': '질병명: B, 권장 식품: 채소, 주의 식품: 설탕'}}
+    scores, cautions = HealthScorer(ROWS).score([recipe_tokens('설탕')], [match])
+    assert scores.tolist() == [2.0]
+    assert cautions == [['설탕']]
+
+
+def test_no_condition_leaves_recipes_unscored():
+    scorer = HealthScorer(ROWS)
+    assert scorer.score([recipe_tokens('현미')], []) == (None, [[]])
+    recipes = scorer.annotate([{'all_ingredients': '현미, 채소'}], [])
+    assert recipes == [{'all_ingredients': '현미, 채소', 'health_score': '', 'caution_foods': []}]
+    assert scorer.annotate([{'all_ingredients': '현미, 채소'}], [{'id': '7'}])[0]['health_score'] == '★★★★☆'
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from jsonStream import RecommendationStreamParser
+
+OUTPUT = json.dumps({
+    'chefTip': '감자는 "찬물"에 담가 두세요.\n',
+    'recipes': {
+        'first': {'name': '감자조림', 'ingredients': ['감자', '간장'], 'steps': {'1': '썬다', '2': '조린다'}},
+        'second': {'name': '감자전', 'ingredients': [], 'note': '{중괄호}와 [대괄호]'},
+    },
+}, ensure_ascii=False, indent=2)
+
+
+def feed_in_chunks(text, size):
+    parser = RecommendationStreamParser()
+    events = []
+    for i in range(0, len(text), size):
+        events.append((i + size, parser.feed(text[i:i + size])))
+    return parser, events
+
+
+@pytest.mark.parametrize('size', [1, 3, 17, len(OUTPUT)])
+def test_events_do_not_depend_on_chunking(size):
+    parser, chunks = feed_in_chunks('```json\n' + OUTPUT + '\n```', size)
+    events = [event for _, found in chunks for event in found]
+    expected = json.loads(OUTPUT)
+    assert events == [
+        ('chefTip', expected['chefTip']),
+        ('recipe', 'first', expected['recipes']['first']),
+        ('recipe', 'second', expected['recipes']['second']),
+    ]
+    assert parser.result() == expected
+
+
+def test_recipe_is_emitted_as_soon_as_its_object_closes():
+    text = OUTPUT
+    first_end = text.index('}', text.index('"steps"')) + 1
+    first_end = text.index('}', first_end) + 1
+    parser = RecommendationStreamParser()
+    assert [e[0] for e in parser.feed(text[:first_end - 1])] == ['chefTip']
+    assert parser.feed(text[first_end - 1:first_end]) == [('recipe', 'first', json.loads(text)['recipes']['first'])]
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+import localIndex
+from localIndex import LocalIndex, build_namespace
+
+
+@pytest.fixture(scope='module')
+def corpus():
+    rng = np.random.default_rng(7)
+    vectors = rng.normal(size=(500, 32)).astype(np.float32)
+    queries = rng.normal(size=(4, 32)).astype(np.float32)
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = np.argsort(-(queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ normed.T, axis=1)
+    return vectors, queries, expected
+
+
+def build(tmp_path, corpus, **kwargs):
+    vectors, _, _ = corpus
+    ids = [f'r{i}' for i in range(len(vectors))]
+    metadatas = [{'text': f'Dish_Name: 요리{i}'} for i in range(len(vectors))]
+    build_namespace(str(tmp_path), 'receipe', ids, vectors, metadatas, **kwargs)
+    return LocalIndex(str(tmp_path))
+
+
+def test_exact_search_matches_brute_force(tmp_path, corpus, monkeypatch):
+    # 청크 경계를 넘는 top-k 병합도 확인한다
+    monkeypatch.setattr(localIndex, 'QUERY_CHUNK_ROWS', 64)
+    _, queries, expected = corpus
+    index = build(tmp_path, corpus)
+    results = index.query_batch(queries, top_k=10, namespace='receipe', include_metadata=True)
+    for result, order in zip(results, expected):
+        assert [m['id'] for m in result['matches']] == [f'r{i}' for i in order[:10]]
+        scores = [m['score'] for m in result['matches']]
+        assert scores == sorted(scores, reverse=True)
+    first = results[0]['matches'][0]
+    assert first['metadata'] == {'text': f'Dish_Name: 요리{expected[0][0]}'}
+    assert index.query(queries[0], top_k=10, namespace='receipe')['matches'][0]['id'] == first['id']
+
+
+def test_int8_and_ivf_keep_the_top_results(tmp_path, corpus):
+    _, queries, expected = corpus
+    quantized = build(tmp_path / 'int8', corpus, dtype='int8')
+    ivf = build(tmp_path / 'ivf', corpus, nlist=8)
+    ivf.nprobe = 8
+    for index in (quantized, ivf):
+        for query, order in zip(queries, expected):
+            ids = [m['id'] for m in index.query(query, top_k=5, namespace='receipe')['matches']]
+            assert len(set(ids) & {f'r{i}' for i in order[:5]}) >= 4
+
+
+@pytest.mark.parametrize('top_k, count', [(0, 0), (-1, 0), (1000, 500)])
+def test_top_k_is_clamped(tmp_path, corpus, top_k, count):
+    index = build(tmp_path, corpus)
+    assert len(index.query(corpus[1][0], top_k=top_k, namespace='receipe')['matches']) == count
+
+
+def test_values_stats_and_missing_namespace(tmp_path, corpus):
+    index = build(tmp_path, corpus)
+    match = index.query(corpus[0][3], top_k=1, namespace='receipe', include_values=True)['matches'][0]
+    assert match['id'] == 'r3'
+    assert np.isclose(np.linalg.norm(match['values']), 1.0)
+    assert index.describe_index_stats() == {'namespaces': {'receipe': {'vector_count': 500}}}
+    with pytest.raises(KeyError):
+        index.query(corpus[1][0], namespace='health')
+
+
+def test_build_rejects_mismatched_lengths(tmp_path):
+    with pytest.raises(ValueError):
+        build_namespace(str(tmp_path), '', ['a'], np.ones((2, 4)))
@@ -0,0 +1,49 @@
+import numpy as np
+
+from pantryIndex import PantryIndex, pantry_tokens, parse_ingredient_details, parse_ingredient_words, rerank
+
+RECIPES = [
+    ('r1', parse_ingredient_words('[재료] 계란 노른자 2알| 청양 고추 1개| 소금 약간')),
+    ('r2', parse_ingredient_words('[재료] 고추장 2큰술| 감자 1개| 양파 반개')),
+    ('r3', parse_ingredient_words('[재료] 달걀 3개| 대파 1대')),
+]
+
+
+def test_parse_keeps_words_of_multi_word_names_and_drops_staples():
+    assert parse_ingredient_words('[재료] 계란 노른자 2알| 소금 약간| 감자(중) 1개') == {
+        '계란노른자': ('계란', '노른자'), '감자': ()}
+    assert parse_ingredient_details('[양념] 쇠고기 100g| 파 약간') == {'소고기', '대파'}
+    assert pantry_tokens('달걀, 감자, ') == {'계란', '감자'}
+
+
+def test_pantry_item_covers_whole_tokens_and_words_only():
+    index = PantryIndex(RECIPES)
+    covered, missing = index.coverage([0, 1, 2], pantry_tokens('계란, 고추'))
+    # '고추'는 '청양 고추'를 덮지만 '고추장'은 덮지 않는다
+    assert covered.tolist() == [1.0, 0.0, 0.5]
+    assert missing.tolist() == [0, 3, 1]
+
+
+def test_coverage_of_empty_pantry_and_empty_recipe():
+    index = PantryIndex(RECIPES + [('r4', {})])
+    covered, missing = index.coverage([3, 1], set())
+    assert covered.tolist() == [1.0, 0.0]
+    assert missing.tolist() == [0, 3]
+
+
+def test_rerank_prefers_recipes_the_pantry_covers():
+    index = PantryIndex(RECIPES)
+    matches = [{'id': 'r2', 'score': 0.80}, {'id': 'r1', 'score': 0.78}, {'id': 'r3', 'score': 0.5}]
+    ranked, covered, missing = rerank(matches, ['계란', '고추'], index, top_k=2)
+    assert [m['id'] for m in ranked] == ['r1', 'r2']
+    assert covered.tolist() == [1.0, 0.0]
+    assert missing.tolist() == [0, 3]
+
+
+def test_rerank_parses_matches_missing_from_the_index():
+    index = PantryIndex(RECIPES)
+    matches = [{'id': 'r9', 'score': 0.7, 'details': '[재료] 감자 2개| 양파 1개'}]
+    ranked, covered, missing = rerank(matches, '감자', index, top_k=5, text_details=lambda m: m['details'])
+    assert [m['id'] for m in ranked] == ['r9']
+    assert np.allclose(covered, [0.5])
+    assert missing.tolist() == [1]
@@ -0,0 +1,70 @@
+import pytest
+
+import promptBuilder
+from promptBuilder import compact_health, compact_recipes, fit_to_budget, parse_fields
+
+
+def recipe(recipe_id, score, name, details):
+    text = f'Recipe_Title: {name} 만들기, Dish_Name: {name}, Ingredient_Details: {details}, Cooking_Time: 30분이내'
+    return {'id': recipe_id, 'score': score, 'metadata': {'text': text}}
+
+
+def health(doc_id, score, name):
+    text = f'질병명: {name}, 식사요법의 필요성: 필요, 권장 식품: 채소, 생선, 주의 식품: 설탕, 그 외 주의사항: nan'
+    return {'id': doc_id, 'score': score, 'metadata': {'text': text}}
+
+
+def test_parse_fields_splits_on_known_columns_only():
+    fields = parse_fields('질병명: 당뇨병식, 권장 식품: 현미, 채소, 주의 식품: nan', promptBuilder.HEALTH_COLUMNS)
+    assert fields == {'질병명': '당뇨병식', '권장 식품': '현미, 채소'}
+
+
+def test_compact_recipes_drops_duplicate_names_and_ingredient_sets():
+    docs = compact_recipes([
+        recipe('1', 0.9, '감자조림', '[재료] 감자 2개| 간장 2큰술'),
+        recipe('2', 0.8, '감자조림', '[재료] 감자 3개| 양파 1개'),
+        recipe('3', 0.7, '감자볶음', '[재료] 감자 1개| 소금 약간'),
+        recipe('4', 0.6, '양파볶음', '[재료] 양파 1개'),
+    ])
+    assert [d['id'] for d in docs] == ['1', '4']
+    assert docs[0]['text'] == '요리: 감자조림 / 재료: [재료] 감자 2개| 간장 2큰술 / 시간: 30분이내'
+
+
+def test_compact_health_keeps_prompt_fields():
+    docs = compact_health([health('25', 1.0, '당뇨병식'), health('26', 0.9, '당뇨병식')])
+    assert docs == [{'id': '25', 'score': 1.0, 'text': '질병: 당뇨병식 / 권장 식품: 채소, 생선 / 주의 식품: 설탕'}]
+
+
+@pytest.fixture
+def word_tokens(monkeypatch):
+    # 문서 하나 = 토큰 하나
+    monkeypatch.setattr(promptBuilder, 'count_tokens', lambda text, model=None: len(text.split()))
+
+
+def render(recipes, health):
+    return ' '.join(d['id'] for d in recipes + health)
+
+
+def test_fit_to_budget_trims_recipes_before_health(word_tokens):
+    recipes = [{'id': 'r1', 'score': 0.5}, {'id': 'r2', 'score': 0.9}, {'id': 'r3', 'score': 0.5}]
+    health_docs = [{'id': 'h1', 'score': 0.95}, {'id': 'h2', 'score': 0.7}]
+    prompt, tokens, kept_recipes, kept_health, dropped = fit_to_budget(render, recipes, health_docs, budget=3)
+    # 점수가 같으면 뒤쪽(r3)부터, 레시피는 MIN_RECIPE_DOCS까지 줄인 뒤 건강정보를 뺀다
+    assert [d['id'] for d in kept_recipes] == ['r2']
+    assert [d['id'] for d in kept_health] == ['h1', 'h2']
+    assert (prompt, tokens, dropped) == ('r2 h1 h2', 3, 2)
+
+    prompt, tokens, kept_recipes, kept_health, dropped = fit_to_budget(render, recipes, health_docs, budget=1)
+    assert prompt == 'r2 h1'
+    assert (tokens, dropped) == (2, 3)
+    assert len(recipes) == 3 and len(health_docs) == 2
+
+
+def test_fit_to_budget_leaves_prompt_alone_when_it_fits(word_tokens):
+    recipes = [{'id': 'r1', 'score': 0.1}]
+    assert fit_to_budget(render, recipes, [], budget=10) == ('r1', 1, recipes, [], 0)
+
+
+def test_count_tokens_estimate_without_tiktoken(monkeypatch):
+    monkeypatch.setattr(promptBuilder, 'tiktoken', None)
+    assert promptBuilder.count_tokens('abcdefgh 당뇨') == 5
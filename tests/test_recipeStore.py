@@ -0,0 +1,67 @@
+import csv
+
+import pytest
+
+from promptBuilder import RECIPE_COLUMNS, parse_fields, recipe_fields
+from recipeStore import RecipeStore, build, cooking_minutes
+
+HEADER = ['Recipe_ID', 'Recipe_Title', 'Dish_Name', 'Ingredient_Details', 'Cooking_Time', 'Difficulty_Level']
+RECIPES = [
+    ['101', '초간단 감자조림', '감자조림', '[재료] 감자 2개| 간장 2큰술', '30분이내', '초급'],
+    ['102', '바삭한 감자전', 'nan', '[재료] 감자 3개', '2시간이상', '중급'],
+    ['103', '비빔밥', '비빔밥', '', '', ''],
+]
+
+
+def write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def store(tmp_path):
+    first = write_csv(tmp_path / 'processed.csv', RECIPES)
+    second = write_csv(tmp_path / 'whole.csv', [['101', '덮어쓰면 안 됨', '', '', '', ''],
+                                                ['104', '두부조림', '두부조림', '[재료] 두부 1모', '15분이내', '초급']])
+    assert build([first, second], str(tmp_path / 'recipes')) == 4
+    return RecipeStore.open(str(tmp_path / 'recipes'))
+
+
+@pytest.mark.parametrize('text, minutes', [('30분이내', 30), ('2시간이상', 120), ('', -1), ('nan', -1)])
+def test_cooking_minutes(text, minutes):
+    assert cooking_minutes(text) == minutes
+
+
+def test_lookup_by_id_with_first_csv_winning(store):
+    assert len(store) == 4 and '104' in store and 101 in store and '999' not in store
+    potato = store.get(101)
+    assert (potato.title, potato.dish_name, potato.cooking_minutes, potato.difficulty) == (
+        '초간단 감자조림', '감자조림', 30, '초급')
+    pancake = store.get('102')
+    # 'nan'은 빈 값으로 저장하고 요리 이름은 제목으로 대신한다
+    assert (pancake.dish_name, pancake.cooking_minutes, pancake.difficulty) == ('바삭한 감자전', 120, '중급')
+    assert store.get('103').cooking_minutes is None
+    assert store.get('999') is None
+
+
+def test_fields_match_parsed_metadata_text(store):
+    text = ', '.join(f'{col}: {val}' for col, val in zip(HEADER[1:], RECIPES[0][1:]))
+    assert store.get('101').fields() == parse_fields(text, RECIPE_COLUMNS)
+
+
+def test_hydrate_attaches_recipes(store):
+    matches = [{'id': '104', 'score': 0.9}, {'id': '999', 'score': 0.8}]
+    assert store.hydrate(matches) is False
+    assert recipe_fields(matches[0])['Dish_Name'] == '두부조림'
+    assert 'recipe' not in matches[1]
+    assert store.hydrate(matches[:1]) is True
+
+
+def test_rebuild_replaces_the_store(store, tmp_path):
+    build([write_csv(tmp_path / 'small.csv', RECIPES[:1])], store.root)
+    assert len(RecipeStore(store.root)) == 1
+    assert not list(tmp_path.glob('recipes.*.tmp'))
+    assert RecipeStore.open(str(tmp_path / 'missing')) is None
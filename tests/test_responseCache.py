@@ -0,0 +1,58 @@
+import pytest
+
+import responseCache
+from responseCache import DiskBackend, MemoryBackend, ResponseCache, response_cache_from_env, response_cache_key
+
+KEY_ARGS = ('gpt-4o-mini', ['감자', '양파'], '당뇨병', '매운 거', ['1', '2'], ['25'])
+
+
+def test_key_normalizes_user_inputs_but_not_retrieved_ids():
+    base = response_cache_key(*KEY_ARGS)
+    assert response_cache_key('gpt-4o-mini', ['양파 ', '감자'], ' 당뇨병', '매운  거', [1, 2], [25]) == base
+    assert response_cache_key('gpt-4o-mini', ['감자', '양파'], '당뇨병', '매운 거', ['2', '1'], ['25']) != base
+    assert response_cache_key(*KEY_ARGS, prompt_version='v2') != base
+
+
+@pytest.fixture(params=['memory', 'disk'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBackend(2)
+    return DiskBackend(str(tmp_path / 'responses.sqlite3'), 2)
+
+
+def test_entries_expire_after_ttl(backend, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(responseCache.time, 'time', lambda: now[0])
+    cache = ResponseCache(backend, ttl=60)
+    cache.put('a', '{"chefTip": "..."}')
+    assert cache.get('a') == '{"chefTip": "..."}'
+    now[0] += 61
+    assert cache.get('a') is None
+    assert (cache.stats()['hits'], cache.stats()['misses'], cache.stats()['entries']) == (1, 1, 0)
+
+
+def test_least_recently_used_entry_is_evicted(backend, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(responseCache.time, 'time', lambda: now[0])
+    cache = ResponseCache(backend, ttl=3600)
+    for key in ('a', 'b'):
+        now[0] += 1
+        cache.put(key, key.upper())
+    now[0] += 1
+    cache.get('a')
+    now[0] += 1
+    cache.put('c', 'C')
+    assert [cache.get(k) for k in 'abc'] == ['A', None, 'C']
+    assert cache.stats()['evictions'] == 1
+
+
+def test_cache_from_env(monkeypatch, tmp_path):
+    monkeypatch.setenv('SMARTCHEF_RESPONSE_CACHE', 'off')
+    assert response_cache_from_env() is None
+    monkeypatch.setenv('SMARTCHEF_RESPONSE_CACHE', 'disk')
+    monkeypatch.setenv('SMARTCHEF_RESPONSE_CACHE_PATH', str(tmp_path / 'r.sqlite3'))
+    monkeypatch.setenv('SMARTCHEF_RESPONSE_CACHE_TTL', '5')
+    stats = response_cache_from_env().stats()
+    assert (stats['backend'], stats['ttl']) == ('DiskBackend', 5.0)
+    monkeypatch.delenv('SMARTCHEF_RESPONSE_CACHE')
+    assert response_cache_from_env().stats()['backend'] == 'MemoryBackend'
@@ -0,0 +1,111 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+
+from service import SingleFlight, TokenBroadcast
+
+BODY = {'ingredients': ['감자', '양파'], 'disease': '당뇨병', 'craving': '매운'}
+
+
+@pytest.fixture(scope='module')
+def service():
+    # fakes.py 업스트림에 연결한 서비스 (지연시간은 짧게)
+    os.environ.setdefault('SMARTCHEF_FAKE_SCALE', '0.02')
+    import fakeService
+
+    return fakeService.service
+
+
+def request(service, *calls):
+    async def go():
+        transport = httpx.ASGITransport(app=service.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test', timeout=30) as client:
+            return await asyncio.gather(*(client.request(method, path, **kwargs) for method, path, kwargs in calls))
+    return asyncio.run(go())
+
+
+def test_single_flight_runs_each_key_once():
+    flights = SingleFlight()
+    runs = []
+
+    async def work(key):
+        runs.append(key)
+        await asyncio.sleep(0.01)
+        return key.upper()
+
+    async def go():
+        return await asyncio.gather(*(flights.do(key, lambda key=key: work(key)) for key in 'aab'))
+
+    assert asyncio.run(go()) == ['A', 'A', 'B']
+    assert runs == ['a', 'b']
+    assert flights.stats() == {'leaders': 2, 'followers': 1, 'in_flight': 0}
+
+
+def test_late_follower_replays_then_follows_live():
+    async def go():
+        broadcast = TokenBroadcast()
+        broadcast.publish('감자')
+        early = asyncio.ensure_future(collect(broadcast))
+        await asyncio.sleep(0)
+        broadcast.publish('조림')
+        late = asyncio.ensure_future(collect(broadcast))
+        await asyncio.sleep(0)
+        broadcast.publish('!')
+        broadcast.close()
+        return await early, await late
+
+    async def collect(broadcast):
+        return [token async for token in broadcast.follow()]
+
+    assert asyncio.run(go()) == (['감자', '조림', '!'], ['감자', '조림', '!'])
+
+
+def test_followers_get_the_leaders_error():
+    async def go():
+        broadcast = TokenBroadcast()
+        broadcast.publish('감자')
+        broadcast.close(RuntimeError('upstream failed'))
+        tokens = []
+        with pytest.raises(RuntimeError):
+            async for token in broadcast.follow():
+                tokens.append(token)
+        return tokens
+
+    assert asyncio.run(go()) == ['감자']
+
+
+BAD_BODIES = [b'{bad', b'[1, 2]', b'"text"']
+BAD_FIELDS = {
+    '/recommend': [b'{"ingredients": 5}', b'{"ingredients": ["a", 1]}', b'{"disease": 3}', b'{"craving": ["a"]}'],
+    '/speech': [b'{"text": ["a"]}', b'{"text": "a", "voice": 1}'],
+}
+BAD_FIELDS['/recommend/stream'] = BAD_FIELDS['/recommend']
+
+
+@pytest.mark.parametrize('path, content', [(path, content) for path, fields in BAD_FIELDS.items()
+                                           for content in BAD_BODIES + fields])
+def test_malformed_bodies_get_400(service, path, content):
+    (response,) = request(service, ('POST', path, {'content': content}))
+    assert response.status_code == 400
+
+
+def test_identical_requests_share_one_recommendation(service):
+    before = service.flights.stats()
+    responses = request(service, *[('POST', '/recommend', {'json': BODY})] * 5,
+                        ('POST', '/recommend', {'json': {**BODY, 'ingredients': '양파, 감자 '}}))
+    assert [r.status_code for r in responses] == [200] * 6
+    assert len({r.json()['content'] for r in responses}) == 1
+    after = service.flights.stats()
+    assert after['leaders'] - before['leaders'] == 1
+    assert after['followers'] - before['followers'] == 5
+
+
+def test_stream_matches_recommendation_and_sends_health_ids(service):
+    body = {**BODY, 'craving': '국물'}
+    (streamed,) = request(service, ('POST', '/recommend/stream', {'json': body}))
+    (plain,) = request(service, ('POST', '/recommend', {'json': body}))
+    assert streamed.status_code == 200
+    assert streamed.text == plain.json()['content']
+    assert streamed.headers[service.apiClient.HEALTH_IDS_HEADER].startswith('[')
@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+import stages
+from stages import StageCache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = StageCache(2)
+    monkeypatch.setattr(stages, 'stage_cache', cache)
+    return cache
+
+
+def test_run_memoizes_by_inputs_with_lru_eviction(cache):
+    calls = []
+    compute = lambda x: calls.append(x) or x * 2
+    assert [cache.run('double', [x], compute, x) for x in (1, 2, 1, 3, 2)] == [2, 4, 2, 6, 4]
+    # 용량 2: 3을 넣을 때 가장 오래 안 쓴 2가 빠진다
+    assert calls == [1, 2, 3, 2]
+    assert cache.stats() == {'hits': 1, 'misses': 4, 'joined': 0, 'in_flight': 0, 'entries': 2}
+
+
+def test_concurrent_misses_compute_once(cache):
+    calls = []
+    started = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return 'recipes'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.run('recipes', ['감자'], slow)))
+               for _ in range(4)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ['recipes'] * 4
+    assert calls == [1]
+    assert cache.stats()['joined'] == 3
+
+
+def test_failed_computation_is_not_cached(cache):
+    def fail():
+        raise TimeoutError('upstream')
+
+    with pytest.raises(TimeoutError):
+        cache.run('health', ['당뇨'], fail)
+    assert cache.run('health', ['당뇨'], lambda: ['25']) == ['25']
+    assert cache.stats()['in_flight'] == 0
+
+
+def test_context_reuses_stages_whose_inputs_did_not_change(cache, monkeypatch):
+    calls = []
+    monkeypatch.setattr(stages.llmStructure, 'retrieve_recipes',
+                        lambda need, ingredients: calls.append(('recipes', need)) or [need])
+    monkeypatch.setattr(stages.llmStructure, 'retrieve_health',
+                        lambda disease: calls.append(('health', disease)) or [disease])
+
+    assert stages.context('매운 거', ['감자', '양파'], '당뇨병') == (['매운 거'], ['당뇨병'])
+    # 재료 순서, 공백만 다르면 같은 입력이다
+    stages.context(' 매운 거', ['양파', '감자 '], '당뇨병')
+    stages.context('국물', ['양파', '감자'], '당뇨병')
+    assert sorted(calls) == [('health', '당뇨병'), ('recipes', '국물'), ('recipes', '매운 거')]
+    assert stages.recipe_key('국물', ['감자', '양파']) in cache
+    assert stages.health_key(' 당뇨병 ') in cache
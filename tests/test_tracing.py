@@ -0,0 +1,80 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import tracing
+from tracing import Recorder, span, submit
+
+
+@pytest.fixture
+def recorder(monkeypatch, tmp_path):
+    recorder = Recorder(str(tmp_path / 'trace.jsonl'))
+    monkeypatch.setattr(tracing, 'recorder', recorder)
+    return recorder
+
+
+def test_spans_aggregate_counters_errors_and_cache_hits(recorder):
+    with span('llm.completion', prompt_tokens=100, top_k=5) as s:
+        s.set(completion_tokens=20, cache_hit=True)
+    with pytest.raises(ValueError):
+        with span('llm.completion', prompt_tokens=50, model='gpt-4o-mini'):
+            raise ValueError('bad')
+
+    stage = recorder.summary()['llm.completion']
+    assert (stage['count'], stage['errors'], stage['cache_hits']) == (2, 1, 1)
+    assert (stage['prompt_tokens'], stage['completion_tokens']) == (150, 20)
+    # 더해도 의미 없는 속성은 합산하지 않는다
+    assert 'top_k' not in stage and 'model' not in stage
+    assert recorder.recent[-1]['error'] == 'ValueError: bad'
+
+
+def embed():
+    with span('embeddings'):
+        pass
+
+
+def test_nested_spans_and_worker_threads_share_the_trace_id(recorder):
+    with span('pipeline'):
+        with span('retrieve'):
+            pass
+        with ThreadPoolExecutor(1) as executor:
+            submit(executor, embed).result()
+            # submit 없이 넘기면 새 trace가 된다
+            executor.submit(embed).result()
+    records = [(r['stage'], r['trace_id']) for r in recorder.recent]
+    pipeline = records[-1][1]
+    assert records[:3] == [('retrieve', pipeline), ('embeddings', pipeline), ('embeddings', records[2][1])]
+    assert records[2][1] != pipeline
+    with span('next'):
+        pass
+    assert recorder.recent[-1]['trace_id'] != pipeline
+
+
+def test_trace_file_is_written_in_the_background(recorder, tmp_path):
+    for n in range(50):
+        with span('stage', matches=n):
+            pass
+    recorder.close()
+    lines = (tmp_path / 'trace.jsonl').read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line)['matches'] for line in lines] == list(range(50))
+
+
+def test_prometheus_text(recorder):
+    with span('vector.query', matches=3):
+        pass
+    text = recorder.prometheus_text()
+    assert 'smartchef_stage_duration_seconds_count{stage="vector.query"} 1' in text
+    assert 'smartchef_stage_attribute_total{stage="vector.query",attribute="matches"} 3' in text
+
+
+def test_metrics_server_binds_to_localhost_by_default(monkeypatch):
+    monkeypatch.setattr(tracing, '_server', None)
+    assert tracing.start_metrics_server(port='') is None
+    server = tracing.start_metrics_server(port=0)
+    try:
+        assert server.server_address[0] == '127.0.0.1'
+        assert tracing.start_metrics_server(port=0) is server
+    finally:
+        server.shutdown()
+        server.server_close()
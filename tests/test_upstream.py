@@ -0,0 +1,105 @@
+import httpx
+import pytest
+
+import upstream
+from upstream import AdaptiveLimiter, TokenBucket, Upstream, UpstreamTimeout, is_retryable, retry_after
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(upstream.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(upstream.time, 'sleep', clock.sleep)
+    monkeypatch.setattr(upstream.random, 'uniform', lambda low, high: high)
+    return clock
+
+
+def http_error(status, headers=None):
+    request = httpx.Request('POST', 'https://api.openai.com/v1/embeddings')
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError(f'{status}', request=request, response=response)
+
+
+def test_retry_classification():
+    assert is_retryable(http_error(429)) and is_retryable(http_error(503))
+    assert is_retryable(httpx.ConnectError('refused'))
+    assert not is_retryable(http_error(400)) and not is_retryable(ValueError())
+    assert retry_after(http_error(429, {'retry-after': '2'})) == 2.0
+    assert retry_after(http_error(429, {'retry-after-ms': '250'})) == 0.25
+    assert retry_after(http_error(429)) is None
+
+
+def test_token_bucket_goes_into_debt_and_refills(clock):
+    bucket = TokenBucket(60)
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(3) == 3.0
+    clock.now += 3
+    assert bucket.reserve(1) == 1.0
+    assert TokenBucket(0).reserve(10 ** 6) == 0.0
+
+
+def test_limiter_shrinks_once_per_window_and_grows_slowly(clock):
+    limiter = AdaptiveLimiter(10, 12)
+    for _ in range(3):
+        limiter.acquire(1)
+    for _ in range(3):
+        limiter.release('embeddings', None, True)
+    assert limiter.limit == pytest.approx(7.0)
+    clock.now += upstream.DECREASE_INTERVAL
+    limiter.acquire(1)
+    limiter.release('embeddings', 0.1, False)
+    assert limiter.limit == pytest.approx(7.0 + 1 / 7.0)
+
+
+def test_limiter_times_out_when_full(clock, monkeypatch):
+    limiter = AdaptiveLimiter(1, 1)
+    limiter.acquire(1)
+    monkeypatch.setattr(limiter._cond, 'wait', lambda timeout: clock.sleep(timeout))
+    with pytest.raises(UpstreamTimeout):
+        limiter.acquire(0.5)
+    assert limiter.waiting == 0
+
+
+def test_call_retries_transient_errors_and_honors_retry_after(clock):
+    service = Upstream('openai')
+    outcomes = [http_error(429, {'retry-after': '2'}), httpx.ReadTimeout('slow'), 'ok']
+
+    def create():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert service.call(create) == 'ok'
+    # Retry-After 2초 + 지터, 그 다음은 지수 백오프
+    assert clock.sleeps[0] == pytest.approx(2 + upstream.BACKOFF_BASE)
+    assert clock.sleeps[-1] == pytest.approx(upstream.BACKOFF_BASE * 2)
+    stats = service.stats()
+    assert (stats['calls'], stats['retries'], stats['failures'], stats['throttled'], stats['in_flight']) == (1, 2, 2, 1, 0)
+
+
+def test_call_does_not_retry_client_errors(clock):
+    service = Upstream('openai')
+    calls = []
+
+    def create():
+        calls.append(1)
+        raise http_error(400)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        service.call(create)
+    assert calls == [1]
+    assert service.stats()['retries'] == 0
@@ -0,0 +1,32 @@
+import re
+import unicodedata
+
+# 사용자 입력 정규화 (이모지 제거, 공백/대소문자 정리)
+
+_EMOJI_CATEGORIES = {'So', 'Sk', 'Cf', 'Cs', 'Co'}
+_EMOJI_MODIFIERS = {'\ufe0f', '\ufe0e', '\u20e3'}
+
+
+def strip_emoji(text):
+    """Removes emoji, pictographs and their joiners/variation selectors."""
+    return ''.join(
+        ch for ch in unicodedata.normalize('NFC', str(text))
+        if unicodedata.category(ch) not in _EMOJI_CATEGORIES and ch not in _EMOJI_MODIFIERS
+    )
+
+
+def normalize_phrase(text):
+    # '  매운 음식 ' → '매운 음식'
+    return ' '.join(strip_emoji(text).lower().split())
+
+
+def normalize_ingredient(text):
+    # '🥚계란' → '계란'
+    return re.sub(r'\s+', '', normalize_phrase(text))
+
+
+def normalize_ingredients(ingredients):
+    """Returns the sorted, de-duplicated, emoji-free ingredient set."""
+    if isinstance(ingredients, str):
+        ingredients = ingredients.split(',')
+    return sorted({normalize_ingredient(i) for i in ingredients} - {''})
@@ -0,0 +1,280 @@
+import atexit
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 파이프라인 단계별 지연시간 추적
+# with span('llm.completion', prompt_chars=...) as s: ... s.set(completion_tokens=...)
+# 기록은 JSON lines(SMARTCHEF_TRACE_FILE)와 Prometheus 텍스트(/metrics)로 내보낸다
+
+TRACE_FILE = os.environ.get('SMARTCHEF_TRACE_FILE')
+# 메트릭 서버는 기본으로 이 호스트에서만 접속을 받는다 (외부에 열려면 0.0.0.0)
+METRICS_HOST = os.environ.get('SMARTCHEF_METRICS_HOST', '127.0.0.1')
+MAX_SAMPLES_PER_STAGE = 4096
+MAX_RECENT_SPANS = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+# 단계별로 합산하는 수치 속성. top_k, concurrency처럼 더해도 의미 없는 속성은 trace에만 남는다
+COUNTER_ATTRS = {
+    'prompt_tokens', 'completion_tokens', 'tokens', 'prompt_chars', 'input_chars', 'response_chars',
+    'image_bytes', 'audio_bytes', 'matches', 'candidates', 'texts', 'dropped', 'duplicates', 'attempts',
+    'cache_hits', 'queue_ms',
+}
+
+_trace_id = contextvars.ContextVar('smartchef_trace_id', default=None)
+
+
+class Span:
+    def __init__(self, stage, attrs):
+        self.stage = stage
+        self.attrs = dict(attrs)
+        self.trace_id = _trace_id.get()
+        self.start = time.time()
+        self.duration = None
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def record(self):
+        return {
+            'trace_id': self.trace_id,
+            'stage': self.stage,
+            'start': self.start,
+            'duration_ms': round(self.duration * 1000, 3),
+            'error': self.error,
+            **self.attrs,
+        }
+
+
+class _StageStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.cache_hits = 0
+        self.samples = deque(maxlen=MAX_SAMPLES_PER_STAGE)
+        self.counters = {}
+
+
+class _TraceWriter:
+    """Appends span records as JSON lines from a background thread, so spans never wait on disk I/O."""
+
+    def __init__(self, path):
+        self.path = path
+        self.queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='trace-writer', daemon=True)
+                    self._thread.start()
+        self.queue.put(record)
+
+    def _run(self):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            while True:
+                record = self.queue.get()
+                if record is None:
+                    break
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+                # 밀린 기록을 다 쓴 뒤에만 flush한다
+                if self.queue.empty():
+                    f.flush()
+
+    def close(self, timeout=5):
+        if self._thread is not None:
+            self.queue.put(None)
+            self._thread.join(timeout)
+
+
+class Recorder:
+    """Process-wide store of finished spans with per-stage aggregates."""
+
+    def __init__(self, trace_file=None):
+        self.trace_file = trace_file
+        self._writer = _TraceWriter(trace_file) if trace_file else None
+        self.stages = {}
+        self.recent = deque(maxlen=MAX_RECENT_SPANS)
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        record = span.record()
+        with self._lock:
+            stats = self.stages.setdefault(span.stage, _StageStats())
+            stats.count += 1
+            stats.total += span.duration
+            stats.samples.append(span.duration)
+            if span.error:
+                stats.errors += 1
+            if span.attrs.get('cache_hit'):
+                stats.cache_hits += 1
+            # 토큰 수, 페이로드 크기 같은 COUNTER_ATTRS만 단계별로 누적한다
+            for key in COUNTER_ATTRS.intersection(span.attrs):
+                value = span.attrs[key]
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    stats.counters[key] = stats.counters.get(key, 0) + value
+            self.recent.append(record)
+        # 파일 쓰기는 잠금 밖에서 쓰기 스레드에 넘긴다
+        if self._writer is not None:
+            self._writer.write(record)
+
+    def summary(self):
+        """Returns count, error count and p50/p95/p99 (ms) per stage."""
+        with self._lock:
+            result = {}
+            for stage, stats in sorted(self.stages.items()):
+                samples = sorted(stats.samples)
+                entry = {
+                    'count': stats.count,
+                    'errors': stats.errors,
+                    'cache_hits': stats.cache_hits,
+                    'mean_ms': stats.total / stats.count * 1000 if stats.count else 0.0,
+                }
+                for q in QUANTILES:
+                    entry[f'p{int(q * 100)}_ms'] = _quantile(samples, q) * 1000
+                entry.update(stats.counters)
+                result[stage] = entry
+            return result
+
+    def export_jsonl(self, path):
+        with self._lock:
+            records = list(self.recent)
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        return len(records)
+
+    def prometheus_text(self):
+        lines = [
+            '# HELP smartchef_stage_duration_seconds Latency of each SmartChef pipeline stage.',
+            '# TYPE smartchef_stage_duration_seconds summary',
+        ]
+        totals = []
+        with self._lock:
+            for stage, stats in sorted(self.stages.items()):
+                samples = sorted(stats.samples)
+                for q in QUANTILES:
+                    lines.append(f'smartchef_stage_duration_seconds{{stage="{stage}",quantile="{q}"}} {_quantile(samples, q):.6f}')
+                lines.append(f'smartchef_stage_duration_seconds_sum{{stage="{stage}"}} {stats.total:.6f}')
+                lines.append(f'smartchef_stage_duration_seconds_count{{stage="{stage}"}} {stats.count}')
+                totals.append((stage, stats.errors, stats.cache_hits, dict(stats.counters)))
+        lines.append('# TYPE smartchef_stage_errors_total counter')
+        lines += [f'smartchef_stage_errors_total{{stage="{s}"}} {e}' for s, e, _, _ in totals]
+        lines.append('# TYPE smartchef_stage_cache_hits_total counter')
+        lines += [f'smartchef_stage_cache_hits_total{{stage="{s}"}} {h}' for s, _, h, _ in totals]
+        lines.append('# TYPE smartchef_stage_attribute_total counter')
+        for s, _, _, counters in totals:
+            for key, value in sorted(counters.items()):
+                lines.append(f'smartchef_stage_attribute_total{{stage="{s}",attribute="{key}"}} {value}')
+        # 다른 모듈이 등록한 현재값 지표 (예: upstream.py의 대기열 길이, 동시성 상한)
+        for source in list(_gauge_sources):
+            for metric, labels, value in source():
+                label_text = ','.join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+                lines.append(f'{metric}{{{label_text}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+            self.recent.clear()
+
+    def close(self):
+        """Writes out trace records still queued for the trace file."""
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _quantile(samples, q):
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+recorder = Recorder(TRACE_FILE)
+atexit.register(recorder.close)
+_gauge_sources = []
+
+
+def register_gauges(source):
+    """Adds source() -> iterable of (metric, labels, value) to the Prometheus output."""
+    _gauge_sources.append(source)
+
+
+@contextmanager
+def span(stage, **attrs):
+    """Times a block and records it under stage, including failures."""
+    current = Span(stage, attrs)
+    token = None
+    if current.trace_id is None:
+        current.trace_id = uuid.uuid4().hex[:16]
+        token = _trace_id.set(current.trace_id)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        if token is not None:
+            _trace_id.reset(token)
+        recorder.add(current)
+
+
+def submit(executor, fn, *args, **kwargs):
+    """executor.submit that keeps the caller's trace id in the worker thread."""
+    context = contextvars.copy_context()
+    return executor.submit(context.run, fn, *args, **kwargs)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith('/metrics'):
+            body, content_type = recorder.prometheus_text(), 'text/plain; version=0.0.4'
+        elif self.path.startswith('/traces'):
+            with recorder._lock:
+                records = list(recorder.recent)
+            body = ''.join(json.dumps(r, ensure_ascii=False, default=str) + '\n' for r in records)
+            content_type = 'application/x-ndjson'
+        elif self.path.startswith('/summary'):
+            body, content_type = json.dumps(recorder.summary(), ensure_ascii=False), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None, host=None):
+    """Serves /metrics, /summary and /traces once per process; returns the server or None."""
+    global _server
+    port = port if port is not None else os.environ.get('SMARTCHEF_METRICS_PORT')
+    host = host if host is not None else METRICS_HOST
+    if port is None or port == '':
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name='metrics', daemon=True).start()
+        return _server
@@ -0,0 +1,327 @@
+import email.utils
+import os
+import random
+import threading
+import time
+
+import httpx
+import openai
+import requests
+from requests.adapters import HTTPAdapter
+
+import startup
+from tracing import register_gauges, span
+
+# 외부 API(OpenAI, Replicate) 공용 클라이언트 계층: 프로세스 안의 모든 세션이 같이 쓴다
+# - keep-alive 연결 풀을 공유하는 클라이언트 (requests 세션, OpenAI, Replicate)
+# - 업스트림별 토큰 버킷: 분당 요청 수(RPM)와 분당 토큰 수(TPM)
+# - 429/5xx/타임아웃은 지터를 준 지수 백오프로 재시도하고, Retry-After가 있으면 그만큼 기다린다
+# - 동시 호출 수 상한은 지연시간과 오류에 따라 AIMD로 조정한다 (느려지거나 실패하면 줄이고, 정상이면 조금씩 늘린다)
+#
+#   response = upstream.call('openai', client.embeddings.create, input=texts, model=..., tokens=추정 토큰 수)
+#
+# 설정: SMARTCHEF_{OPENAI,REPLICATE}_{RPM,TPM,TIMEOUT,RETRIES,CONCURRENCY,MAX_CONCURRENCY}
+
+DEFAULTS = {
+    'openai': {'rpm': 500, 'tpm': 200000, 'timeout': 60, 'retries': 4, 'concurrency': 16, 'max_concurrency': 64},
+    'replicate': {'rpm': 60, 'tpm': 0, 'timeout': 120, 'retries': 4, 'concurrency': 4, 'max_concurrency': 16},
+}
+POOL_SIZE = int(os.environ.get('SMARTCHEF_UPSTREAM_POOL_SIZE', '64'))
+BACKOFF_BASE = float(os.environ.get('SMARTCHEF_UPSTREAM_BACKOFF', '0.5'))
+BACKOFF_MAX = 30.0
+
+# 호출 종류별로 최근 지연시간 평균(빠른 지수이동평균)이 장기 평균의 이 배수를 넘으면 과부하로 보고 상한을 줄인다
+# 응답 하나하나가 아니라 평균끼리 비교하므로 평소의 지연시간 편차로는 줄지 않는다
+LATENCY_TOLERANCE = 2.0
+RECENT_ALPHA = 0.2
+BASELINE_ALPHA = 0.002
+DECREASE_FACTOR = 0.7
+# 줄이는 것은 이 간격(또는 기준 지연시간 중 긴 쪽)에 한 번만: 같은 과부하에 대한 연속 응답으로 여러 번 줄이지 않는다
+DECREASE_INTERVAL = 1.0
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, openai.APIConnectionError,
+                    httpx.TransportError, TimeoutError, ConnectionError)
+
+
+class UpstreamTimeout(TimeoutError):
+    pass
+
+
+class TokenBucket:
+    """Refills per_minute units per minute, holding at most one minute's worth."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        """Takes amount now (possibly going into debt) and returns how long the caller must wait."""
+        if self.rate <= 0 or amount <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+            self.updated = now
+            self.available -= min(amount, self.capacity)
+            return 0.0 if self.available >= 0 else -self.available / self.rate
+
+    def adjust(self, amount):
+        # 추정치로 예약한 뒤 실제 사용량과의 차이를 반영한다
+        if self.rate > 0:
+            with self._lock:
+                self.available = min(self.capacity, self.available - amount)
+
+
+class AdaptiveLimiter:
+    """Concurrency limit that grows by one per window of healthy calls and shrinks at most once per window on overload."""
+
+    def __init__(self, initial, maximum, minimum=1):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.waiting = 0
+        # 호출 종류(엔드포인트)마다 기준 지연시간이 다르다 (임베딩 ≪ 비전): kind → [최근 평균, 장기 평균, 표본 수]
+        self.baselines = {}
+        self.decreased_at = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self.waiting += 1
+            try:
+                while self.in_flight >= int(self.limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise UpstreamTimeout(f'waited {timeout}s for an upstream slot')
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+
+    def release(self, kind, latency, overloaded):
+        with self._cond:
+            self.in_flight -= 1
+            averages = self.baselines.get(kind)
+            if latency is not None:
+                if averages is None:
+                    averages = self.baselines[kind] = [latency, latency, 1]
+                else:
+                    averages[2] += 1
+                    averages[0] += (latency - averages[0]) * max(RECENT_ALPHA, 1.0 / averages[2])
+                    # 처음에는 누적 평균으로 시작해서 첫 응답 몇 개에 장기 평균이 치우치지 않게 한다
+                    averages[1] += (latency - averages[1]) * max(BASELINE_ALPHA, 1.0 / averages[2])
+                overloaded = overloaded or averages[0] > averages[1] * LATENCY_TOLERANCE
+            now = time.monotonic()
+            if overloaded:
+                if now - self.decreased_at >= max(DECREASE_INTERVAL, averages[1] if averages else 0.0):
+                    self.limit = max(self.minimum, self.limit * DECREASE_FACTOR)
+                    self.decreased_at = now
+            elif latency is not None:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+
+def _env(name, key):
+    return float(os.environ.get(f'SMARTCHEF_{name.upper()}_{key.upper()}', DEFAULTS[name][key]))
+
+
+def status_code(error):
+    for source in (error, getattr(error, 'response', None)):
+        for attr in ('status_code', 'status'):
+            value = getattr(source, attr, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def retry_after(error):
+    """Seconds from a Retry-After (or retry-after-ms) header on the failed response, if any."""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        value = headers.get('retry-after')
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def is_retryable(error):
+    return status_code(error) in RETRY_STATUS or isinstance(error, TRANSIENT_ERRORS)
+
+
+class Upstream:
+    """Rate limits, adaptive concurrency, retries and queueing counters for one provider."""
+
+    def __init__(self, name):
+        self.name = name
+        self.timeout = _env(name, 'timeout')
+        self.retries = int(_env(name, 'retries'))
+        self.requests = TokenBucket(_env(name, 'rpm'))
+        self.tokens = TokenBucket(_env(name, 'tpm'))
+        self.limiter = AdaptiveLimiter(_env(name, 'concurrency'), _env(name, 'max_concurrency'))
+        # Retry-After를 받으면 이 업스트림으로 가는 모든 호출을 그 시각까지 멈춘다
+        self.paused_until = 0.0
+        self.calls = 0
+        self.retried = 0
+        self.failures = 0
+        self.throttled = 0
+        self.queue_seconds = 0.0
+        self.queue_seconds_max = 0.0
+        self._lock = threading.Lock()
+
+    def _wait_for_rate(self, tokens):
+        delay = max(self.requests.reserve(1), self.tokens.reserve(tokens), self.paused_until - time.monotonic())
+        if delay > self.timeout:
+            self.requests.adjust(-1)
+            self.tokens.adjust(-tokens)
+            raise UpstreamTimeout(f'{self.name} rate limit would delay this call by {delay:.1f}s')
+        if delay > 0:
+            time.sleep(delay)
+        return max(delay, 0.0)
+
+    def call(self, fn, *args, tokens=0, **kwargs):
+        """Runs fn(*args, **kwargs) under this provider's limits, retrying transient failures."""
+        kind = getattr(fn, '__qualname__', type(fn).__name__)
+        with span(f'upstream.{self.name}') as s:
+            with self._lock:
+                self.calls += 1
+            queued = 0.0
+            for attempt in range(self.retries + 1):
+                started = time.monotonic()
+                self._wait_for_rate(tokens)
+                try:
+                    self.limiter.acquire(self.timeout)
+                except UpstreamTimeout:
+                    # 보내지 못한 호출의 요청/토큰 예약은 돌려준다
+                    self.requests.adjust(-1)
+                    self.tokens.adjust(-tokens)
+                    raise
+                waited = time.monotonic() - started
+                queued += waited
+                started = time.monotonic()
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    retrying = is_retryable(e) and attempt < self.retries
+                    self.limiter.release(kind, None, is_retryable(e))
+                    self._count_failure(e, waited, retrying)
+                    if not retrying:
+                        s.set(attempts=attempt + 1, queue_ms=queued * 1000)
+                        raise
+                    time.sleep(self._backoff(e, attempt))
+                else:
+                    self.limiter.release(kind, time.monotonic() - started, False)
+                    self._count_wait(waited)
+                    s.set(attempts=attempt + 1, queue_ms=queued * 1000)
+                    return result
+
+    def _backoff(self, error, attempt):
+        delay = retry_after(error)
+        if delay is not None:
+            delay = min(delay, BACKOFF_MAX)
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            return delay + random.uniform(0, BACKOFF_BASE)
+        # full jitter
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    def _count_wait(self, waited):
+        with self._lock:
+            self.queue_seconds += waited
+            self.queue_seconds_max = max(self.queue_seconds_max, waited)
+
+    def _count_failure(self, error, waited, retrying):
+        self._count_wait(waited)
+        with self._lock:
+            self.failures += 1
+            if retrying:
+                self.retried += 1
+            if status_code(error) == 429:
+                self.throttled += 1
+
+    def settle_tokens(self, estimated, actual):
+        """Corrects the token bucket once the response reports its real usage."""
+        self.tokens.adjust(actual - estimated)
+
+    def stats(self):
+        with self._lock:
+            counters = {'calls': self.calls, 'retries': self.retried, 'failures': self.failures,
+                        'throttled': self.throttled, 'queue_seconds': self.queue_seconds,
+                        'queue_seconds_max': self.queue_seconds_max}
+        limiter = self.limiter
+        return {**counters, 'concurrency_limit': int(limiter.limit), 'in_flight': limiter.in_flight,
+                'waiting': limiter.waiting,
+                'paused_seconds': max(0.0, self.paused_until - time.monotonic())}
+
+
+upstreams = {name: Upstream(name) for name in DEFAULTS}
+
+
+def get(name):
+    return upstreams[name]
+
+
+def call(name, fn, *args, tokens=0, **kwargs):
+    return upstreams[name].call(fn, *args, tokens=tokens, **kwargs)
+
+
+def stats():
+    return {name: u.stats() for name, u in upstreams.items()}
+
+
+def _new_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _new_openai_client():
+    # 재시도는 이 계층에서 하므로 SDK 재시도는 끈다
+    return openai.OpenAI(
+        api_key=os.environ['OPENAI_API_KEY'], timeout=upstreams['openai'].timeout, max_retries=0,
+        http_client=openai.DefaultHttpxClient(
+            limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE))
+    )
+
+
+def _new_replicate_client():
+    import replicate
+
+    return replicate.Client(api_token=os.environ.get('REPLICATE_API_TOKEN'),
+                            timeout=httpx.Timeout(upstreams['replicate'].timeout))
+
+
+def _check_openai(client):
+    # 키 확인 겸 연결 풀에 연결을 하나 열어 둔다
+    client.models.list()
+
+
+# 프로세스 전체가 같이 쓰는 클라이언트: 처음 호출할 때 만든다 (startup.py)
+#   http_session()   keep-alive 연결 풀을 공유하는 requests.Session
+#   openai_client()  OpenAI SDK 클라이언트 (OPENAI_API_KEY가 없으면 첫 호출에서 실패하고 준비 상태에 보고된다)
+#   replicate_client()
+http_session = startup.resource('http', _new_session)
+openai_client = startup.resource('openai', _new_openai_client, warm=_check_openai)
+replicate_client = startup.resource('replicate', _new_replicate_client)
+
+
+def _gauges():
+    for name, values in stats().items():
+        for key, value in values.items():
+            yield f'smartchef_upstream_{key}', {'upstream': name}, value
+
+
+register_gauges(_gauges)
@@ -0,0 +1,171 @@
+import ast
+import base64
+import json
+import os
+import threading
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+import startup
+import upstream
+from tracing import span
+
+# 냉장고 사진 → 식재료 목록 (gpt-4o-mini 비전)
+# 사진은 모델이 실제로 쓰는 해상도로 줄이고 메타데이터를 제거한 뒤 한 번만 인코딩한다
+# 거의 같은 사진(데모 이미지, 재업로드)은 지각 해시 캐시에서 바로 돌려준다
+
+VISION_MODEL = "gpt-4o-mini"
+VISION_PROMPT = "입력받은 냉장고 속 이미지에서 확실하게 보이는 식재료들만 리스트로 뽑아줘. 이때 식재료와 관련한 이모지를 같이 붙여줘. 불필요한 설명은 제외. format example : ['🥚계란','🎃호박','🍎사과']. 인식된 재료가 없을 경우 빈 리스트를 반환해줘."
+
+# high detail 모드는 2048px 안에 맞춘 뒤 짧은 변을 768px로 줄여서 본다
+VISION_MAX_LONG_SIDE = 2048
+VISION_MAX_SHORT_SIDE = 768
+JPEG_QUALITY = 85
+VISION_URL = "https://api.openai.com/v1/chat/completions"
+# 분당 토큰 한도 예약용 추정치 (high detail 이미지 + 프롬프트 + max_tokens)
+VISION_TOKEN_ESTIMATE = 1200
+
+HASH_CACHE_PATH = os.environ.get('SMARTCHEF_VISION_CACHE', 'cache/vision_hashes.jsonl')
+HASH_TOLERANCE = int(os.environ.get('SMARTCHEF_VISION_HASH_TOLERANCE', '6'))
+
+
+def resize_for_vision(image):
+    """Applies EXIF orientation and downsizes to the vision model's working resolution."""
+    if not isinstance(image, Image.Image):
+        image = Image.open(image)
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    width, height = image.size
+    scale = min(1.0, VISION_MAX_LONG_SIDE / max(width, height), VISION_MAX_SHORT_SIDE / min(width, height))
+    if scale < 1.0:
+        image = image.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.LANCZOS)
+    return image
+
+
+def to_jpeg(image):
+    buffered = BytesIO()
+    # exif/icc 등의 메타데이터는 넘기지 않는다
+    image.save(buffered, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    return buffered.getvalue()
+
+
+def preprocess_image(image):
+    """Downsizes the photo and re-encodes it once as JPEG without metadata."""
+    image = resize_for_vision(image)
+    return image, to_jpeg(image)
+
+
+def dhash(image, hash_size=8):
+    """Difference hash: a 64-bit perceptual hash robust to resizing and recompression."""
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+class PerceptualHashCache:
+    """Maps image hashes to recognized ingredients, matching within a Hamming distance."""
+
+    def __init__(self, path, tolerance=HASH_TOLERANCE):
+        self.path = path
+        self.tolerance = tolerance
+        self.entries = []
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.entries.append((int(record['hash'], 16), record['ingredients']))
+
+    def get(self, image_hash):
+        with self._lock:
+            best = None
+            for stored_hash, ingredients in self.entries:
+                distance = bin(stored_hash ^ image_hash).count('1')
+                if distance <= self.tolerance and (best is None or distance < best[0]):
+                    best = (distance, ingredients)
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return list(best[1])
+
+    def put(self, image_hash, ingredients):
+        with self._lock:
+            self.entries.append((image_hash, list(ingredients)))
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'hash': f'{image_hash:016x}', 'ingredients': list(ingredients)}, ensure_ascii=False) + '\n')
+
+
+# 지각 해시 목록은 처음 인식할 때(또는 웜업 때) 파일에서 읽는다
+hash_cache = startup.resource('vision_hashes', lambda: PerceptualHashCache(HASH_CACHE_PATH))
+
+
+def _post_chat(headers, payload):
+    response = upstream.http_session().post(VISION_URL, headers=headers, json=payload,
+                                            timeout=upstream.get('openai').timeout)
+    # 429/5xx는 예외로 올려서 upstream 계층이 재시도하게 한다
+    response.raise_for_status()
+    return response.json()
+
+
+def request_ingredients(jpeg_bytes, api_key):
+    base64_image = base64.b64encode(jpeg_bytes).decode('utf-8')
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}"
+    }
+    payload = {
+        "model": VISION_MODEL,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": VISION_PROMPT},
+                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
+                ]
+            }
+        ],
+        "max_tokens": 300
+    }
+
+    with span('vision.request', image_bytes=len(jpeg_bytes)) as s:
+        body = upstream.call('openai', _post_chat, headers, payload, tokens=VISION_TOKEN_ESTIMATE)
+        if 'usage' in body:
+            usage = body['usage']
+            s.set(prompt_tokens=usage['prompt_tokens'], completion_tokens=usage['completion_tokens'])
+            upstream.get('openai').settle_tokens(VISION_TOKEN_ESTIMATE, usage['prompt_tokens'] + usage['completion_tokens'])
+    ingredients_list = body['choices'][0]['message']['content']
+    return ast.literal_eval(ingredients_list)
+
+
+def recognize_ingredients(image, api_key=None):
+    """Returns the ingredient list for a fridge photo, reusing results for near-identical photos."""
+    with span('vision.recognize') as s:
+        with span('vision.preprocess'):
+            image = resize_for_vision(image)
+            image_hash = dhash(image)
+        cached = hash_cache().get(image_hash)
+        s.set(cache_hit=cached is not None)
+        if cached is not None:
+            return cached
+
+        # 캐시에 없을 때만 JPEG 인코딩 후 비전 모델을 호출한다
+        ingredients_list = request_ingredients(to_jpeg(image), api_key or os.environ['OPENAI_API_KEY'])
+        hash_cache().put(image_hash, ingredients_list)
+        s.set(ingredients=len(ingredients_list))
+        return ingredients_list